@@ -22,7 +22,16 @@ config = to_namespace({
     "mode": {"dev": False},
     "database": {
         "file": data_dir.joinpath("database.db"),
-        "schema": app_root.joinpath("persistence").joinpath("schema.sql")
+        "schema": app_root.joinpath("persistence").joinpath("schema.sql"),
+        "migrations": app_root.joinpath("persistence").joinpath("migrations"),
+        # storage of listings.raw_data: "none" (JSON text), "zlib" or "zstd" (needs zstandard)
+        # existing rows are converted with: python -m scripts.compress_raw_data
+        "raw_data": {
+            "codec": "none",
+            "level": 6,
+            # compress with the latest dictionary trained on the listings, if any
+            "dictionary": True,
+        },
     },
     "dir": {
         "debug": debug_dir,
@@ -41,5 +50,76 @@ config = to_namespace({
     "mappings": {
         "provider": "jobspy",
         "platform": "linkedin"
+    },
+    # nested metric spans (process -> step -> phase), see Metric
+    "profiling": {
+        "enabled": False,
+        # tracemalloc peak memory per span, slows processing down noticeably
+        "memory": False,
+    },
+    # counters, histograms and warnings per run, see MetricsRegistry
+    "metrics": {
+        # messages kept per warning kind, the rest are only counted
+        "warning_samples": 5,
+        # save a snapshot per processing run to the metric_runs table
+        "history": True,
+    },
+    "webui": {
+        # processing results shared by every dashboard session, see ResultCache
+        "cache": {
+            "max_entries": 32,
+            # seconds, 0 keeps entries until they are evicted
+            "ttl": 3600,
+        },
+    },
+    "scraper": {
+        # queries in flight at once, across every site
+        "concurrency": 4,
+        # attempts after the first one, waiting backoff * 2^attempt seconds (plus jitter)
+        "retries": 3,
+        "backoff": 2.0,
+        # token buckets per site: requests per second and burst size
+        "rate_limits": {
+            "linkedin": {"rate": 0.5, "burst": 2},
+            "indeed": {"rate": 1.0, "burst": 3},
+            "default": {"rate": 0.5, "burst": 1},
+        },
+    },
+    "processor": {
+        "deduplication": {
+            # "lsh" (MinHash + locality-sensitive hashing) or "exhaustive" (n² reference)
+            "strategy": "lsh",
+            # signature size and band count: 20 bands of 6 rows catch pairs
+            # at 0.80 similarity with ~99.8% probability (and most pairs above ~0.6,
+            # which the deduplicator pre-filters; more rows per band also miss 0.80 pairs)
+            "permutations": 120,
+            "bands": 20,
+            # also drop listings already seen in another session (reposts across scrapes),
+            # flags are kept in the fingerprints table and computed as sessions get processed
+            "cross_session": False,
+            # drop listings with the same raw title and description as an earlier one
+            # before sanitizing them, results are the same either way
+            "exact_filter": True,
+        },
+        # keep sanitized text and ngrams in the database, keyed by listing id,
+        # a hash of its raw text and the TextProcessor and topic phrases fingerprints
+        "cache": {
+            "enabled": True,
+        },
+        # "serial", "sharded" (process pool), "auto" (sharded for large sessions)
+        # or "streaming" (listings are read from the database chunk by chunk)
+        "execution": {
+            "mode": "auto",
+            "min_listings": 2000,
+            "workers": None, # None means os.cpu_count()
+            "shards_per_worker": 4,
+            # listings held in memory at once by the streaming mode
+            "chunk_size": 500,
+        },
+        # pairs of terms matched in the same listing, see CoOccurrence
+        "co_occurrence": {
+            # pairs seen in fewer listings are left out of rankings (rare pairs have huge lifts)
+            "min_count": 5,
+        },
     }
 })
\ No newline at end of file
@@ -1,7 +1,29 @@
 from app.components.text_processor import TextProcessor
 from app.components.dynamic_listing_factory import DynamicListingFactory
+from app.components.vocabulary import Vocabulary
+from app.components.min_hasher import MinHasher
+from app.components.deduplicator import Deduplicator
+from app.components.term_index import TermIndex
+from app.components.phrase_trie import PhraseTrie
+from app.components.job_level_classifier import JobLevelClassifier
+from app.components.metrics_registry import MetricsRegistry
+from app.components.result_cache import ResultCache
+from app.components.incidence_matrix import IncidenceMatrix
+from app.components.co_occurrence import CoOccurrence
+from app.components.raw_data_codec import RawDataCodec
 
 __all__ = [
     "TextProcessor",
-    "DynamicListingFactory"
+    "DynamicListingFactory",
+    "Vocabulary",
+    "MinHasher",
+    "Deduplicator",
+    "TermIndex",
+    "PhraseTrie",
+    "JobLevelClassifier",
+    "MetricsRegistry",
+    "ResultCache",
+    "IncidenceMatrix",
+    "CoOccurrence",
+    "RawDataCodec"
 ]
\ No newline at end of file
@@ -0,0 +1,198 @@
+from typing import Any, Iterable
+
+import numpy as np
+
+from app.components.incidence_matrix import IncidenceMatrix
+from app import config
+
+
+class CoOccurrence:
+    """Pairwise counts of canonical terms matched in the same listing, per job level.
+
+    Built from an IncidenceMatrix: each row's terms (deduplicated across
+    topics) give its pairs, rows with the same number of terms are expanded
+    together with numpy, so the cost follows the number of pairs actually
+    present, not terms². Only pairs seen at least once are stored, as sorted
+    (level, a, b) keys with their counts.
+
+    For a slice of N listings where a shows up n_a times, b n_b times and both
+    n_ab times: lift = n_ab * N / (n_a * n_b), pmi = log2(lift) and
+    confidence = n_ab / n_a (share of a's listings that also mention b).
+    """
+
+    # dense counters are used below this many (level, a, b) cells, sparse keys above
+    DENSE_LIMIT = 1 << 22
+
+    terms: list[str]
+    levels: list[str]
+    listings: np.ndarray
+    term_counts: np.ndarray
+
+    def __init__(self, terms: list[str], levels: list[str], listings: np.ndarray, term_counts: np.ndarray,
+                 keys: np.ndarray, counts: np.ndarray) -> None:
+        self.terms = terms
+        self.levels = levels
+        # listings per level and listings per level x term
+        self.listings = listings
+        self.term_counts = term_counts
+        self._term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        self._keys = keys
+        self._counts = counts
+        self._slices: dict[int | None, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_matrix(cls, matrix: IncidenceMatrix, topics: Iterable[str] | None = None) -> 'CoOccurrence':
+        """Co-occurrence of the matrix terms, of the given topics only if any"""
+        selected = set(topics) if topics is not None else None
+        terms: list[str] = []
+        term_ids: dict[str, int] = {}
+        column_terms = np.full(len(matrix.columns), -1, dtype=np.int64)
+        for column, (topic, canonical) in enumerate(matrix.columns):
+            if selected is not None and topic not in selected:
+                continue
+            if canonical not in term_ids:
+                term_ids[canonical] = len(terms)
+                terms.append(canonical)
+            column_terms[column] = term_ids[canonical]
+
+        size = len(terms)
+        levels = np.asarray(matrix.job_levels, dtype=np.int64)
+        level_count = len(matrix.levels)
+        listings = np.bincount(levels, minlength=level_count)
+        if not size:
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(terms, list(matrix.levels), listings, np.zeros((level_count, 0), dtype=np.int64), empty, empty)
+
+        # (row, term) pairs, sorted and unique: a canonical shared by two topics counts once
+        rows = np.repeat(np.arange(len(matrix), dtype=np.int64), np.diff(matrix.indptr))
+        row_terms = column_terms[matrix.indices]
+        kept = row_terms >= 0
+        rows, row_terms = np.divmod(np.unique(rows[kept] * size + row_terms[kept]), size)
+        term_counts = np.bincount(levels[rows] * size + row_terms, minlength=level_count * size)
+        term_counts = term_counts.reshape(level_count, size)
+
+        lengths = np.bincount(rows, minlength=len(matrix))
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        cells = level_count * size * size
+        dense = np.zeros(cells, dtype=np.int64) if cells <= cls.DENSE_LIMIT else None
+        sparse: list[tuple[np.ndarray, np.ndarray]] = []
+        for length in np.unique(lengths[lengths >= 2]).tolist():
+            # every row with this many terms at once, terms are sorted so a < b
+            members = np.flatnonzero(lengths == length)
+            block = row_terms[indptr[members][:, None] + np.arange(length)]
+            first, second = np.triu_indices(length, 1)
+            keys = ((np.repeat(levels[members], len(first)) * size + block[:, first].ravel()) * size
+                    + block[:, second].ravel())
+            if dense is not None:
+                dense += np.bincount(keys, minlength=cells)
+            else:
+                sparse.append(np.unique(keys, return_counts=True))
+
+        if dense is not None:
+            keys = np.flatnonzero(dense)
+            counts = dense[keys]
+        elif sparse:
+            keys, inverse = np.unique(np.concatenate([group[0] for group in sparse]), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate([group[1] for group in sparse])).astype(np.int64)
+        else:
+            keys = counts = np.zeros(0, dtype=np.int64)
+
+        return cls(terms, list(matrix.levels), listings, term_counts, keys, counts)
+
+    def _slice(self, job_level: str | None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(a, b, count) of every pair in a level, or in every level"""
+        code = None if job_level is None else self.levels.index(job_level)
+        if code not in self._slices:
+            size = len(self.terms)
+            levels, pairs = np.divmod(self._keys, max(size * size, 1))
+            if code is not None:
+                selected = levels == code
+                pairs, counts = pairs[selected], self._counts[selected]
+            else:
+                pairs, inverse = np.unique(pairs, return_inverse=True)
+                counts = np.bincount(inverse, weights=self._counts, minlength=len(pairs)).astype(np.int64)
+            first, second = np.divmod(pairs, max(size, 1))
+            self._slices[code] = (first, second, counts)
+        return self._slices[code]
+
+    def _totals(self, job_level: str | None) -> tuple[int, np.ndarray]:
+        if job_level is None:
+            return int(self.listings.sum()), self.term_counts.sum(axis=0)
+        code = self.levels.index(job_level)
+        return int(self.listings[code]), self.term_counts[code]
+
+    def _scores(self, job_level, first, second, counts) -> dict[str, np.ndarray]:
+        total, term_counts = self._totals(job_level)
+        lift = counts * total / (term_counts[first] * term_counts[second])
+        return {
+            "count": counts,
+            "support": counts / total,
+            "lift": lift,
+            "pmi": np.log2(lift),
+            "confidence": counts / term_counts[first],
+        }
+
+    def _ranked(self, scores: dict[str, np.ndarray], by: str, k: int) -> np.ndarray:
+        if by not in scores:
+            raise ValueError(f"Unknown co-occurrence score '{by}'")
+        # higher score first, ties go to the more frequent pair
+        return np.lexsort((-scores["count"], -scores[by]))[:k]
+
+    def top_pairs(
+            self,
+            job_level: str | None = None,
+            k: int = 20,
+            by: str = "lift",
+            min_count: int | None = None
+    ) -> list[dict[str, Any]]:
+        """Strongest pairs of a level (every level by default), seen in at least min_count listings"""
+        first, second, counts = self._slice(job_level)
+        selected = counts >= (config.processor.co_occurrence.min_count if min_count is None else min_count)
+        first, second, counts = first[selected], second[selected], counts[selected]
+        scores = self._scores(job_level, first, second, counts)
+        return [
+            {"term": self.terms[first[i]], "partner": self.terms[second[i]],
+             **{name: _value(values[i]) for name, values in scores.items() if name != "confidence"}}
+            for i in self._ranked(scores, by, k).tolist()
+        ]
+
+    def partners(
+            self,
+            term: str,
+            job_level: str | None = None,
+            k: int = 10,
+            by: str = "lift",
+            min_count: int | None = None
+    ) -> list[dict[str, Any]]:
+        """Terms most associated with term, confidence is the share of term's listings mentioning them"""
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            return []
+        first, second, counts = self._slice(job_level)
+        selected = ((first == term_id) | (second == term_id))
+        selected &= counts >= (config.processor.co_occurrence.min_count if min_count is None else min_count)
+        partner = np.where(first[selected] == term_id, second[selected], first[selected])
+        own = np.full(len(partner), term_id)
+        scores = self._scores(job_level, own, partner, counts[selected])
+        return [
+            {"term": term, "partner": self.terms[partner[i]],
+             **{name: _value(values[i]) for name, values in scores.items()}}
+            for i in self._ranked(scores, by, k).tolist()
+        ]
+
+    def count(self, term: str, partner: str, job_level: str | None = None) -> int:
+        """Listings mentioning both terms"""
+        ids = sorted((self._term_ids.get(term, -1), self._term_ids.get(partner, -1)))
+        if ids[0] < 0:
+            return 0
+        first, second, counts = self._slice(job_level)
+        found = np.flatnonzero((first == ids[0]) & (second == ids[1]))
+        return int(counts[found[0]]) if found.size else 0
+
+    def __len__(self) -> int:
+        """Distinct pairs, across levels"""
+        return len(self._slice(None)[2])
+
+
+def _value(value: np.generic) -> int | float:
+    return int(value) if np.issubdtype(type(value), np.integer) else round(float(value), 4)
@@ -0,0 +1,274 @@
+from time import perf_counter
+import hashlib
+
+import numpy as np
+
+from app.components.min_hasher import MinHasher
+from app.components.vocabulary import Vocabulary
+
+
+class Deduplicator:
+    """Online duplicate detector.
+
+    Listings are fed in order and each one is checked against every listing
+    fed before it, so the first occurrence is kept and later copies are flagged.
+    A listing is a duplicate of an earlier one when:
+        - both have the same external_id
+        - both have exactly the same description
+        - description unigrams Jaccard similarity is >= 0.90
+        - similarity is between 0.80 and 0.90 and titles are the same
+
+    Unigrams are sorted id arrays from a Vocabulary, which also provides the
+    token hashes for MinHash signatures.
+
+    With lsh, band collisions only make candidates: 20 bands of 6 rows keep
+    pairs at 0.80 but also let in most pairs above ~0.6 (shared template
+    text), so candidates are pre-filtered with numpy before the exact check.
+    Jaccard can't exceed the smaller set size over the larger one, and the
+    share of equal signature values estimates it (checked with a margin).
+    """
+
+    STRATEGIES = ("lsh", "exhaustive")
+
+    DUPLICATE_THRESHOLD = 0.90
+    TIEBREAK_THRESHOLD = 0.80
+    # signature agreement is an estimate, ~0.04 standard deviation at 0.80 with 120 permutations
+    SKETCH_MARGIN = 0.15
+
+    strategy: str
+    candidate_pairs: int
+    prefiltered: int
+    comparisons: int
+    duplicates: int
+    intersection_time: float
+
+    def __init__(
+            self,
+            strategy: str = "lsh",
+            permutations: int = 120,
+            bands: int = 20,
+            vocabulary: Vocabulary | None = None
+    ) -> None:
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown deduplication strategy '{strategy}'")
+        if permutations % bands:
+            raise ValueError(f"Permutations ({permutations}) must be divisible by bands ({bands})")
+
+        self.strategy = strategy
+        self.candidate_pairs = 0
+        self.prefiltered = 0
+        self.comparisons = 0
+        self.duplicates = 0
+        self.intersection_time = 0.0
+        self._vocabulary = vocabulary
+
+        self._external_ids: set[str] = set()
+        self._descriptions: set[bytes] = set()
+
+        # per registered listing, indexed by feed order
+        self._entries_external_ids: list[str | None] = []
+        self._entries_descriptions: list[bytes] = []
+        self._entries_titles: list[str] = []
+        self._entries_unigrams: list[np.ndarray] = []
+
+        # flags the ids of the listing being checked, intersections with any
+        # entry are then a single lookup (see _is_similar)
+        self._marks = np.zeros(1024, dtype=bool)
+
+        # lsh state: one table per band mapping band key -> entries
+        self._bands = bands
+        self._hasher = MinHasher(permutations) if strategy == "lsh" else None
+        self._tables: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+
+        # pre-filter state per entry: unigram count and the low byte of each signature
+        # value (low bytes only agree more often than the values, never less)
+        self._sizes = np.zeros(1024, dtype=np.int64)
+        self._sketches = np.zeros((1024, permutations if self._hasher else 0), dtype=np.uint8)
+        self._sketched = np.zeros(1024, dtype=bool)
+
+    def is_duplicate(
+            self,
+            external_id: str | None,
+            title: str,
+            description: str,
+            unigrams: np.ndarray,
+            signature: np.ndarray | None = None
+    ) -> bool:
+        """Checks a listing against every previously fed listing, then registers it.
+        The signature can be precomputed with self.signature (e.g. in another process)"""
+        digest = self.digest(description)
+
+        if self.strategy == "exhaustive":
+            duplicate = self._scan(external_id, digest, title, unigrams)
+            self._register(external_id, digest, title, unigrams)
+        else:
+            if signature is None:
+                signature = self.signature(unigrams)
+            keys = self.band_keys(signature)
+            duplicate = self._probe(external_id, digest, title, unigrams, keys, signature)
+            self._register(external_id, digest, title, unigrams, keys, signature)
+
+        self.duplicates += duplicate
+        return duplicate
+
+    def register(
+            self,
+            external_id: str | None,
+            digest: bytes,
+            title: str,
+            unigrams: np.ndarray,
+            signature: np.ndarray | None = None
+    ) -> None:
+        """Registers an already checked listing (e.g. processed in a previous run) without checking it"""
+        self._register(external_id, digest, title, unigrams, self.band_keys(signature), signature)
+
+    def signature(self, unigrams: np.ndarray) -> np.ndarray | None:
+        """MinHash signature used by the lsh strategy, None for exhaustive or empty sets"""
+        if not self._hasher:
+            return None
+        return self._hasher.hash_signature(self._vocabulary.hashes(unigrams))
+
+    def band_keys(self, signature: np.ndarray | None) -> list[bytes]:
+        if signature is None or not self._hasher:
+            return []
+        return MinHasher.bands(signature, self._bands)
+
+    def _probe(self, external_id, digest, title, unigrams, keys, signature=None) -> bool:
+        # exact rules are answered by hash lookups
+        if external_id and external_id in self._external_ids:
+            return True
+        if digest in self._descriptions:
+            return True
+
+        # similarity rules only run against entries sharing at least one band
+        candidates: set[int] = set()
+        for table, key in zip(self._tables, keys):
+            bucket = table.get(key)
+            if bucket:
+                candidates.update(bucket)
+
+        self.candidate_pairs += len(candidates)
+        if not candidates:
+            return False
+
+        entries = self._prefilter(unigrams, signature, candidates)
+        if not entries.size:
+            return False
+
+        self._mark(unigrams)
+        try:
+            for entry in entries.tolist():
+                self.comparisons += 1
+                if self._is_similar(unigrams, title, entry):
+                    return True
+        finally:
+            self._unmark(unigrams)
+        return False
+
+    def _prefilter(self, unigrams: np.ndarray, signature: np.ndarray | None, candidates: set[int]) -> np.ndarray:
+        """Sorted candidates that can still reach TIEBREAK_THRESHOLD"""
+        entries = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        entries.sort()
+        size = len(unigrams)
+        sizes = self._sizes[entries]
+        # the epsilon keeps boundary pairs (e.g. 4 of 5 tokens) for the exact check
+        kept = entries[np.minimum(sizes, size) >= self.TIEBREAK_THRESHOLD * np.maximum(sizes, size) - 1e-9]
+        # sketches are only compared for the entries left by the size bound
+        if signature is not None and kept.size:
+            agreement = np.count_nonzero(self._sketches[kept] == signature.astype(np.uint8), axis=1)
+            minimum = (self.TIEBREAK_THRESHOLD - self.SKETCH_MARGIN) * self._sketches.shape[1]
+            kept = kept[(agreement >= minimum) | ~self._sketched[kept]]
+        self.prefiltered += int(entries.size - kept.size)
+        return kept
+
+    def _scan(self, external_id, digest, title, unigrams) -> bool:
+        # reference implementation: compare against every previous listing
+        self._mark(unigrams)
+        try:
+            for entry in range(len(self._entries_titles)):
+                self.candidate_pairs += 1
+                self.comparisons += 1
+                if external_id and external_id == self._entries_external_ids[entry]:
+                    return True
+                if digest == self._entries_descriptions[entry]:
+                    return True
+                if self._is_similar(unigrams, title, entry):
+                    return True
+        finally:
+            self._unmark(unigrams)
+        return False
+
+    def _register(self, external_id, digest, title, unigrams, keys=(), signature=None) -> int:
+        self._reserve(unigrams)
+        if external_id:
+            self._external_ids.add(external_id)
+        self._descriptions.add(digest)
+        self._entries_external_ids.append(external_id)
+        self._entries_descriptions.append(digest)
+        self._entries_titles.append(title)
+        self._entries_unigrams.append(unigrams)
+        entry = len(self._entries_titles) - 1
+        for table, key in zip(self._tables, keys):
+            table.setdefault(key, []).append(entry)
+
+        if entry >= len(self._sizes):
+            grow = len(self._sizes)
+            self._sizes = np.concatenate([self._sizes, np.zeros(grow, dtype=np.int64)])
+            self._sketches = np.concatenate([self._sketches, np.zeros((grow, self._sketches.shape[1]), dtype=np.uint8)])
+            self._sketched = np.concatenate([self._sketched, np.zeros(grow, dtype=bool)])
+        self._sizes[entry] = len(unigrams)
+        if signature is not None and self._hasher:
+            self._sketches[entry] = signature.astype(np.uint8)
+            self._sketched[entry] = True
+        return entry
+
+    def _reserve(self, unigrams: np.ndarray) -> None:
+        # marks must cover every id checked or registered; ids are sorted so
+        # the last one is the largest, double until it fits
+        if unigrams.size and unigrams[-1] >= len(self._marks):
+            size = len(self._marks)
+            while size <= unigrams[-1]:
+                size *= 2
+            self._marks = np.zeros(size, dtype=bool)
+
+    def _mark(self, unigrams: np.ndarray) -> None:
+        self._reserve(unigrams)
+        self._marks[unigrams] = True
+
+    def _unmark(self, unigrams: np.ndarray) -> None:
+        self._marks[unigrams] = False
+
+    def _is_similar(self, unigrams: np.ndarray, title: str, entry: int) -> bool:
+        # get the size of intersection A in B, A being the marked listing
+        entry_unigrams = self._entries_unigrams[entry]
+        start = perf_counter()
+        intersection_count = int(np.count_nonzero(self._marks[entry_unigrams]))
+        self.intersection_time += perf_counter() - start
+        if not intersection_count:
+            return False
+
+        return self._similar(intersection_count, len(unigrams), len(entry_unigrams), title == self._entries_titles[entry])
+
+    @classmethod
+    def is_similar(cls, unigrams_a: set[str], title_a: str, unigrams_b: set[str], title_b: str) -> bool:
+        """Similarity rules on plain token sets, for listings outside of this deduplicator"""
+        intersection_count = len(unigrams_a & unigrams_b)
+        if not intersection_count:
+            return False
+        return cls._similar(intersection_count, len(unigrams_a), len(unigrams_b), title_a == title_b)
+
+    @classmethod
+    def _similar(cls, intersection_count: int, size_a: int, size_b: int, same_title: bool) -> bool:
+        # get the size of union A with B, then Jaccard index
+        union_count = size_a + size_b - intersection_count
+        jaccard_sim = intersection_count / union_count
+
+        if jaccard_sim >= cls.DUPLICATE_THRESHOLD:
+            return True
+
+        # If between 80% and 90% we check title as tie-breaker
+        return cls.TIEBREAK_THRESHOLD <= jaccard_sim <= cls.DUPLICATE_THRESHOLD and same_title
+
+    @staticmethod
+    def digest(text: str | None) -> bytes:
+        return hashlib.sha1((text or "").encode("utf-8")).digest()
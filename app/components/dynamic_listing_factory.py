@@ -1,10 +1,40 @@
 from app.entities import DynamicListing
 from app.loaders import MappingsLoader
 from typing import Any
+import hashlib
 import json
 
 class DynamicListingFactory:
 
+    # fields with their own listing_fields column, other promoted fields go to its extra JSON
+    COLUMNS = ("external_id", "title", "description", "job_level")
+
+    @staticmethod
+    def fingerprint() -> str:
+        """Projections are only valid for the same promoted fields and provider/platform mappings"""
+        mappings = MappingsLoader.get_mappings()
+        version = json.dumps({
+            "fields": sorted(DynamicListing.__annotations__.keys()),
+            "provider": mappings["provider"],
+            "platform": mappings["platform"],
+        }, sort_keys=True)
+        return hashlib.sha1(version.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def to_row(cls, listing_id: int, listing: DynamicListing, version: str) -> tuple:
+        """listing_fields row: listing_id, version, the COLUMNS, extra"""
+        extra = {
+            field: getattr(listing, field)
+            for field in DynamicListing.__annotations__
+            if field != "id" and field not in cls.COLUMNS and getattr(listing, field) is not None
+        }
+        return (
+            listing_id,
+            version,
+            *(getattr(listing, column) for column in cls.COLUMNS),
+            json.dumps(extra, default=str) if extra else None,
+        )
+
     @staticmethod
     def create(listing_id: int, raw_data: str) -> DynamicListing|None:
 
@@ -0,0 +1,190 @@
+from collections import Counter
+from typing import Any, Iterable
+
+import numpy as np
+
+
+class IncidenceMatrix:
+    """Boolean listing x (topic, canonical term) matrix, in CSR form.
+
+    A row per matched listing (in processing order), with its listing id and
+    job level kept in parallel arrays. Counts for any slice (topic, job level,
+    set of listings) are a bincount over the selected rows, so they can be
+    computed again without running the matcher. Rows are appended per chunk
+    (streaming), the arrays are only concatenated when read.
+    """
+
+    levels: list[str]
+    columns: list[tuple[str, str]]
+
+    def __init__(self, levels: Iterable[str]) -> None:
+        self.levels = list(levels)
+        self.columns = []
+        self._level_codes = {level: code for code, level in enumerate(self.levels)}
+        self._column_ids: dict[tuple[str, str], int] = {}
+        # chunks appended since the last read
+        self._pending: list[tuple[list[int], list[int], list[int], list[int]]] = []
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._listing_ids = np.zeros(0, dtype=np.int64)
+        self._job_levels = np.zeros(0, dtype=np.int16)
+        self._column_topics: np.ndarray | None = None
+        self._topic_codes: dict[str, int] = {}
+
+    def add_rows(self, rows: Iterable[tuple[int, str, dict[str, set[str]]]]) -> int:
+        """Appends (listing id, job level, matched terms by topic) rows, returns how many"""
+        column_ids = self._column_ids
+        level_codes = self._level_codes
+        lengths, indices, listing_ids, job_levels = [], [], [], []
+        for listing_id, job_level, matches in rows:
+            row: list[int] = []
+            for topic, terms in matches.items():
+                for term in terms:
+                    key = (topic, term)
+                    column = column_ids.get(key)
+                    if column is None:
+                        column = column_ids[key] = len(self.columns)
+                        self.columns.append(key)
+                    row.append(column)
+            row.sort()
+            indices.extend(row)
+            lengths.append(len(row))
+            listing_ids.append(listing_id)
+            # unknown levels fail like a missing bucket would
+            job_levels.append(level_codes[job_level])
+        if lengths:
+            self._pending.append((lengths, indices, listing_ids, job_levels))
+            self._column_topics = None
+        return len(lengths)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        lengths = np.fromiter((n for chunk in self._pending for n in chunk[0]), dtype=np.int64)
+        indices = np.fromiter((i for chunk in self._pending for i in chunk[1]), dtype=np.int32)
+        listing_ids = np.fromiter((i for chunk in self._pending for i in chunk[2]), dtype=np.int64)
+        job_levels = np.fromiter((code for chunk in self._pending for code in chunk[3]), dtype=np.int16)
+        self._indptr = np.concatenate([self._indptr, self._indptr[-1] + np.cumsum(lengths)])
+        self._indices = np.concatenate([self._indices, indices])
+        self._listing_ids = np.concatenate([self._listing_ids, listing_ids])
+        self._job_levels = np.concatenate([self._job_levels, job_levels])
+        self._pending = []
+
+    @property
+    def indptr(self) -> np.ndarray:
+        self._flush()
+        return self._indptr
+
+    @property
+    def indices(self) -> np.ndarray:
+        self._flush()
+        return self._indices
+
+    @property
+    def listing_ids(self) -> np.ndarray:
+        self._flush()
+        return self._listing_ids
+
+    @property
+    def job_levels(self) -> np.ndarray:
+        """Job level code per row, an index into self.levels"""
+        self._flush()
+        return self._job_levels
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.indptr) - 1, len(self.columns)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def rows(self, job_level: str | None = None, listing_ids: Iterable[int] | None = None) -> np.ndarray:
+        """Row mask of a slice, every row by default"""
+        mask = np.ones(len(self), dtype=bool)
+        if job_level is not None:
+            mask &= self.job_levels == self._level_codes[job_level]
+        if listing_ids is not None:
+            mask &= np.isin(self.listing_ids, list(listing_ids))
+        return mask
+
+    def columns_of(self, topic: str) -> np.ndarray:
+        """Column mask of a topic's terms"""
+        if self._column_topics is None:
+            self._topic_codes = {}
+            codes = [self._topic_codes.setdefault(topic, len(self._topic_codes)) for topic, _ in self.columns]
+            self._column_topics = np.asarray(codes, dtype=np.int32)
+        code = self._topic_codes.get(topic, -1)
+        return self._column_topics == code
+
+    def matched(self, rows: np.ndarray | None = None) -> int:
+        """Rows with at least one term"""
+        lengths = np.diff(self.indptr)
+        return int(np.count_nonzero(lengths if rows is None else lengths[rows]))
+
+    def column_counts(self, rows: np.ndarray | None = None) -> np.ndarray:
+        """Listings per column, over the given rows"""
+        indices = self.indices
+        if rows is not None:
+            indices = indices[self._expand(rows)]
+        return np.bincount(indices, minlength=len(self.columns))
+
+    def counts(self, topic: str | None = None, rows: np.ndarray | None = None) -> Counter:
+        """Listings per term of a slice (every topic by default, terms shared by topics are added up).
+        Terms are in the order they first show up, as counting the rows one by one would give"""
+        selected = np.ones(len(self.indices), dtype=bool) if rows is None else self._expand(rows)
+        if topic is not None:
+            selected &= self.columns_of(topic)[self.indices]
+
+        positions = np.flatnonzero(selected)
+        columns, first = np.unique(self.indices[positions], return_index=True)
+        if not columns.size:
+            return Counter()
+        first_rows = np.searchsorted(self.indptr, positions[first], side="right") - 1
+        totals = np.bincount(self.indices[positions], minlength=len(self.columns))
+
+        # rows add their terms sorted, so ties on the first row go by term
+        order = sorted(zip(first_rows.tolist(), columns.tolist()), key=lambda pair: (pair[0], self.columns[pair[1]][1]))
+        counter = Counter()
+        for _row, column in order:
+            counter[self.columns[column][1]] += int(totals[column])
+        return counter
+
+    def to_buckets(self, topics: list[str]) -> dict[str, dict[str, Any]]:
+        """Buckets as Processor builds them: per topic and job level, topic totals and the global total"""
+        per_level_listings = np.bincount(self.job_levels, minlength=len(self.levels))
+        counts, first_rows = self._level_table()
+
+        buckets: dict[str, dict[str, Any]] = {
+            "total": {"listings_counter": self.matched(), "matches_counter": Counter()}
+        }
+        for topic in topics:
+            topic_columns = np.flatnonzero(self.columns_of(topic))
+            bucket = {"listings_counter": int(per_level_listings.sum()), "matches_counter": Counter(), "per_level": {}}
+            for code, level in enumerate(self.levels):
+                present = topic_columns[counts[code, topic_columns] > 0]
+                order = sorted(present.tolist(), key=lambda column: (first_rows[code, column], self.columns[column][1]))
+                level_counter = Counter({self.columns[column][1]: int(counts[code, column]) for column in order})
+                bucket["per_level"][level] = {
+                    "listings_counter": int(per_level_listings[code]),
+                    "matches_counter": level_counter,
+                }
+                bucket["matches_counter"].update(level_counter)
+            buckets[topic] = bucket
+            buckets["total"]["matches_counter"].update(bucket["matches_counter"])
+        return buckets
+
+    def _level_table(self) -> tuple[np.ndarray, np.ndarray]:
+        """(listings, first row) per job level x column, in one pass over the stored terms"""
+        shape = (len(self.levels), len(self.columns))
+        rows = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+        keys = self.job_levels[rows].astype(np.int64) * shape[1] + self.indices
+        counts = np.bincount(keys, minlength=shape[0] * shape[1]).reshape(shape)
+        # terms are stored in row order, the first position of a key is its first row
+        first_rows = np.full(shape[0] * shape[1], -1, dtype=np.int64)
+        unique, first = np.unique(keys, return_index=True)
+        first_rows[unique] = rows[first]
+        return counts, first_rows.reshape(shape)
+
+    def _expand(self, rows: np.ndarray) -> np.ndarray:
+        # row mask -> mask over the stored terms
+        return np.repeat(rows, np.diff(self.indptr))
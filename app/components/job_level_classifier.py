@@ -0,0 +1,85 @@
+from typing import Iterable
+
+from app.loaders import MappingsLoader
+
+
+class JobLevelClassifier:
+    """Canonical job_level variations compiled into a single token lookup.
+
+    Levels are ordered by hierarchy in the mappings and later levels win,
+    so every variation gets the rank of its level (0 is the highest). Single
+    word variations are probed with one dict lookup per title token, multi
+    word ones ("entry level") are phrases indexed by their first token.
+    """
+
+    _COMPILED: dict[str, 'JobLevelClassifier'] = {}
+
+    levels: list[str]
+    fallback: str
+    probes: int
+
+    def __init__(self, job_levels: dict[str, list[str]]) -> None:
+        # levels are ordered by hierarchy, the last one ("other") is used as
+        # fallback when the platform value is missing or isn't a canonical level
+        self.levels = list(job_levels.keys())
+        self.fallback = self.levels[-1]
+        self.probes = 0
+
+        self._tokens: dict[str, int] = {}
+        self._phrases: dict[str, list[tuple[tuple[str, ...], int]]] = {}
+        for rank, canonical in enumerate(reversed(self.levels)):
+            for variation in job_levels[canonical]:
+                tokens = tuple(variation.split())
+                if not tokens:
+                    continue
+                if len(tokens) == 1:
+                    # a variation listed under several levels keeps the highest one
+                    self._tokens[tokens[0]] = min(rank, self._tokens.get(tokens[0], rank))
+                else:
+                    self._phrases.setdefault(tokens[0], []).append((tokens, rank))
+
+    @classmethod
+    def compile(cls) -> 'JobLevelClassifier':
+        """Returns the classifier for the current mappings, compiling it only once per mappings.json version"""
+        fingerprint = MappingsLoader.fingerprint()
+        if fingerprint not in cls._COMPILED:
+            # mappings are cached by the loader too, reload them when the file changed
+            if cls._COMPILED:
+                MappingsLoader.load_mappings()
+            job_levels = MappingsLoader.get_mappings()["canonical"].get("job_level")
+            if not job_levels:
+                raise Exception("Job levels were not found in canonical mappings")
+            cls._COMPILED = {fingerprint: cls(job_levels)}
+        return cls._COMPILED[fingerprint]
+
+    def classify(self, title: str | None) -> str | None:
+        """Highest level with a variation in the (sanitized) title, None when nothing matches"""
+        if not title:
+            return None
+
+        tokens = title.split()
+        best = len(self.levels)
+        lookup = self._tokens.get
+        phrases = self._phrases
+        for position, token in enumerate(tokens):
+            self.probes += 1
+            rank = lookup(token)
+            if rank is not None and rank < best:
+                best = rank
+            for phrase, rank in phrases.get(token, ()):
+                if rank < best and tuple(tokens[position:position + len(phrase)]) == phrase:
+                    best = rank
+            if best == 0:
+                break
+
+        return self.levels[-1 - best] if best < len(self.levels) else None
+
+    def classify_batch(self, titles: Iterable[str | None]) -> list[str | None]:
+        """classify for many titles, repeated titles (common across listings) are scanned once"""
+        seen: dict[str | None, str | None] = {}
+        levels = []
+        for title in titles:
+            if title not in seen:
+                seen[title] = self.classify(title)
+            levels.append(seen[title])
+        return levels
@@ -0,0 +1,203 @@
+from typing import Any, Iterable
+import math
+
+import numpy as np
+
+from app import config
+
+# (name, sorted label pairs)
+_Key = tuple[str, tuple[tuple[str, str], ...]]
+
+
+class Histogram:
+    """Fixed bucket histogram, observations are counted per upper bound (+Inf last)"""
+
+    bounds: np.ndarray
+    counts: np.ndarray
+    sum: float
+    count: int
+
+    def __init__(self, bounds: Iterable[float]):
+        self.bounds = np.asarray(sorted(bounds), dtype=np.float64)
+        self.counts = np.zeros(len(self.bounds) + 1, dtype=np.int64)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[int(np.searchsorted(self.bounds, value, side="left"))] += 1
+        self.sum += value
+        self.count += 1
+
+    def observe_many(self, values: Iterable[float]) -> None:
+        values = np.fromiter(values, dtype=np.float64)
+        if not values.size:
+            return
+        indexes = np.searchsorted(self.bounds, values, side="left")
+        self.counts += np.bincount(indexes, minlength=len(self.counts))
+        self.sum += float(values.sum())
+        self.count += int(values.size)
+
+    def merge(self, other: 'Histogram') -> None:
+        if not np.array_equal(self.bounds, other.bounds):
+            raise ValueError("Histograms with different buckets can't be merged")
+        self.counts += other.counts
+        self.sum += other.sum
+        self.count += other.count
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "buckets": {**{_format(bound): int(count) for bound, count in zip(self.bounds, self.counts)},
+                        "+Inf": int(self.counts[-1])},
+            "sum": round(self.sum, 6),
+            "count": self.count,
+        }
+
+
+class WarningBuffer:
+    """Counts every warning of a kind but only keeps the first few messages"""
+
+    total: int
+    samples: list[Any]
+    limit: int
+
+    def __init__(self, limit: int):
+        self.total = 0
+        self.samples = []
+        self.limit = limit
+
+    def add(self, message: Any) -> None:
+        self.total += 1
+        if len(self.samples) < self.limit:
+            self.samples.append(message)
+
+    def merge(self, other: 'WarningBuffer') -> None:
+        self.total += other.total
+        self.samples.extend(other.samples[:self.limit - len(self.samples)])
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"total": self.total, "samples": self.samples}
+
+
+class MetricsRegistry:
+    """Counters, histograms and warnings of a processing run.
+
+    Cheap enough for the per-listing loops, unlike Metric.append_info (a dict
+    entry per call): counters are a dict increment, histograms take whole
+    arrays at once and warnings keep config.metrics.warning_samples messages
+    per kind plus a total. Snapshots are saved to the metric_runs table
+    (Database.save_metric_run) and export to the Prometheus text format.
+    """
+
+    # upper bounds for sizes per listing (ngrams, matches...)
+    SIZE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    counters: dict[_Key, float]
+    histograms: dict[_Key, Histogram]
+    warnings: dict[str, WarningBuffer]
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.warnings = {}
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def histogram(self, name: str, bounds: Iterable[float] | None = None, **labels: str) -> Histogram:
+        key = self._key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(self.SIZE_BUCKETS if bounds is None else bounds)
+        return self.histograms[key]
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        self.histogram(name, **labels).observe(value)
+
+    def observe_many(self, name: str, values: Iterable[float], **labels: str) -> None:
+        self.histogram(name, **labels).observe_many(values)
+
+    def warn(self, kind: str, message: Any) -> None:
+        if kind not in self.warnings:
+            self.warnings[kind] = self.warning_buffer()
+        self.warnings[kind].add(message)
+
+    @staticmethod
+    def warning_buffer() -> WarningBuffer:
+        return WarningBuffer(config.metrics.warning_samples)
+
+    def merge(self, other: 'MetricsRegistry') -> 'MetricsRegistry':
+        """Adds another registry's numbers to this one (shard workers)"""
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, histogram in other.histograms.items():
+            if key in self.histograms:
+                self.histograms[key].merge(histogram)
+            else:
+                self.histograms[key] = histogram
+        for kind, buffer in other.warnings.items():
+            self.add_warnings(kind, buffer)
+        return self
+
+    def add_warnings(self, kind: str, buffer: WarningBuffer) -> None:
+        """Merges warnings collected apart (e.g. per step) into this registry"""
+        if kind not in self.warnings:
+            self.warnings[kind] = self.warning_buffer()
+        self.warnings[kind].merge(buffer)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(self.counters.items())],
+            "histograms": [{"name": name, "labels": dict(labels), **histogram.to_dict()}
+                           for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0])],
+            "warnings": {kind: buffer.to_dict() for kind, buffer in sorted(self.warnings.items())},
+        }
+
+    def to_prometheus(self, prefix: str = "market_analysis") -> str:
+        """Snapshot in the Prometheus text exposition format (textfile collector, pushgateway)"""
+        lines: list[str] = []
+        typed: set[str] = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{prefix}_{name}_total"
+            declare(metric, "counter")
+            lines.append(f"{metric}{_labels(labels)} {_format(value)}")
+
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            metric = f"{prefix}_{name}"
+            declare(metric, "histogram")
+            cumulative = np.cumsum(histogram.counts)
+            for bound, count in zip([*map(_format, histogram.bounds), "+Inf"], cumulative):
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', bound),))} {int(count)}")
+            lines.append(f"{metric}_sum{_labels(labels)} {_format(histogram.sum)}")
+            lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+
+        if self.warnings:
+            metric = f"{prefix}_warnings_total"
+            declare(metric, "counter")
+            for kind, buffer in sorted(self.warnings.items()):
+                lines.append(f"{metric}{_labels((('kind', kind),))} {buffer.total}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _key(name: str, labels: dict[str, str]) -> _Key:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _format(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
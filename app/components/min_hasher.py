@@ -0,0 +1,52 @@
+from typing import Iterable
+import zlib
+
+import numpy as np
+
+
+class MinHasher:
+    """MinHash signatures over token sets, used to estimate Jaccard similarity"""
+
+    # universal hashing: h(x) = ((a * x + b) mod p) truncated to 32 bits
+    _MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+    _MAX_HASH = np.uint64((1 << 32) - 1)
+
+    permutations: int
+
+    def __init__(self, permutations: int = 120, seed: int = 1) -> None:
+        self.permutations = permutations
+
+        # fixed seed and a stable token hash (crc32, not the builtin hash which is
+        # salted per process) so signatures can be compared across runs and processes
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, self._MERSENNE_PRIME, size=permutations, dtype=np.uint64)
+        self._b = generator.randint(0, self._MERSENNE_PRIME, size=permutations, dtype=np.uint64)
+        self._token_hashes: dict[str, int] = {}
+
+    def hash_token(self, token: str) -> int:
+        hashed = self._token_hashes.get(token)
+        if hashed is None:
+            hashed = zlib.crc32(token.encode("utf-8"))
+            self._token_hashes[token] = hashed
+        return hashed
+
+    def signature(self, tokens: Iterable[str]) -> np.ndarray | None:
+        """Returns the signature for a token set, or None if the set is empty"""
+        hashes = np.fromiter((self.hash_token(token) for token in tokens), dtype=np.uint64)
+        return self.hash_signature(hashes)
+
+    def hash_signature(self, hashes: np.ndarray) -> np.ndarray | None:
+        """Same as signature, from already hashed (uint64) tokens"""
+        if not hashes.size:
+            return None
+
+        # overflow on the multiplication wraps around, which is fine (and deterministic)
+        permuted = (hashes[:, np.newaxis] * self._a + self._b) % self._MERSENNE_PRIME
+        return (permuted & self._MAX_HASH).min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def bands(signature: np.ndarray, bands: int) -> list[bytes]:
+        """Splits a signature into hashable band keys for locality-sensitive hashing"""
+        rows = len(signature) // bands
+        return [signature[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+
@@ -0,0 +1,83 @@
+import hashlib
+import json
+
+from app.components.text_processor import TextProcessor
+from app.entities import Topic
+from app import config
+
+
+class PhraseTrie:
+    """Token trie of every multi-word canonical term and alias of a set of topics.
+
+    Terms are sanitized the same way listing texts are but keep their
+    stopwords, "ruby on rails" is stored under ("ruby", "on", "rails") and is
+    walked over the text tokens before stopwords are removed (without them
+    "go language" would be ("language",) and match any "english language").
+    Walking a text only extends the spans that are still a prefix of some
+    term, and only complete terms are emitted, as the term itself, so
+    TermIndex finds them as they are written in the topic files.
+    """
+
+    _COMPILED: dict[tuple[str, ...], 'PhraseTrie'] = {}
+
+    # children are keyed by token, a node's phrases sit under the empty key (tokens are never empty)
+    _root: dict[str, dict]
+    _phrases: list[tuple[tuple[str, ...], str]]
+
+    def __init__(self, topics: list[Topic]) -> None:
+        self._root = {}
+        self._phrases = []
+        seen: set[str] = set()
+        for topic in topics:
+            for canonical, aliases in topic.terms.items():
+                for term in (canonical, *aliases):
+                    if term not in seen:
+                        seen.add(term)
+                        self.add(term)
+
+    @classmethod
+    def compile(cls, topics: list[Topic]) -> 'PhraseTrie':
+        """Returns the trie for a topic selection, compiling it only once"""
+        key = tuple(sorted({topic.title for topic in topics}))
+        if key not in cls._COMPILED or config.mode.dev:
+            cls._COMPILED[key] = cls(topics)
+        return cls._COMPILED[key]
+
+    def add(self, term: str) -> None:
+        tokens = tuple(TextProcessor.sanitize(term).split())
+        # single tokens are unigrams, matched without the trie
+        if len(tokens) < 2:
+            return
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        phrases = node.setdefault("", [])
+        if term not in phrases:
+            phrases.append(term)
+            self._phrases.append((tokens, term))
+
+    def extract(self, words: list[str]) -> set[str]:
+        """Terms found in a list of tokens (stopwords included), each start is only extended
+        while it's a term prefix"""
+        found: set[str] = set()
+        root = self._root
+        count = len(words)
+        for start in range(count):
+            node = root.get(words[start])
+            position = start + 1
+            while node is not None:
+                phrases = node.get("")
+                if phrases:
+                    found.update(phrases)
+                if position == count:
+                    break
+                node = node.get(words[position])
+                position += 1
+        return found
+
+    def fingerprint(self) -> str:
+        """Hash of every stored phrase, extracted ngrams depend on it"""
+        return hashlib.sha1(json.dumps(sorted(self._phrases)).encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._phrases)
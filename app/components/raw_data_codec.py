@@ -0,0 +1,161 @@
+from collections import Counter
+from typing import Iterable
+import struct
+import zlib
+import re
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for the "zstd" codec
+    zstandard = None
+
+from app import config
+
+
+class RawDataCodec:
+    """Storage format of listings.raw_data.
+
+    Plain JSON text is stored as is (TEXT). Compressed rows are BLOBs with a
+    5 byte header: codec byte (b"z" zlib, b"s" zstd) and the id of the
+    dictionary they were compressed with (0 for none), so rows written with
+    different settings or dictionaries can live in the same table.
+
+    Dictionaries are trained on the listings (mostly the same JSON keys and
+    description boilerplate) and kept in the compression_dictionaries table,
+    the Database registers them here when it connects.
+    """
+
+    CODECS = ("none", "zlib", "zstd")
+
+    _HEADER = struct.Struct(">cI")
+    # json fields and description lines, the repeated parts of listings
+    _FRAGMENTS = re.compile(rb'\\n|\n|, "')
+    _MARKERS = {"zlib": b"z", "zstd": b"s"}
+
+    # dictionary id -> (codec, data)
+    _DICTIONARIES: dict[int, tuple[str, bytes]] = {}
+    # codec -> dictionary id used for new rows
+    _ACTIVE: dict[str, int] = {}
+    # compressor/decompressor objects per dictionary, expensive to set up
+    _COMPRESSORS: dict[tuple[str, int], object] = {}
+    _DECOMPRESSORS: dict[tuple[str, int], object] = {}
+
+    @classmethod
+    def encode(cls, raw_data: str | None, codec: str | None = None) -> str | bytes | None:
+        """raw_data as it should be stored, codec defaults to config.database.raw_data.codec"""
+        codec = codec or config.database.raw_data.codec
+        if raw_data is None or codec == "none":
+            return raw_data
+
+        dictionary_id = cls._ACTIVE.get(codec, 0) if config.database.raw_data.dictionary else 0
+        compressor = cls._compressor(codec, dictionary_id)
+        data = raw_data.encode("utf-8")
+        if codec == "zlib":
+            # copies of a primed compressobj skip loading the dictionary every time
+            compressor = compressor.copy()
+            payload = compressor.compress(data) + compressor.flush()
+        else:
+            payload = compressor.compress(data)
+        return cls._HEADER.pack(cls._MARKERS[codec], dictionary_id) + payload
+
+    @classmethod
+    def decode(cls, value: str | bytes | None) -> str | None:
+        """Stored raw_data back to JSON text, whatever format it was written in"""
+        if value is None or isinstance(value, str):
+            return value
+
+        marker, dictionary_id = cls._HEADER.unpack_from(value)
+        payload = memoryview(value)[cls._HEADER.size:]
+        if marker == b"z":
+            decompressor = cls._decompressor("zlib", dictionary_id).copy()
+            data = decompressor.decompress(payload) + decompressor.flush()
+        elif marker == b"s":
+            data = cls._decompressor("zstd", dictionary_id).decompress(payload)
+        else:
+            raise ValueError(f"Unknown raw_data format '{marker!r}'")
+        return data.decode("utf-8")
+
+    @classmethod
+    def register_dictionary(cls, dictionary_id: int, codec: str, data: bytes) -> None:
+        """Makes a dictionary available for decoding, the latest one per codec is used for encoding"""
+        if cls._DICTIONARIES.get(dictionary_id) != (codec, data):
+            cls._COMPRESSORS.pop((codec, dictionary_id), None)
+            cls._DECOMPRESSORS.pop((codec, dictionary_id), None)
+        cls._DICTIONARIES[dictionary_id] = (codec, data)
+        if dictionary_id > cls._ACTIVE.get(codec, 0):
+            cls._ACTIVE[codec] = dictionary_id
+
+    @classmethod
+    def clear_dictionaries(cls) -> None:
+        """Forgets every dictionary, ids are only meaningful within one database"""
+        cls._DICTIONARIES.clear()
+        cls._ACTIVE.clear()
+        cls._COMPRESSORS.clear()
+        cls._DECOMPRESSORS.clear()
+
+    @classmethod
+    def train_dictionary(cls, codec: str, samples: Iterable[str], size: int = 32 * 1024) -> bytes:
+        """Dictionary for the given codec from sample raw_data rows"""
+        samples = [sample.encode("utf-8") for sample in samples if sample]
+        if codec == "zstd":
+            cls._require_zstd()
+            return zstandard.train_dictionary(size, samples).as_bytes()
+
+        # zlib uses the dictionary as a preset window (max 32KB): the most
+        # common lines and fragments, the most frequent at the end (closest)
+        fragments = Counter()
+        for sample in samples:
+            fragments.update(set(cls._FRAGMENTS.split(sample)))
+        dictionary = b""
+        for fragment, count in fragments.most_common():
+            if count < 2 or len(dictionary) + len(fragment) + 1 > min(size, 32 * 1024):
+                continue
+            dictionary = fragment + b"\n" + dictionary
+        return dictionary
+
+    @classmethod
+    def _compressor(cls, codec: str, dictionary_id: int):
+        key = (codec, dictionary_id)
+        if key not in cls._COMPRESSORS:
+            level = config.database.raw_data.level
+            dictionary = cls._dictionary(codec, dictionary_id)
+            if codec == "zlib":
+                zdict = {"zdict": dictionary} if dictionary else {}
+                cls._COMPRESSORS[key] = zlib.compressobj(level, **zdict)
+            elif codec == "zstd":
+                cls._require_zstd()
+                dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+                cls._COMPRESSORS[key] = zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+            else:
+                raise ValueError(f"Unknown raw_data codec '{codec}'")
+        return cls._COMPRESSORS[key]
+
+    @classmethod
+    def _decompressor(cls, codec: str, dictionary_id: int):
+        key = (codec, dictionary_id)
+        if key not in cls._DECOMPRESSORS:
+            dictionary = cls._dictionary(codec, dictionary_id)
+            if codec == "zlib":
+                zdict = {"zdict": dictionary} if dictionary else {}
+                cls._DECOMPRESSORS[key] = zlib.decompressobj(**zdict)
+            else:
+                cls._require_zstd()
+                dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+                cls._DECOMPRESSORS[key] = zstandard.ZstdDecompressor(dict_data=dict_data)
+        return cls._DECOMPRESSORS[key]
+
+    @classmethod
+    def _dictionary(cls, codec: str, dictionary_id: int) -> bytes | None:
+        if not dictionary_id:
+            return None
+        if dictionary_id not in cls._DICTIONARIES:
+            raise LookupError(f"Compression dictionary {dictionary_id} is not registered")
+        dictionary_codec, data = cls._DICTIONARIES[dictionary_id]
+        if dictionary_codec != codec:
+            raise ValueError(f"Dictionary {dictionary_id} is a {dictionary_codec} dictionary, not {codec}")
+        return data
+
+    @staticmethod
+    def _require_zstd() -> None:
+        if zstandard is None:
+            raise ImportError("The zstd codec requires the 'zstandard' package (pip install zstandard)")
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Hashable
+import threading
+
+from app import config
+
+
+class ResultCache:
+    """Thread safe LRU cache for processing results, shared by every dashboard session.
+
+    Entries expire after config.webui.cache.ttl seconds (0 keeps them until
+    evicted), at most config.webui.cache.max_entries are kept. Concurrent
+    requests for the same missing key compute it once, the others wait for
+    that result; requests for other keys aren't blocked meanwhile.
+    """
+
+    max_entries: int
+    ttl: float
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, max_entries: int | None = None, ttl: float | None = None):
+        settings = config.webui.cache
+        self.max_entries = max(1, settings.max_entries if max_entries is None else max_entries)
+        self.ttl = settings.ttl if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (stored at, value)
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._computing: dict[Hashable, threading.Lock] = {}
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """(found, value), counts as a hit or a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], refresh: bool = False) -> Any:
+        """Cached value of key, computing (and storing) it when missing. refresh always computes"""
+        if not refresh:
+            found, value = self.get(key)
+            if found:
+                return value
+
+        with self._lock:
+            computing = self._computing.setdefault(key, threading.Lock())
+        with computing:
+            # someone else may have computed it while this one waited
+            if not refresh:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is not None:
+                    return entry[1]
+            try:
+                value = compute()
+                self.put(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._computing.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] | None = None) -> int:
+        """Drops the entries whose key matches predicate (every entry without one)"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / requests, 3) if requests else None,
+            }
@@ -0,0 +1,66 @@
+import numpy as np
+
+from app.components.vocabulary import Vocabulary
+from app.entities import Topic
+from app import config
+
+
+class TermIndex:
+    """Inverted index of every canonical term and alias to its (topic, canonical) pairs"""
+
+    _COMPILED: dict[tuple[str, ...], 'TermIndex'] = {}
+
+    _index: dict[str, list[tuple[str, str]]]
+
+    def __init__(self, topics: list[Topic]) -> None:
+        self._index = {}
+        for topic in topics:
+            for canonical, aliases in topic.terms.items():
+                for term in (canonical, *aliases):
+                    targets = self._index.setdefault(term, [])
+                    if (topic.title, canonical) not in targets:
+                        targets.append((topic.title, canonical))
+
+    @classmethod
+    def compile(cls, topics: list[Topic]) -> 'TermIndex':
+        """Returns the index for a topic selection, compiling it only once"""
+        key = tuple(topic.title for topic in topics)
+        if key not in cls._COMPILED or config.mode.dev:
+            cls._COMPILED[key] = cls(topics)
+        return cls._COMPILED[key]
+
+    def match(self, ngrams: set[str]) -> dict[str, set[str]]:
+        """Probes each ngram once, returns matched canonical terms grouped by topic title"""
+        matches: dict[str, set[str]] = {}
+        index = self._index
+        for ngram in ngrams:
+            targets = index.get(ngram)
+            if not targets:
+                continue
+            for topic, canonical in targets:
+                if topic not in matches:
+                    matches[topic] = set()
+                matches[topic].add(canonical)
+        return matches
+
+    def mask(self, vocabulary: Vocabulary) -> np.ndarray:
+        """Flags the vocabulary ids of every indexed term, terms not in the vocabulary are skipped"""
+        mask = np.zeros(len(vocabulary), dtype=bool)
+        ids = [vocabulary.lookup(term) for term in self._index]
+        mask[[term_id for term_id in ids if term_id is not None]] = True
+        return mask
+
+    def match_ids(self, ids: np.ndarray, vocabulary: Vocabulary, mask: np.ndarray) -> dict[str, set[str]]:
+        """Same as match for an id array, mask comes from self.mask(vocabulary)"""
+        matches: dict[str, set[str]] = {}
+        index = self._index
+        # the mask lookup is the intersection, only matched ids are decoded
+        for term_id in ids[mask[ids]].tolist():
+            for topic, canonical in index[vocabulary.term(term_id)]:
+                if topic not in matches:
+                    matches[topic] = set()
+                matches[topic].add(canonical)
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._index)
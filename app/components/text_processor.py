@@ -1,8 +1,80 @@
+from pathlib import Path
+from typing import TYPE_CHECKING
 import unicodedata
+import hashlib
+import json
+from ftfy.badness import is_bad
+from ftfy import fixes
 import ftfy
 import html
 import re
 
+if TYPE_CHECKING:
+    from app.components.phrase_trie import PhraseTrie
+
+
+class _CategoryTable(dict):
+    """str.translate table for sanitize, each codepoint is resolved once from its unicode category"""
+
+    def __missing__(self, codepoint: int) -> str | None:
+        replacement = self.resolve(chr(codepoint))
+        self[codepoint] = replacement
+        return replacement
+
+    @staticmethod
+    def resolve(character: str) -> str | None:
+        # UC means Unicode Category
+        uc = unicodedata.category(character)
+
+        # Allow Any letters and Numbers
+        if uc[0] in ('L', 'N'):
+            return character
+
+        # Strip Accent Marks, remove emojis/other symbols and control chars
+        if uc in ('Mn', 'So') or uc[0] == 'C':
+            return None
+
+        # normalize spaces
+        if uc[0] == 'Z':
+            return ' '
+
+        # Normalize Currency Marks
+        if uc == 'Sc':
+            return '$'
+
+        # Normalize Quotes
+        if uc in ('Pi', 'Pf'):
+            return '"'
+
+        # Commas are kept by the VIP list but then removed with the other
+        # tech-safe punctuation marks, so they are replaced right away
+        if character == ',':
+            return ' '
+
+        # dashes other than the hyphen and anything not in the VIP list become a whitespace
+        if character in TextProcessor.VIP_CHARS:
+            return character
+
+        return ' '
+
+
+_CATEGORY_TABLE = _CategoryTable()
+
+
+class _FtfyTable(dict):
+    """str.translate table with ftfy's per-character fixers, resolved once per codepoint"""
+
+    def __missing__(self, codepoint: int) -> str:
+        replacement = chr(codepoint)
+        for fixer in (fixes.fix_latin_ligatures, fixes.fix_character_width, fixes.uncurl_quotes, fixes.remove_control_chars):
+            replacement = fixer(replacement)
+        self[codepoint] = replacement
+        return replacement
+
+
+_FTFY_TABLE = _FtfyTable()
+
+
 class TextProcessor:
 
     STOPWORDS: set[str] =[
@@ -29,6 +101,14 @@ class TextProcessor:
     ]
     VIP_CHARS = {'+', '#', '.', ',', '-', '$', ' ', "'"}
 
+    _SOURCE_DIGEST: str | None = None
+
+    _FTFY_TRIGGERS = re.compile('[&\x1b\x80-\x9f\ud800-\udfff]')
+    _SYMBOLS = re.compile(r'[.#+-]')
+    _STANDALONE_PUNCTUATION = re.compile(r'(?<!\w)[.#+-](?!\w)')
+    _LEADING_SYMBOLS = re.compile(r'\s[.#+-](?=[a-zA-Z0-9])')
+    _TRAILING_PUNCTUATION = re.compile(r'(?<=\w)[.,](?=\s|$)')
+
     @classmethod
     def remove_stopwords(cls, text: str) -> str:
         return " ".join([
@@ -42,6 +122,104 @@ class TextProcessor:
         if not text:
             return ""
 
+        # Pure ASCII text can't hold broken encoding or anything the unicode
+        # normalizations would change, so it skips ftfy (unless it has html
+        # entities or terminal escapes) and normalization altogether
+        if cls._FTFY_TRIGGERS.search(text):
+            text = cls._fix_text(text)
+
+        elif not text.isascii():
+            # ftfy fixes text line by line and only decodes lines that look
+            # like mojibake, clean lines just go through its cheap fixers
+            fixed = cls._fix_clean_text(text)
+            text = cls._fix_text(text) if fixed is None else cls._normalize(fixed)
+
+        if not text:
+            return ""
+
+        # A leading dash is the only context-dependent replacement: it's kept
+        # if the last or the second char is a letter (reference behavior)
+        leading = ""
+        if unicodedata.category(text[0]) == 'Pd':
+            letters = len(text) > 1 and (
+                unicodedata.category(text[-1]).startswith('L')
+                or unicodedata.category(text[1]).startswith('L')
+            )
+            leading = "-" if letters else " "
+            text = text[1:]
+
+        # Individual char replacements based on Unicode Category, resolved
+        # once per codepoint and applied by str.translate, then lowercase
+        text = (leading + text.translate(_CATEGORY_TABLE)).lower()
+
+        # Backslashes and the tech-safe punctuation marks were already replaced
+        # by the translation table, the remaining passes depend on each other's
+        # output so they stay sequential - and only run if there's a symbol
+        if cls._SYMBOLS.search(text):
+            # Remove other standalone punctuation that is not between word characters
+            text = cls._STANDALONE_PUNCTUATION.sub(" ", text)
+
+            # Remove common, tech-safe leading symbols for word characters
+            text = cls._LEADING_SYMBOLS.sub(" ", text)
+
+            # Remove trailing punctuation leaded by any char and trailed by white space
+            text = cls._TRAILING_PUNCTUATION.sub(" ", text)
+
+        # Collapse multiple whitespaces into single space and strip edges
+        return " ".join(text.split())
+
+    @classmethod
+    def _fix_text(cls, text: str) -> str:
+        # fix broken encoding
+        text = ftfy.fix_text(text)
+
+        # convert HTML Entities into Unicode
+        text = html.unescape(text)
+
+        return cls._normalize(text)
+
+    @staticmethod
+    def _fix_clean_text(text: str) -> str | None:
+        """What ftfy.fix_text does to text without mojibake, None if some line has it"""
+        segments = []
+        lines = text.split("\n")
+        for index, segment in enumerate(lines):
+            # ftfy segments keep their line break
+            if index < len(lines) - 1:
+                segment += "\n"
+
+            # ASCII lines only lose control chars, which sanitize drops anyway
+            if segment.isascii():
+                segments.append(segment)
+                continue
+
+            if is_bad(segment):
+                return None
+
+            fixed = unicodedata.normalize('NFC', fixes.fix_line_breaks(segment.translate(_FTFY_TABLE)))
+            if fixed != segment and ("&" in fixed or is_bad(fixed)):
+                return None
+
+            segments.append(fixed)
+        return "".join(segments)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        # NFKC then NFD, as in the reference, skipped when text is already normalized
+        if text.isascii():
+            return text
+        if not unicodedata.is_normalized('NFKC', text):
+            text = unicodedata.normalize('NFKC', text)
+        if not unicodedata.is_normalized('NFD', text):
+            text = unicodedata.normalize('NFD', text)
+        return text
+
+    @classmethod
+    def sanitize_reference(cls, text: str) -> str:
+        """Original per-character implementation, kept as the reference for equivalence tests"""
+        if not text:
+            return ""
+
         # fix broken encoding
         text = ftfy.fix_text(text)
 
@@ -163,6 +341,25 @@ class TextProcessor:
 
         return text
 
+    @classmethod
+    def extract_ngrams(cls, text: str, trie: 'PhraseTrie | None' = None) -> dict[str, set[str]]:
+        """unigrams without stopwords, multi-word terms found by the trie and both combined for a sanitized text"""
+        unigrams: set[str] = set(cls.extract_unigrams(cls.remove_stopwords(text)))
+        # phrases are matched on every token, their stopwords included
+        phrases: set[str] = trie.extract(cls.extract_unigrams(text)) if trie is not None else set()
+        return {"unigrams": unigrams, "phrases": phrases, "ngrams": unigrams | phrases}
+
+    @classmethod
+    def fingerprint(cls) -> str:
+        """Hash of the sanitizer/tokenizer logic, changes whenever this module or STOPWORDS change"""
+        if cls._SOURCE_DIGEST is None:
+            cls._SOURCE_DIGEST = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+
+        digest = hashlib.sha1(cls._SOURCE_DIGEST.encode("utf-8"))
+        digest.update(json.dumps(sorted(set(cls.STOPWORDS))).encode("utf-8"))
+        digest.update(ftfy.__version__.encode("utf-8"))
+        return digest.hexdigest()
+
     @staticmethod
     def extract_unigrams(text: str) -> list[str]:
         return text.split()
@@ -0,0 +1,77 @@
+from array import array
+from typing import Collection, Iterable
+import zlib
+
+import numpy as np
+
+
+class Vocabulary:
+    """Session-wide interning of tokens and phrases to integer ids.
+
+    Listings store their ngram bags as sorted uint32 id arrays instead of sets
+    of strings, so a repeated phrase costs 4 bytes per listing instead of a
+    set slot and a string object.
+    """
+
+    _ids: dict[str, int]
+    _terms: list[str]
+    _hashes: array
+
+    def __init__(self, terms: Iterable[str] = ()) -> None:
+        self._ids = {}
+        self._terms = []
+        # stable crc32 per id (same as MinHasher), so signatures don't depend on ids
+        self._hashes = array("I")
+        for term in terms:
+            self.intern(term)
+
+    def intern(self, term: str) -> int:
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._ids[term] = term_id
+            self._terms.append(term)
+            self._hashes.append(zlib.crc32(term.encode("utf-8")))
+        return term_id
+
+    def lookup(self, term: str) -> int | None:
+        """id of an already interned term, without interning it"""
+        return self._ids.get(term)
+
+    def encode(self, terms: Collection[str]) -> np.ndarray:
+        """Interns unique terms (e.g. a set) and returns their ids as a sorted uint32 array"""
+        # most terms are known after the first listings, only misses go through intern
+        lookup = self._ids.get
+        ids = [lookup(term) for term in terms]
+        if None in ids:
+            intern = self.intern
+            ids = [intern(term) if term_id is None else term_id for term_id, term in zip(ids, terms)]
+        encoded = np.array(ids, dtype=np.uint32)
+        encoded.sort()
+        return encoded
+
+    def decode(self, ids: np.ndarray) -> list[str]:
+        terms = self._terms
+        return [terms[term_id] for term_id in ids.tolist()]
+
+    def term(self, term_id: int) -> str:
+        return self._terms[term_id]
+
+    def hashes(self, ids: np.ndarray) -> np.ndarray:
+        """crc32 token hashes for the given ids, as MinHasher expects them"""
+        # the buffer view is dropped right after indexing, so the array can keep growing
+        return np.frombuffer(self._hashes, dtype=np.uint32)[ids].astype(np.uint64)
+
+    def remap(self, other: 'Vocabulary') -> np.ndarray:
+        """Interns every term of another vocabulary, returns an other id -> own id lookup array"""
+        return np.fromiter((self.intern(term) for term in other._terms), dtype=np.uint32, count=len(other))
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __getstate__(self) -> dict:
+        # only terms cross process boundaries, ids and hashes are rebuilt
+        return {"terms": self._terms}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["terms"])
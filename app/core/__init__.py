@@ -1,3 +1,12 @@
+from app.core.pipeline import Pipeline, Stage
 from app.core.processor import Processor
 
-__all__ = ["Processor"]
\ No newline at end of file
+__all__ = ["Pipeline", "Stage", "Processor", "TermTrends"]
+
+
+def __getattr__(name: str):
+    # TermTrends needs pandas (~40MB), only loaded when trends are queried
+    if name == "TermTrends":
+        from app.core.term_trends import TermTrends
+        return TermTrends
+    raise AttributeError(f"module 'app.core' has no attribute '{name}'")
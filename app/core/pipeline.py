@@ -0,0 +1,95 @@
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Iterable
+
+from app.entities import Metric
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A Processor step: the method it calls and the state it reads and writes.
+
+    requires and provides name Processor state without the leading underscore
+    ("listings" is Processor._listings). The stage is skipped when a required
+    state is empty or when its guard returns False.
+    """
+    name: str
+    requires: tuple[str, ...] = ()
+    provides: tuple[str, ...] = ()
+    guard: Callable[[Any], bool] | None = None
+    options: dict[str, Any] = field(default_factory=dict, hash=False)
+
+
+class Pipeline:
+    """Ordered stages, checked when built: every required state must be an
+    input or be provided by an earlier stage"""
+
+    stages: tuple[Stage, ...]
+    inputs: tuple[str, ...]
+
+    def __init__(self, stages: Iterable[Stage], inputs: Iterable[str] = ()) -> None:
+        self.stages = tuple(stages)
+        self.inputs = tuple(inputs)
+
+        available = set(self.inputs)
+        names = set()
+        for stage in self.stages:
+            if stage.name in names:
+                raise ValueError(f"Stage '{stage.name}' is registered twice")
+            missing = set(stage.requires) - available
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' requires {sorted(missing)}, no earlier stage provides it")
+            names.add(stage.name)
+            available.update(stage.provides)
+
+    def register(self, stage: Stage, before: str | None = None, after: str | None = None) -> 'Pipeline':
+        """New pipeline with the stage added before/after another one, last by default"""
+        stages = list(self.stages)
+        if before is not None:
+            stages.insert(self.index(before), stage)
+        elif after is not None:
+            stages.insert(self.index(after) + 1, stage)
+        else:
+            stages.append(stage)
+        return Pipeline(stages, self.inputs)
+
+    def without(self, *names: str) -> 'Pipeline':
+        return Pipeline([stage for stage in self.stages if stage.name not in names], self.inputs)
+
+    def index(self, name: str) -> int:
+        for index, stage in enumerate(self.stages):
+            if stage.name == name:
+                return index
+        raise KeyError(f"No stage named '{name}'")
+
+    def names(self) -> list[str]:
+        return [stage.name for stage in self.stages]
+
+    @staticmethod
+    def skip_reason(processor: Any, stage: Stage) -> str | None:
+        if stage.guard is not None and not stage.guard(processor):
+            return "guard"
+        for state in stage.requires:
+            if not getattr(processor, f"_{state}", None):
+                return f"no {state}"
+        return None
+
+    def run(self, processor: Any, metric: Metric) -> dict[str, float]:
+        """Calls every stage that isn't skipped on the processor. Their wall time in ms and
+        the skipped ones are added to the metric info, summed up when it runs several times"""
+        timings: dict[str, float] = metric.get_info("stages", {})
+        skipped: dict[str, str] = metric.get_info("skipped", {})
+        for stage in self.stages:
+            reason = self.skip_reason(processor, stage)
+            if reason is not None:
+                skipped[stage.name] = reason
+                continue
+            start = perf_counter()
+            getattr(processor, stage.name)(**stage.options)
+            elapsed = (perf_counter() - start) * 1000
+            timings[stage.name] = round(timings.get(stage.name, 0.0) + elapsed, 3)
+
+        metric.append_info("stages", timings)
+        if skipped:
+            metric.append_info("skipped", skipped)
+        return timings
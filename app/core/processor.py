@@ -1,15 +1,34 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
 from collections import Counter
 from datetime import datetime
 from pathlib import Path
+from time import perf_counter
 from typing import Any
+import hashlib
 import json
+import sys
+import os
 
-from app.entities import DynamicListing, Session, Topic, Metric
+import numpy as np
+
+from app.entities import DynamicListing, Listing, Session, Topic, Metric
 from app.components import DynamicListingFactory
 from app.components import TextProcessor
+from app.components import Deduplicator
+from app.components import TermIndex
+from app.components import PhraseTrie
+from app.components import JobLevelClassifier
+from app.components import Vocabulary
+from app.components import MetricsRegistry
+from app.components import IncidenceMatrix
+from app.components import CoOccurrence
 from app.loaders import MappingsLoader
+from app.loaders import TopicLoader
+from app.persistence import Database
+from app.core.pipeline import Pipeline, Stage
+from app.enums import InfoType
 from app import config
-from enums import InfoType
 
 
 class Processor:
@@ -17,106 +36,568 @@ class Processor:
     _ngrams = None
     _job_levels: dict[str, list] = None
     _buckets: dict[str, dict[str, Any]] = None
+    _incidence: IncidenceMatrix | None = None
+    _co_occurrence: CoOccurrence | None = None
     _listings: dict[int, DynamicListing] = None
     _metrics: dict[str, Metric] = None
+    _registry: MetricsRegistry = None
     _topics: list[Topic] = None
     _session: Session = None
+    _database: Database | None = None
+    _caching: bool = False
+    _preprocessed: dict[int, dict[str, Any]] = None
+    _pending_preprocessed: list[dict[str, Any]] = None
+    _content_hashes: dict[int, str] = None
+    _matches: dict[int, dict[str, set[str]]] = None
+    _signatures: dict[int, Any] = None
+    _deduplicator: Deduplicator | None = None
+    _vocabulary: Vocabulary | None = None
+    _fingerprints: list[dict[str, Any]] | None = None
+    _copies: dict[int, list[tuple[int, int, str | None]]] | None = None
+
+    # what process() runs, new stages can be registered on a subclass or an instance
+    # (e.g. Processor.PIPELINE.register(Stage(...), after="deduplicate"))
+    PIPELINE = Pipeline([
+        Stage("build_listings", requires=("session",), provides=("listings",)),
+        # exact copies are dropped before any text processing
+        Stage("filter_exact_duplicates", requires=("listings",), provides=("copies",),
+              guard=lambda processor: config.processor.deduplication.exact_filter),
+        Stage("sanitize_listings", requires=("listings",), provides=("preprocessed",)),
+        Stage("extract_ngrams", requires=("listings",), provides=("ngrams", "vocabulary")),
+        Stage("deduplicate", requires=("listings", "ngrams")),
+        Stage("extract_job_level", requires=("listings",), provides=("job_levels",)),
+        Stage("match_and_count", requires=("listings", "topics"), provides=("matches", "buckets", "incidence")),
+        Stage("update_totals", requires=("buckets", "incidence"), provides=("buckets",)),
+    ], inputs=("session", "topics"))
+
+    # what process_streaming() runs per chunk, buckets are only totaled after the last one
+    CHUNK_PIPELINE = Pipeline([
+        Stage("filter_exact_duplicates", requires=("listings",), provides=("copies",),
+              guard=lambda processor: config.processor.deduplication.exact_filter),
+        Stage("sanitize_listings", requires=("listings",), provides=("preprocessed",)),
+        Stage("extract_ngrams", requires=("listings",), provides=("ngrams", "vocabulary")),
+        Stage("deduplicate", requires=("listings", "ngrams")),
+        Stage("extract_job_level", requires=("listings",), provides=("job_levels",)),
+        Stage("match_listings", requires=("ngrams", "topics"), provides=("matches",)),
+        Stage("match_and_count", requires=("listings", "topics"), provides=("buckets", "incidence"),
+              options={"reset": False}),
+    ], inputs=("session", "topics", "listings"))
 
     results: list[dict[str, Any]] = None
 
-    # TODO: 1. IMPLEMENT BOOL OR METRICS RETURNS FOR EVERY METHOD THAT RETURNS NONE / HAS EFFECT / CHANGES STATE
-    # TODO: 2. IMPLEMENT GUARD CLAUSES / EARLY RETURN ON PROCESS METHOD
-
-    def __init__(self, session: Session, topics: list[Topic]) -> None:
+    def __init__(self, session: Session, topics: list[Topic], database: Database | None = None) -> None:
         self._session = session
         self._topics = topics
+        self._database = database
+        self._caching = database is not None and config.processor.cache.enabled
         self._metrics = dict()
+        self._registry = MetricsRegistry()
 
     def process(self) -> Metric:
+        if config.processor.execution.mode == "streaming":
+            return self.process_streaming()
+        if self.use_shards():
+            return self.process_sharded()
+
         metric = Metric("process")
 
-        self.build_listings()
+        # state of a previous run of the same processor
+        self._vocabulary = None
+        self._copies = None
+        self._matches = None
+        self._preprocessed = None
+        self._signatures = None
+        self.PIPELINE.run(self, metric)
+
+        metric.success()
+        metric.append_info("total_steps", len(self.PIPELINE.stages))
+        return self.append_metric(metric)
+
+    def process_or_restore(self, refresh: bool = False) -> Metric:
+        """Restores materialized buckets when they are still valid, otherwise processes
+        the session and materializes the buckets. refresh always processes"""
+        metric = Metric("process_or_restore")
+
+        if not self._database or not self._session or self._session.id is None:
+            self.process()
+            metric.success()
+            metric.append_info("restored", False)
+            return self.record_run(metric)
+
+        topics_hash, resources_hash = self.materialization_keys()
+        materialization = None
+        if not refresh:
+            materialization = self._database.get_materialization(self._session.id, topics_hash, resources_hash)
+
+        # only listings appended after the materialization (if any) are processed
+        if materialization is not None and materialization[1] is not None:
+            buckets, watermark = materialization
+            listings = self._database.get_listing_fields(self._session.id, after=watermark)
+            if listings:
+                self.process_increment(buckets, watermark, listings)
+                watermark = max(listings)
+                self._database.save_materialization(
+                    self._session.id, topics_hash, resources_hash, self._buckets, watermark
+                )
+                self._database.save_term_frequencies(self._session.id, self._buckets)
+            else:
+                self._buckets = buckets
+            metric.success()
+            metric.append_info("restored", True)
+            metric.append_info("appended", len(listings))
+            return self.record_run(metric)
+
+        # sessions are loaded without listings when a materialization is expected,
+        # only their projected fields are needed (raw_data isn't read)
+        watermark = self._database.get_last_listing_id(self._session.id)
+        streaming = config.processor.execution.mode == "streaming"
+        if not self._session.listings and not streaming:
+            self._session.listings = self._database.get_listing_fields(self._session.id)
+
+        # fingerprints let later runs deduplicate appended listings against this one
+        self._fingerprints = []
+        process_metric = self.process()
+        self._fingerprints = None
+        if not process_metric.to_dict()["status"] or not self._buckets:
+            metric.failure()
+            metric.append_info("failure", "Processing failed, nothing was materialized")
+            return self.record_run(metric)
+
+        self._database.save_materialization(self._session.id, topics_hash, resources_hash, self._buckets, watermark)
+        # term counts outlive materializations, for trends across sessions
+        self._database.save_term_frequencies(self._session.id, self._buckets)
+        metric.success()
+        metric.append_info("restored", False)
+        return self.record_run(metric)
+
+    def process_increment(
+            self,
+            buckets: dict[str, Any],
+            watermark: int,
+            listings: dict[int, Listing | DynamicListing]
+    ) -> Metric:
+        """Processes listings appended after a materialization and merges them into its buckets.
+        New listings are deduplicated against the related already processed ones only"""
+        metric = Metric("process_increment")
+
+        self._vocabulary = None
+        self._matches = None
+        self._preprocessed = None
+        self._signatures = None
+        self._copies = None
+        self.build_listings(listings)
+        if config.processor.deduplication.exact_filter:
+            self.filter_exact_duplicates()
         self.sanitize_listings()
         self.extract_ngrams()
+
+        self._deduplicator = self.create_deduplicator(self._vocabulary)
+        preloaded = self.preload_fingerprints(watermark)
+        self._fingerprints = []
         self.deduplicate()
+        self._fingerprints = None
+        self._deduplicator = None
+
         self.extract_job_level()
         self.match_and_count()
         self.update_totals()
-        #self.build_results()
+        self._buckets = self.merge_buckets(buckets, self._buckets)
 
         metric.success()
-        metric.append_info("total_steps", 7)
+        metric.append_info("processed", len(listings))
+        metric.append_info("preloaded", preloaded)
         return self.append_metric(metric)
 
-    def deduplicate(self) -> Metric:
-        metric = Metric("deduplicate")
+    def preload_fingerprints(self, watermark: int) -> int:
+        """Registers the previously processed listings that new ones could be duplicates of"""
+        deduplicator = self._deduplicator
+        version = self.fingerprint_version()
+
+        if deduplicator.strategy == "exhaustive":
+            # every previous listing is a candidate
+            related = None
+        else:
+            self._signatures = {
+                index: deduplicator.signature(bags["description"]["unigrams"])
+                for index, bags in self._ngrams.items()
+            }
+            related = self._database.find_fingerprints(
+                self._session.id,
+                version,
+                watermark,
+                [listing.external_id for listing in self._listings.values() if listing.external_id],
+                [Deduplicator.digest(listing.description) for listing in self._listings.values()],
+                [keys for keys in map(deduplicator.band_keys, self._signatures.values()) if keys],
+            )
+
+        fingerprints = self._database.get_fingerprints(self._session.id, version, watermark, related)
+        for fingerprint in fingerprints:
+            signature = fingerprint["signature"]
+            deduplicator.register(
+                fingerprint["external_id"],
+                fingerprint["digest"],
+                fingerprint["title"],
+                self._vocabulary.encode(fingerprint["unigrams"]),
+                np.frombuffer(signature, dtype=np.uint32) if signature is not None else None,
+            )
+        return len(fingerprints)
+
+    @staticmethod
+    def merge_buckets(buckets: dict[str, Any], increment: dict[str, Any]) -> dict[str, Any]:
+        """Adds the counters of increment into buckets (same topics and job levels)"""
+        def merge(target: dict[str, Any], source: dict[str, Any]) -> None:
+            target["listings_counter"] += source["listings_counter"]
+            target["matches_counter"].update(source["matches_counter"])
+            for level, level_bucket in source.get("per_level", {}).items():
+                merge(target["per_level"][level], level_bucket)
+
+        for scope, bucket in increment.items():
+            merge(buckets[scope], bucket)
+        return buckets
+
+    @staticmethod
+    def fingerprint_version() -> str:
+        """Fingerprints are only comparable with the same sanitizer and MinHash settings"""
+        settings = config.processor.deduplication
+        version = f"{TextProcessor.fingerprint()}:{settings.strategy}:{settings.permutations}:{settings.bands}"
+        return hashlib.sha1(version.encode("utf-8")).hexdigest()
+
+    def phrase_trie(self) -> PhraseTrie:
+        """Trie of every topic file plus the selected topics, so cached ngrams
+        stay valid when only the selection changes"""
+        return PhraseTrie.compile(TopicLoader.select(all_topics=True) + self._topics)
+
+    def preprocessing_version(self) -> str:
+        """Cached ngrams are only valid with the same sanitizer and the same phrases"""
+        version = f"{TextProcessor.fingerprint()}:{self.phrase_trie().fingerprint()}"
+        return hashlib.sha1(version.encode("utf-8")).hexdigest()
+
+    def materialization_keys(self) -> tuple[str, str]:
+        """(topics hash, resources hash) a materialization is valid for"""
+        resources = hashlib.sha1()
+        resources.update(MappingsLoader.fingerprint().encode("utf-8"))
+        resources.update(TopicLoader.files_fingerprint().encode("utf-8"))
+        # sanitizer, stopwords and deduplication settings also change the counts
+        resources.update(self.fingerprint_version().encode("utf-8"))
+        resources.update(self.preprocessing_version().encode("utf-8"))
+        resources.update(str(config.processor.deduplication.cross_session).encode("utf-8"))
+        return TopicLoader.fingerprint(self._topics), resources.hexdigest()
+
+    def result_key(self) -> tuple[Any, ...]:
+        """Identifies build_results() output: session, topics, resources and the last listing
+        (appended listings change the results), for caches outside the database"""
+        topics_hash, resources_hash = self.materialization_keys()
+        session_id = self._session.id if self._session else None
+        watermark = self._database.get_last_listing_id(session_id) if self._database and session_id else None
+        return session_id, topics_hash, resources_hash, watermark
+
+    def process_streaming(self) -> Metric:
+        """Pulls listings from the database in chunks and runs every step per chunk.
+        Only the deduplication state and the buckets outlive a chunk"""
+        metric = Metric("process")
 
-        duplicates = set()
+        if not self._database or not self._session or self._session.id is None:
+            metric.failure()
+            metric.append_info("failure", "Streaming requires a database and a stored session")
+            return self.append_metric(metric)
+
+        # the matrix outlives the chunks, not the run: match_and_count(reset=False) only
+        # starts a new one when there is none
+        self._buckets = None
+        self._incidence = None
+        self._signatures = None
+        self._vocabulary = Vocabulary()
+        self._deduplicator = self.create_deduplicator(self._vocabulary)
+
+        chunks = 0
         processed = 0
-        iterations = 0
+        chunk_size = config.processor.execution.chunk_size
+        for listings in self._database.iter_listing_fields(self._session.id, chunk_size):
+            chunks += 1
+            processed += len(listings)
+
+            # per chunk state, dropped when the next chunk comes in
+            self._preprocessed = None
+            self._matches = None
+            self._copies = None
+            self.build_listings(listings)
+            self.CHUNK_PIPELINE.run(self, metric)
+
+        totals = self.update_totals()
+        duplicates = self._deduplicator.duplicates
+        self._deduplicator = None
+
+        if not totals.get_status():
+            metric.failure()
+            metric.append_info("failure", "No buckets were counted")
+            return self.append_metric(metric)
 
-        for index_a, listing_a in self._listings.items():
-            processed += 1
-            # cache reference for set_a outside the inner loop
-            unigrams_a = self._ngrams[index_a].get("description").get("unigrams")
-            for index_b, listing_b in self._listings.items():
-                iterations += 1
+        metric.success()
+        metric.append_info("total_steps", len(self.CHUNK_PIPELINE.stages) + 2)
+        metric.append_info("chunks", chunks)
+        metric.append_info("chunk_size", chunk_size)
+        metric.append_info("processed", processed)
+        metric.append_info("duplicates", duplicates)
+        return self.append_metric(metric)
 
-                # skip if same index
-                if index_a == index_b: continue
+    def use_shards(self) -> bool:
+        settings = config.processor.execution
+        if settings.mode == "sharded":
+            return True
+        if settings.mode == "auto" and self._session and self._session.listings:
+            return len(self._session.listings) >= settings.min_listings and self.workers() > 1
+        return False
 
-                # early detect if external_id available and same
-                if listing_a.external_id and listing_b.external_id:
-                    if listing_a.external_id == listing_b.external_id:
-                        duplicates.add(index_b)
-                        continue
+    @staticmethod
+    def workers() -> int:
+        return config.processor.execution.workers or os.cpu_count() or 1
 
-                # early detect if description is exactly the same
-                if listing_a.description == listing_b.description:
-                    duplicates.add(index_b)
-                    continue
+    def process_sharded(self) -> Metric:
+        """Runs the per-listing steps in a process pool, then deduplicates and counts globally"""
+        metric = Metric("process")
 
-                unigrams_b = self._ngrams[index_b].get("description").get("unigrams")
+        if not self._session or not self._session.listings:
+            metric.failure()
+            metric.append_info("failure", "No session listings available")
+            return self.append_metric(metric)
 
-                # get the size of intersection A in B
-                intersection_count = len(unigrams_a & unigrams_b)
-                if not intersection_count: continue
+        # contiguous shards keep the listings order once merged back
+        workers = self.workers()
+        indexes = list(self._session.listings.keys())
+        shard_count = min(len(indexes), workers * config.processor.execution.shards_per_worker)
+        shard_size = -(-len(indexes) // shard_count)
+        shards = [
+            {index: self._session.listings[index] for index in indexes[start:start + shard_size]}
+            for start in range(0, len(indexes), shard_size)
+        ]
+
+        # cache lookups and writes stay in this process, workers get their entries
+        cached = self._database.get_preprocessed(indexes, self.preprocessing_version()) if self._caching else None
+        shard_caches = [
+            {index: cached[index] for index in shard if index in cached} if cached is not None else None
+            for shard in shards
+        ]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(Processor.process_shard, shards, [self._topics] * len(shards), shard_caches))
+
+        self._listings, self._ngrams, self._job_levels = {}, {}, {}
+        self._matches, self._signatures, self._copies = {}, {}, {}
+        self._vocabulary = Vocabulary()
+        pending: list[dict[str, Any]] = []
+        for number, result in enumerate(results):
+            # every shard interned its own ids, translate them to the merged vocabulary
+            remap = self._vocabulary.remap(result["vocabulary"])
+            for index, bags in result["ngrams"].items():
+                self._ngrams[index] = {
+                    "description": {"unigrams": np.sort(remap[bags["description"]["unigrams"]])},
+                    "ngrams": np.sort(remap[bags["ngrams"]]),
+                }
+            self._listings.update(result["listings"])
+            self._job_levels.update(result["job_levels"])
+            self._matches.update(result["matches"])
+            self._signatures.update(result["signatures"])
+            self._copies.update(result["copies"])
+            pending.extend(result["preprocessed"])
+            for context, shard_metric in result["metrics"].items():
+                self._metrics[f"shard_{number}.{context}"] = shard_metric
+            self._registry.merge(result["registry"])
+
+        if pending and self._database:
+            self._database.save_preprocessed(pending, self.preprocessing_version())
 
-                # get the size of union A with B
-                union_count = len(unigrams_a) + len(unigrams_b) - intersection_count
+        self.deduplicate()
+        self.match_and_count()
+        self.update_totals()
 
-                if not union_count: continue
+        metric.success()
+        metric.append_info("total_steps", len(self.PIPELINE.stages))
+        metric.append_info("shards", len(shards))
+        metric.append_info("workers", workers)
+        return self.append_metric(metric)
 
-                # calculate Jaccard index by dividing intersection per union
-                jaccard_sim = intersection_count / union_count
+    @classmethod
+    def process_shard(
+            cls,
+            listings: dict[int, Listing | DynamicListing],
+            topics: list[Topic],
+            preprocessed: dict[int, dict[str, Any]] | None
+    ) -> dict[str, Any]:
+        """Worker side of process_sharded: every step that only needs the listing itself"""
+        processor = cls(Session(listings=listings), topics)
+        processor._caching = preprocessed is not None
+        processor._preprocessed = preprocessed or {}
+
+        processor.build_listings()
+        # copies are dropped within the shard, the main process feeds them to the deduplicator
+        if config.processor.deduplication.exact_filter:
+            processor.filter_exact_duplicates()
+        processor.sanitize_listings()
+        processor.extract_ngrams()
+        processor.extract_job_level()
+        processor.match_listings()
+
+        # MinHash signatures are the expensive part of deduplication
+        deduplicator = cls.create_deduplicator(processor._vocabulary)
+        signatures = {
+            index: deduplicator.signature(bags["description"]["unigrams"])
+            for index, bags in (processor._ngrams or {}).items()
+        }
 
-                # if sim above 90% mark it as duplicate
-                if jaccard_sim >= 0.90:
-                    duplicates.add(index_b)
-                    continue
-                    #print(f"Near duplicate detected for {index_a} in {index_b}: {jaccard_sim}")
+        return {
+            "listings": processor._listings,
+            "ngrams": processor._ngrams or {},
+            "vocabulary": processor._vocabulary,
+            "job_levels": processor._job_levels or {},
+            "matches": processor._matches or {},
+            "signatures": signatures,
+            "copies": processor._copies or {},
+            "preprocessed": processor._pending_preprocessed or [],
+            "metrics": processor._metrics,
+            "registry": processor._registry,
+        }
+
+    def deduplicate(self) -> Metric:
+        metric = Metric("deduplicate")
+
+        if not self._listings or not self._ngrams:
+            metric.failure()
+            metric.append_info("failure", "No listings or ngrams available")
+            return self.append_metric(metric)
 
-                # If between 80% and 90% we check title as tie-breaker
-                if 0.80 <= jaccard_sim <= 0.90:
-                    #print(f"some similarity detected for {index_a} in {index_b}: {jaccard_sim}")
-                    #print(f"using title as tie-braker: {listing_a.title} == {listing_b.title}?")
-                    if listing_a.title == listing_b.title:
-                        #print("Considered duplicate")
-                        duplicates.add(index_b)
+        # streaming runs feed every chunk to the same deduplicator
+        deduplicator = self._deduplicator or self.create_deduplicator(self._vocabulary)
+
+        duplicates = []
+        processed = 0
+        exact = 0
+        collecting = self._fingerprints is not None
+        # listings dropped by filter_exact_duplicates go in right after the one they followed,
+        # as their original's (signature, fingerprint): the deduplicator ends up in the same state
+        copies = self._copies or {}
+        originals = {original for entries in copies.values() for _, original, _ in entries}
+        kept: dict[int, tuple[Any, dict[str, Any] | None]] = {}
+        with metric.span("check"):
+            for index, listing in self._listings.items():
+                processed += 1
+                unigrams = self._ngrams[index].get("description").get("unigrams")
+                signature = self._signatures.get(index) if self._signatures else None
+                if signature is None:
+                    signature = deduplicator.signature(unigrams)
+                if deduplicator.is_duplicate(listing.external_id, listing.title, listing.description, unigrams, signature):
+                    duplicates.append(index)
+                entry = self._fingerprint_entry(index, listing, unigrams, signature, deduplicator) if collecting else None
+                if collecting:
+                    self._fingerprints.append(entry)
+                if index in originals:
+                    kept[index] = (signature, entry)
+
+                for copy, original, external_id in copies.get(index, ()):
+                    source = self._listings[original]
+                    source_signature, source_entry = kept[original]
+                    source_unigrams = self._ngrams[original]["description"]["unigrams"]
+                    deduplicator.is_duplicate(external_id, source.title, source.description, source_unigrams, source_signature)
+                    exact += 1
+                    if collecting:
+                        self._fingerprints.append({**source_entry, "listing_id": copy, "external_id": external_id})
 
         for index in duplicates:
             self._listings.pop(index)
 
+        # saved as they come, so streaming runs don't hold them all
+        cross_session = None
+        if collecting and self._database:
+            with metric.span("save_fingerprints"):
+                self._database.save_fingerprints(self._session.id, self.fingerprint_version(), self._fingerprints)
+            if config.processor.deduplication.cross_session:
+                with metric.span("cross_session"):
+                    flagged = self.flag_cross_session(self._fingerprints)
+                cross_session = [index for index in flagged if index in self._listings]
+                for index in cross_session:
+                    self._listings.pop(index)
+            self._fingerprints = []
+
+        self._registry.increment("duplicates", len(duplicates), scope="session")
+        self._registry.increment("duplicates", exact, scope="exact")
+        if cross_session is not None:
+            self._registry.increment("duplicates", len(cross_session), scope="cross_session")
+
         metric.success()
-        metric.append_info("duplicates", len(duplicates))
-        metric.append_info("iterations", iterations)
+        metric.append_info("strategy", deduplicator.strategy)
+        # exact copies count as duplicates, as if they had been checked here
+        metric.append_info("duplicates", len(duplicates) + exact)
+        metric.append_info("exact_duplicates", exact)
+        metric.append_info("candidate_pairs", deduplicator.candidate_pairs)
+        metric.append_info("prefiltered", deduplicator.prefiltered)
+        metric.append_info("iterations", deduplicator.comparisons)
         metric.append_info("processed", processed)
+        if cross_session is not None:
+            metric.append_info("cross_session_duplicates", len(cross_session))
+        if deduplicator.comparisons:
+            average = deduplicator.intersection_time / deduplicator.comparisons
+            metric.append_info("intersection_us", round(average * 1e6, 3))
         return self.append_metric(metric)
 
-    def match_and_count(self) -> Metric:
+    def flag_cross_session(self, entries: list[dict[str, Any]]) -> dict[int, int]:
+        """Checks fingerprinted listings against the listings of every other session.
+        The later listing of a duplicate pair is flagged, so flags don't depend on which
+        session is processed first. Returns the flags of the given listings"""
+        version = self.fingerprint_version()
+        matches = self._database.find_cross_session_matches(
+            self._session.id,
+            version,
+            [entry["external_id"] for entry in entries if entry["external_id"]],
+            [entry["digest"] for entry in entries],
+            [entry["bands"] for entry in entries if entry["bands"]],
+        )
+
+        pairs: list[tuple[int, int]] = []
+        candidates: dict[int, set[int]] = {}
+        for entry in entries:
+            exact = matches["external_id"].get(entry["external_id"], set()) | matches["digest"].get(entry["digest"], set())
+            pairs.extend((entry["listing_id"], other) for other in exact)
+            similar = set()
+            for band, key in enumerate(entry["bands"]):
+                similar.update(matches["band"].get((band, key), ()))
+            if similar - exact:
+                candidates[entry["listing_id"]] = similar - exact
+
+        # band matches are only candidates, verify them with the same rules as within a session
+        if candidates:
+            others = self._database.get_fingerprints_by_id(set().union(*candidates.values()))
+            for entry in entries:
+                if entry["listing_id"] not in candidates:
+                    continue
+                unigrams = set(entry["unigrams"])
+                for other in candidates[entry["listing_id"]]:
+                    fingerprint = others[other]
+                    if Deduplicator.is_similar(unigrams, entry["title"], set(fingerprint["unigrams"]), fingerprint["title"]):
+                        pairs.append((entry["listing_id"], other))
+
+        flags: dict[int, int] = {}
+        for pair in pairs:
+            later, earlier = max(pair), min(pair)
+            flags[later] = min(flags.get(later, earlier), earlier)
+
+        # results of other sessions that just got listings flagged are stale
+        changed = self._database.save_duplicate_flags(flags) - {self._session.id}
+        if changed:
+            self._database.delete_materializations(changed)
+        return self._database.get_duplicate_flags([entry["listing_id"] for entry in entries])
+
+    @staticmethod
+    def create_deduplicator(vocabulary: Vocabulary) -> Deduplicator:
+        # "lsh" only compares candidate pairs sharing a MinHash band,
+        # "exhaustive" compares every pair and is kept as a reference
+        settings = config.processor.deduplication
+        return Deduplicator(settings.strategy, settings.permutations, settings.bands, vocabulary)
+
+    def match_and_count(self, reset: bool = True) -> Metric:
         metric = Metric("match_and_count")
 
-        self.generate_buckets()
+        # streaming runs keep adding rows to the same matrix
+        if reset or self._incidence is None:
+            self.generate_buckets()
 
         iterations = 0
         processed = 0
@@ -131,39 +612,85 @@ class Processor:
             metric.append_info("failure", "No topics available")
             return self.append_metric(metric)
 
-        for index, _listing in self._listings.items():
-            # get ngrams for current listing
-            _ngrams: set[str] = self._ngrams[index]["ngrams"]
-            if not _ngrams:
-                message = {"message": f"No ngrams available for listing {index}"}
-                metric.append_info("info", message, InfoType.WARNING)
-                continue
-            matches = 0
-            # process against topics
-            for topic in self._topics:
-                matched_terms = TextProcessor.find_matches(_ngrams, topic.terms)
+        if self._incidence is None:
+            metric.failure()
+            metric.append_info("failure", "No buckets available")
+            return self.append_metric(metric)
+
+        # matches are computed upfront unless a sharded run already did it
+        if self._matches is None:
+            self.match_listings()
+
+        # warnings are counted, only a few messages are kept (a dict entry per listing was slow)
+        missing = self._registry.warning_buffer()
+        unmatched = self._registry.warning_buffer()
+        matches_per_listing: list[int] = []
+        # a row per listing with ngrams, counts come from the matrix in update_totals
+        rows: list[tuple[int, str, dict[str, set[str]]]] = []
+        with metric.span("count"):
+            for index, _listing in self._listings.items():
+                # get matches for current listing
+                matched_terms = self._matches.get(index)
+                if matched_terms is None:
+                    missing.add(f"No ngrams available for listing {index}")
+                    continue
                 iterations += 1
-                if matched_terms:
-                    matches += 1
-                # update deepest bucket
-                mutated_job_level = self._job_levels.get(_listing.id)
-                self.update_buckets(topic.title, mutated_job_level, matched_terms)
-
-            if matches == 0:
-                message = f"No matches for listing {_listing.id}"
-                metric.append_info("message", message, InfoType.WARNING)
-                continue
+                matches_per_listing.append(sum(map(len, matched_terms.values())))
+                rows.append((_listing.id, self._job_levels.get(_listing.id), matched_terms))
 
-            processed += 1
-            self.listing_processed()
+                if not matched_terms:
+                    unmatched.add(f"No matches for listing {_listing.id}")
+                    continue
+
+                processed += 1
+            self._incidence.add_rows(rows)
+
+        self._registry.observe_many("matches_per_listing", matches_per_listing)
+        for kind, buffer in (("no_ngrams", missing), ("no_matches", unmatched)):
+            if buffer.total:
+                self._registry.add_warnings(kind, buffer)
+                metric.append_info(kind, buffer.to_dict(), InfoType.WARNING)
 
         metric.success()
         metric.append_info("processed", processed)
         metric.append_info("iterations", iterations)
         return self.append_metric(metric)
 
+    def match_listings(self) -> Metric:
+        metric = Metric("match_listings")
+
+        if not self._ngrams or not self._topics:
+            metric.failure()
+            metric.append_info("failure", "No ngrams or topics available")
+            return self.append_metric(metric)
+
+        # topics are compiled once into an alias -> (topic, canonical) index,
+        # the mask flags which vocabulary ids are indexed terms, so matching a
+        # listing is one array lookup regardless of topic count
+        term_index = TermIndex.compile(self._topics)
+        mask = term_index.mask(self._vocabulary)
+
+        self._matches = {}
+        iterations = 0
+        elapsed = 0.0
+        for index in self._listings.keys():
+            _ngrams: np.ndarray = self._ngrams[index]["ngrams"]
+            # listings without ngrams get no entry at all
+            if not _ngrams.size:
+                continue
+            start = perf_counter()
+            self._matches[index] = term_index.match_ids(_ngrams, self._vocabulary, mask)
+            elapsed += perf_counter() - start
+            iterations += _ngrams.size
+
+        metric.success()
+        metric.append_info("processed", len(self._matches))
+        metric.append_info("iterations", iterations)
+        if self._matches:
+            metric.append_info("intersection_us", round(elapsed / len(self._matches) * 1e6, 3))
+        return self.append_metric(metric)
+
     def extract_ngrams(self) -> Metric:
-        # Note: currently this is too manual for my taste, need to abstract
         metric = Metric("extract_ngrams")
 
         if not self._listings:
@@ -171,55 +698,77 @@ class Processor:
             metric.append_info("failure", f"No listings to extract ngrams for")
             return self.append_metric(metric)
 
-        self._ngrams = {}
-        processed: int = 0
-        for index, _listing in self._listings.items():
-
-            title = TextProcessor.remove_stopwords(_listing.title)
-            title_unigrams: set[str] = set(TextProcessor.extract_unigrams(title))
-            title_bigrams: set[str] = set(TextProcessor.extract_bigrams(title))
-            title_ngrams: set[str] = title_unigrams | title_bigrams
+        # ids are session wide, streaming chunks keep interning into the same vocabulary
+        if self._vocabulary is None:
+            self._vocabulary = Vocabulary()
+        vocabulary = self._vocabulary
 
-            description = TextProcessor.remove_stopwords(_listing.description)
-            description_unigrams: set[str] = set(TextProcessor.extract_unigrams(description))
-            description_bigrams: set[str] = set(TextProcessor.extract_bigrams(description))
-            description_ngrams: set[str] = description_unigrams | description_bigrams
+        # only spans that are multi-word terms become ngrams, besides unigrams
+        trie = self.phrase_trie()
 
-            combined_ngrams: set[str] = title_ngrams | description_ngrams
-
-            self._ngrams[index] = {
-                "title": {
-                    "unigrams": title_unigrams,
-                    "bigrams": title_bigrams,
-                    "ngrams": title_ngrams,
-                },
-                "description": {
-                    "unigrams": description_unigrams,
-                    "bigrams": description_bigrams,
-                    "ngrams": description_ngrams
-                },
-                "ngrams": combined_ngrams,
-            }
+        self._ngrams = {}
+        processed: int = 0
+        hits: int = 0
+        size: int = 0
+        pending: list[dict[str, Any]] = []
+        sizes: list[int] = []
+        with metric.span("extract"):
+            for index, _listing in self._listings.items():
+                processed += 1
 
-            processed += 1
+                # listings restored from the cache already have their ngrams
+                cached = self._preprocessed.get(index) if self._preprocessed else None
+                if cached:
+                    title = {bag: set(ngrams) for bag, ngrams in cached["ngrams"]["title"].items()}
+                    description = {bag: set(ngrams) for bag, ngrams in cached["ngrams"]["description"].items()}
+                    title["ngrams"] = title["unigrams"] | title["phrases"]
+                    description["ngrams"] = description["unigrams"] | description["phrases"]
+                    hits += 1
+                else:
+                    title = TextProcessor.extract_ngrams(_listing.title, trie)
+                    description = TextProcessor.extract_ngrams(_listing.description, trie)
+                    if self._content_hashes and index in self._content_hashes:
+                        pending.append(self._preprocessed_entry(index, _listing, title, description))
+
+                # only what deduplication and matching need is kept, as sorted id arrays
+                bags = {
+                    "description": {"unigrams": vocabulary.encode(description["unigrams"])},
+                    "ngrams": vocabulary.encode(title["ngrams"] | description["ngrams"]),
+                }
+                self._ngrams[index] = bags
+                size += sys.getsizeof(bags["description"]["unigrams"]) + sys.getsizeof(bags["ngrams"])
+                sizes.append(bags["ngrams"].size)
+
+        # without a database (sharded workers) entries are handed back to the caller
+        saved = 0
+        self._pending_preprocessed = pending
+        if pending and self._database:
+            with metric.span("cache_save"):
+                saved = self._database.save_preprocessed(pending, self.preprocessing_version())
+            self._pending_preprocessed = []
+
+        self._registry.observe_many("ngrams_per_listing", sizes)
+        self._registry.increment("preprocessed_cache", hits, result="hit")
+        self._registry.increment("preprocessed_cache", processed - hits, result="miss")
 
         metric.success()
         metric.append_info("processed", processed)
+        metric.append_info("cache_hits", hits)
+        metric.append_info("cache_misses", processed - hits)
+        metric.append_info("cached", saved)
+        metric.append_info("vocabulary", len(vocabulary))
+        metric.append_info("phrases", len(trie))
+        metric.append_info("bytes_per_listing", round(size / processed))
         return self.append_metric(metric)
 
     def extract_job_level(self) -> Metric:
         metric = Metric("extract_job_level")
 
-        mappings = MappingsLoader.get_mappings()
-        if not mappings:
-            metric.failure()
-            metric.append_info("failure", "No mappings available")
-            return self.append_metric(metric)
-
-        job_levels = mappings["canonical"].get("job_level")
-        if not job_levels:
+        try:
+            classifier = JobLevelClassifier.compile()
+        except Exception as exception:
             metric.failure()
-            metric.append_info("failure", "No job levels available")
+            metric.append_info("failure", f"No job levels available: {exception}")
             return self.append_metric(metric)
 
         if not self._listings:
@@ -229,82 +778,164 @@ class Processor:
 
         self._job_levels: dict[str, str] = {}
 
-        processed: int = 0
-        iterations: int = 0
         mutations: int = 0
-        for _index, _listing in self._listings.items():
-            # default to current value
-            self._job_levels[_listing.id] = _listing.job_level
-
-            title_tokens = _listing.title.split()
-
-            # Iterate over levels; Use reversed to respect hierarchy
-            found = False
-            for canonical in reversed(list(job_levels.keys())):
-                variations = set(job_levels[canonical])
-                for variation in variations:
-                    iterations += 1
-                    if variation in title_tokens:
-                        self._job_levels[_listing.id] = canonical
-                        found = True
-                        mutations += 1
-                        break
-                if found:
-                    break
-            processed += 1
+        probes = classifier.probes
+        listings = list(self._listings.values())
+        levels = classifier.classify_batch(listing.title for listing in listings)
+        for _listing, level in zip(listings, levels):
+            if level:
+                self._job_levels[_listing.id] = level
+                mutations += 1
+            # default to current value when the title has no level
+            elif _listing.job_level in classifier.levels:
+                self._job_levels[_listing.id] = _listing.job_level
+            else:
+                self._job_levels[_listing.id] = classifier.fallback
 
         metric.success()
-        metric.append_info("processed", processed)
+        metric.append_info("processed", len(listings))
         metric.append_info("mutations", mutations)
-        metric.append_info("iterations", iterations)
+        metric.append_info("iterations", classifier.probes - probes)
         return self.append_metric(metric)
 
-    def build_listings(self) -> Metric:
+    def build_listings(self, listings: dict[int, Listing | DynamicListing] | None = None) -> Metric:
         metric = Metric("build_listings")
         if not self._session:
             metric.failure()
             metric.append_info("failure", "No session available")
             return self.append_metric(metric)
 
+        # streaming runs pass one chunk at a time instead of the session listings
+        if listings is None:
+            listings = self._session.listings
+
         self._listings: dict[int, DynamicListing] = {}
 
         processed: int = 0
-        for index, listing in self._session.listings.items():
-            self._listings[index] = DynamicListingFactory.create(index, listing.raw_data)
+        projected: int = 0
+        for index, listing in listings.items():
+            # listings from the database come already projected (listing_fields),
+            # copied since sanitizing mutates them and the session can be processed again
+            if isinstance(listing, DynamicListing):
+                self._listings[index] = replace(listing)
+                projected += 1
+            else:
+                self._listings[index] = DynamicListingFactory.create(index, listing.raw_data)
             processed += 1
 
         metric.success()
         metric.append_info("processed", processed)
         metric.append_info("created", len(self._listings))
+        metric.append_info("projected", projected)
+        return self.append_metric(metric)
+
+    def filter_exact_duplicates(self) -> Metric:
+        """Drops listings with the same raw title and description as an earlier one, before
+        they are sanitized and tokenized. deduplicate() still feeds each copy to the deduplicator,
+        with its kept original's ngrams, right after the listing it came after"""
+        metric = Metric("filter_exact_duplicates")
+        self._copies = {}
+
+        if not self._listings:
+            metric.failure()
+            metric.append_info("failure", "No listings available")
+            return self.append_metric(metric)
+
+        # copies with another external_id still change what later listings are checked
+        # against (external_id rule), so they are only dropped from the text stages
+        originals: dict[str, int] = {}
+        previous = None
+        processed = 0
+        for index, listing in list(self._listings.items()):
+            processed += 1
+            original = originals.setdefault(self.content_hash(listing), index)
+            if original == index:
+                previous = index
+                continue
+            self._copies.setdefault(previous, []).append((index, original, listing.external_id))
+            del self._listings[index]
+
+        dropped = processed - len(self._listings)
+        metric.success()
+        metric.append_info("processed", processed)
+        metric.append_info("duplicates", dropped)
         return self.append_metric(metric)
 
     def update_totals(self) -> Metric:
+        """Per level, per topic and global counts, reduced from the incidence matrix"""
         metric = Metric("update_totals")
-        if not self._buckets:
+        if not self._buckets or self._incidence is None:
             metric.failure()
             metric.append_info("failure", "No buckets available")
             return self.append_metric(metric)
 
-        processed: int = 0
-        global_matches = self._buckets["total"]["matches_counter"]
-        for topic in self._topics:
-            topic_bucket = self._buckets[topic.title]
-            for level_data in topic_bucket["per_level"].values():
-                topic_bucket["listings_counter"] += level_data["listings_counter"]
-                topic_bucket["matches_counter"].update(level_data["matches_counter"])
-                processed += 1
-            global_matches.update(topic_bucket["matches_counter"])
+        self._buckets = self._incidence.to_buckets([topic.title for topic in self._topics])
+        rows, columns = self._incidence.shape
+        metric.success()
+        metric.append_info("rows", rows)
+        metric.append_info("columns", columns)
+        metric.append_info("stored", len(self._incidence.indices))
+        return self.append_metric(metric)
+
+    def get_incidence_matrix(self) -> IncidenceMatrix | None:
+        """Listing x term matrix of the last run, to count other slices without matching again.
+        Restored runs (materializations) have none"""
+        return self._incidence
+
+    def analyze_co_occurrence(self) -> Metric:
+        """Pairs of terms matched in the same listings, from the incidence matrix of the last run"""
+        metric = Metric("analyze_co_occurrence")
+
+        if self._incidence is None or not len(self._incidence):
+            metric.failure()
+            metric.append_info("failure", "No incidence matrix available, process the session first")
+            return self.append_metric(metric)
+
+        self._co_occurrence = CoOccurrence.from_matrix(self._incidence, [topic.title for topic in self._topics])
+
         metric.success()
+        metric.append_info("processed", len(self._incidence))
+        metric.append_info("terms", len(self._co_occurrence.terms))
+        metric.append_info("pairs", len(self._co_occurrence))
         return self.append_metric(metric)
 
-    def listing_processed(self) -> None:
-        self._buckets["total"]["listings_counter"] += 1
+    def get_co_occurrence(self) -> CoOccurrence | None:
+        return self._co_occurrence
+
+    def build_results(self) -> list[dict[str, Any]]:
+        """Shapes buckets into one entry per topic, as rendered by the dashboard"""
+        self.results = []
+        if not self._buckets:
+            return self.results
+
+        for topic in self._topics:
+            topic_bucket = self._buckets.get(topic.title)
+            if not topic_bucket:
+                continue
+
+            per_level = topic_bucket["per_level"]
+            self.results.append({
+                "topic": topic.title,
+                "description": topic.description,
+                "total": {
+                    "counts": dict(topic_bucket["matches_counter"].most_common()),
+                    "listings": topic_bucket["listings_counter"],
+                    "matched": len(topic_bucket["matches_counter"]),
+                    "per_level": {level: bucket["listings_counter"] for level, bucket in per_level.items()},
+                },
+                "filtered_by_job_level": {
+                    level: {
+                        "counts": dict(bucket["matches_counter"].most_common()),
+                        "listings": bucket["listings_counter"],
+                        "matched": len(bucket["matches_counter"]),
+                    }
+                    for level, bucket in per_level.items()
+                },
+            })
 
-    def build_results(self):
-        # TODO: Implement :P
-        pass
+        return self.results
 
-    def generate_buckets(self):
+    def generate_buckets(self) -> Metric:
         metric = Metric("generate_buckets")
         # get available job level mappings
         mappings: dict = MappingsLoader.get_mappings()
@@ -325,6 +956,8 @@ class Processor:
             metric.append_info("failure", "No job levels available")
             return self.append_metric(metric)
 
+        self._incidence = IncidenceMatrix(job_levels.keys())
+
         # initialize buckets with total counter
         self._buckets = {
             "total": {
@@ -354,30 +987,123 @@ class Processor:
         metric.append_info("processed", processed)
         return self.append_metric(metric)
 
-    def update_buckets(self, topic: str, job_level, matches: set[str]) -> None:
-        self._buckets[topic]["per_level"][job_level]["listings_counter"] += 1
-        self._buckets[topic]["per_level"][job_level]["matches_counter"].update(matches)
-
-    def sanitize_listings(self):
+    def sanitize_listings(self) -> Metric:
         metric = Metric("sanitize_listings")
+
+        caching = self._caching
+        if self._preprocessed is None:
+            self._preprocessed = self.load_preprocessed() if caching else {}
+        self._content_hashes = {}
+
         processed = 0
+        hits = 0
         for index, listing in self._listings.items():
+            processed += 1
+
+            # unchanged listings are restored from the preprocessing cache
+            if caching:
+                content_hash = self.content_hash(listing)
+                cached = self._preprocessed.get(index)
+                if cached and cached["content_hash"] == content_hash:
+                    listing.title = cached["title"]
+                    listing.description = cached["description"]
+                    hits += 1
+                    continue
+                self._preprocessed.pop(index, None)
+                self._content_hashes[index] = content_hash
+
             sanitized_title = TextProcessor.sanitize(listing.title)
             listing.title = sanitized_title
 
             sanitized_description = TextProcessor.sanitize(listing.description)
             listing.description = sanitized_description
-            processed+=1
 
         metric.success()
         metric.append_info("processed", processed)
+        metric.append_info("cache_hits", hits)
+        metric.append_info("cache_misses", processed - hits)
         return self.append_metric(metric)
 
+    def load_preprocessed(self) -> dict[int, dict[str, Any]]:
+        """cached preprocessing for the current listings"""
+        return self._database.get_preprocessed(list(self._listings.keys()), self.preprocessing_version())
+
+    @staticmethod
+    def content_hash(listing: DynamicListing) -> str:
+        raw_text = f"{listing.title or ''}\x00{listing.description or ''}"
+        return hashlib.sha1(raw_text.encode("utf-8")).hexdigest()
+
+    def _preprocessed_entry(self, index: int, listing: DynamicListing, title: dict, description: dict) -> dict[str, Any]:
+        return {
+            "listing_id": index,
+            "content_hash": self._content_hashes[index],
+            "title": listing.title,
+            "description": listing.description,
+            "ngrams": {
+                "title": {"unigrams": list(title["unigrams"]), "phrases": list(title["phrases"])},
+                "description": {"unigrams": list(description["unigrams"]), "phrases": list(description["phrases"])},
+            },
+        }
+
+    def _fingerprint_entry(self, index, listing, unigrams, signature, deduplicator) -> dict[str, Any]:
+        return {
+            "listing_id": index,
+            "external_id": listing.external_id,
+            "digest": Deduplicator.digest(listing.description),
+            "title": listing.title,
+            # ids depend on the order terms were interned (e.g. restored from the cache), terms don't
+            "unigrams": sorted(self._vocabulary.decode(unigrams)),
+            "signature": signature.tobytes() if signature is not None else None,
+            "bands": deduplicator.band_keys(signature),
+        }
+
     def append_metric(self, metric: Metric) -> Metric:
         context = metric.get_context()
         self._metrics[context] = metric
+
+        # streaming runs call the steps per chunk, the registry adds them up
+        self._registry.increment("step_runs", step=context)
+        self._registry.increment("step_seconds", metric.profile()["duration_ms"] / 1000, step=context)
+        if not metric.get_status():
+            self._registry.increment("step_failures", step=context)
+        processed = metric.get_info("processed")
+        if isinstance(processed, int):
+            self._registry.increment("listings_processed", processed, step=context)
+        return metric
+
+    def record_run(self, metric: Metric) -> Metric:
+        """Appends the metric of a whole run and saves the registry snapshot to the run history"""
+        self.append_metric(metric)
+        if self._database and config.metrics.history:
+            session_id = self._session.id if self._session else None
+            duration_ms = metric.profile()["duration_ms"]
+            self._database.save_metric_run(session_id, metric.get_context(), self._registry.snapshot(), duration_ms)
         return metric
 
+    def export_metrics(self, path: Path | None = None) -> Path:
+        """Writes the registry in the Prometheus text format, e.g. for node_exporter's textfile collector"""
+        if path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = Path(config.dir.debug).joinpath(f"{timestamp}_processor_metrics.prom")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self._registry.to_prometheus())
+        return path
+
+    def export_trace(self, path: Path | None = None) -> Path:
+        """Writes the spans of this run as Chrome trace-event JSON (needs config.profiling.enabled),
+        shard workers get a track each"""
+        tracks: dict[str, list[Metric]] = {"main": []}
+        for context, metric in self._metrics.items():
+            if metric._parent is not None:
+                continue
+            track = context.split(".")[0] if context.startswith("shard_") else "main"
+            tracks.setdefault(track, []).append(metric)
+
+        if path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = Path(config.dir.debug).joinpath(f"{timestamp}_processor_trace.json")
+        return Metric.export_trace(tracks, path)
+
     def _debug_dump(
             self,
             session: bool = False,
@@ -482,16 +1208,9 @@ class Processor:
                 for index, bags in self._ngrams.items():
                     dump["ngrams"][index] = {
                         "listing_id": index,
-                        "ngrams": list(bags["ngrams"]),
-                        "title": {
-                            "unigrams": list(bags["title"]["unigrams"]),
-                            "bigrams": list(bags["title"]["bigrams"]),
-                            "ngrams": list(bags["title"]["ngrams"]),
-                        },
+                        "ngrams": self._vocabulary.decode(bags["ngrams"]),
                         "description": {
-                            "unigrams": list(bags["description"]["unigrams"]),
-                            "bigrams": list(bags["description"]["bigrams"]),
-                            "ngrams": list(bags["description"]["ngrams"]),
+                            "unigrams": self._vocabulary.decode(bags["description"]["unigrams"]),
                         }
                     }
 
@@ -539,6 +1258,9 @@ class Processor:
             else:
                 dump["raw_listings"] = {}
                 for index, _listing in self._session.listings.items():
+                    if isinstance(_listing, DynamicListing):
+                        dump["raw_listings"][index] = {"id": _listing.id, "fields": vars(_listing)}
+                        continue
                     dump["raw_listings"][index]= {
                         "id": _listing.id,
                         "session_id": _listing.session_id,
@@ -0,0 +1,85 @@
+import pandas as pd
+
+from app.persistence import Database
+
+
+class TermTrends:
+    """Term shares across sessions, from the term_frequencies fact table.
+
+    A term's share in a session is the listings mentioning it over the
+    listings processed (of the job level, if one is given). Every query reads
+    the indexed aggregates only, sessions aren't loaded or processed again.
+    Sessions are ordered by id, the order they were scraped in.
+    """
+
+    database: Database
+
+    def __init__(self, database: Database) -> None:
+        self.database = database
+
+    def shares(
+            self,
+            first: int | None = None,
+            last: int | None = None,
+            topic: str | None = None,
+            job_level: str | None = None,
+            terms: list[str] | None = None
+    ) -> pd.DataFrame:
+        """Share per session (rows) and term (columns), 0 where a term wasn't matched"""
+        totals = self.database.get_level_totals(first, last, job_level)
+        rows = self.database.get_term_frequencies(first, last, topic, job_level, terms)
+        counts = pd.DataFrame(rows, columns=["session_id", "term", "listings"])
+        counts = counts.pivot(index="session_id", columns="term", values="listings")
+        counts = counts.reindex(index=list(totals), columns=terms or counts.columns).fillna(0)
+        shares = counts.div(pd.Series(totals), axis=0).fillna(0.0)
+        shares.index.name, shares.columns.name = "session_id", "term"
+        return shares
+
+    @staticmethod
+    def ranks(shares: pd.DataFrame) -> pd.DataFrame:
+        """Rank of each term per session (1 is the most mentioned), ties share the best rank"""
+        return shares.rank(axis=1, method="min", ascending=False).astype(int)
+
+    @staticmethod
+    def moving_average(shares: pd.DataFrame, window: int = 3) -> pd.DataFrame:
+        """Mean share over the last `window` sessions (fewer at the start)"""
+        return shares.rolling(window, min_periods=1).mean()
+
+    @staticmethod
+    def growth(shares: pd.DataFrame) -> pd.DataFrame:
+        """Share change from one session to the next, relative to the previous share"""
+        previous = shares.shift(1)
+        return ((shares - previous) / previous.where(previous > 0)).iloc[1:]
+
+    def summary(
+            self,
+            first: int | None = None,
+            last: int | None = None,
+            topic: str | None = None,
+            job_level: str | None = None,
+            window: int = 3,
+            limit: int | None = None
+    ) -> pd.DataFrame:
+        """A row per term: share in the first and last session, change in points and relative growth,
+        rank change, and the moving average at the last session. Sorted by the last share"""
+        shares = self.shares(first, last, topic, job_level)
+        columns = ["term", "first_share", "last_share", "change", "growth",
+                   "first_rank", "last_rank", "rank_change", "moving_average"]
+        if shares.empty:
+            return pd.DataFrame(columns=columns)
+
+        ranks = self.ranks(shares)
+        start, end = shares.iloc[0], shares.iloc[-1]
+        summary = pd.DataFrame({
+            "first_share": start,
+            "last_share": end,
+            "change": end - start,
+            "growth": (end - start) / start.where(start > 0),
+            "first_rank": ranks.iloc[0],
+            "last_rank": ranks.iloc[-1],
+            # positive when the term climbed
+            "rank_change": ranks.iloc[0] - ranks.iloc[-1],
+            "moving_average": self.moving_average(shares, window).iloc[-1],
+        })
+        summary = summary.sort_values(["last_share", "change"], ascending=False).reset_index()
+        return summary[columns].head(limit) if limit else summary[columns]
@@ -1,4 +1,6 @@
 from dataclasses import dataclass
+from typing import Any
+import json
 
 @dataclass
 class DynamicListing:
@@ -6,4 +8,12 @@ class DynamicListing:
     external_id: str = None
     title: str = None
     description: str = None
-    job_level: str = None
\ No newline at end of file
+    job_level: str = None
+
+    @classmethod
+    def from_row(cls, row: dict[str, Any]) -> 'DynamicListing':
+        """From a listing_fields row: canonical columns, other promoted fields in extra (JSON)"""
+        data = {key: row[key] for key in ("external_id", "title", "description", "job_level")}
+        if row["extra"]:
+            data.update(json.loads(row["extra"]))
+        return cls(id=str(row["listing_id"]), **data)
@@ -1,5 +1,6 @@
 from pathlib import Path
 from typing import Any
+import hashlib
 import json
 
 from app import config
@@ -58,4 +59,9 @@ class MappingsLoader:
                 for mapping
                 in mappings}
 
-        return cls._CACHED_MAPPINGS
\ No newline at end of file
+        return cls._CACHED_MAPPINGS
+
+    @staticmethod
+    def fingerprint() -> str:
+        """hash of the mappings file, changes whenever mappings are edited"""
+        return hashlib.sha1(config.resources.mappings.read_bytes()).hexdigest()
@@ -1,3 +1,4 @@
+import hashlib
 import json
 
 from app.entities import Topic
@@ -48,3 +49,18 @@ class TopicLoader:
             for index in selected
             if index in cls._LOADED_TOPICS
         ]
+
+    @staticmethod
+    def fingerprint(topics: list[Topic]) -> str:
+        """hash of a topic selection, regardless of its order"""
+        titles = "\x00".join(sorted(topic.title for topic in topics))
+        return hashlib.sha1(titles.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def files_fingerprint() -> str:
+        """hash of every topic file, changes whenever a topic is edited, added or removed"""
+        digest = hashlib.sha1()
+        for file in sorted(config.resources.topics.glob("*.json")):
+            digest.update(file.name.encode("utf-8"))
+            digest.update(file.read_bytes())
+        return digest.hexdigest()
@@ -1,3 +1,4 @@
 from app.persistence.database import Database
+from app.persistence.migrator import Migrator
 
-__all__ = ['Database']
\ No newline at end of file
+__all__ = ['Database', 'Migrator']
\ No newline at end of file
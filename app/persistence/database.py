@@ -1,8 +1,12 @@
-from typing import Any
+from collections import Counter
+from datetime import datetime
+from typing import Any, Iterator
 import sqlite3
 import json
 
-from app.entities import Session, Listing
+from app.persistence.migrator import Migrator
+from app.entities import Session, Listing, DynamicListing
+from app.components import DynamicListingFactory, RawDataCodec
 from app import config
 
 # Can be refactored into a Repository and Driver if needed
@@ -22,7 +26,8 @@ class Database:
         self.provision()
 
     def provision(self) -> None:
-        """execute the schema.sql file to ensure proper config and table creation"""
+        """execute the schema.sql file to ensure proper config and table creation,
+        then apply pending migrations (see Migrator)"""
 
         with open(config.database.schema, 'r') as f:
             schema_sql = f.read()
@@ -30,12 +35,28 @@ class Database:
         self.conn.executescript(schema_sql).close()
         self.conn.commit()
 
+        Migrator(self.conn).migrate()
+        self.load_dictionaries()
+
+    def load_dictionaries(self) -> None:
+        """Registers the raw_data compression dictionaries, rows may need any of them to decode"""
+        RawDataCodec.clear_dictionaries()
+        for row in self.conn.execute("SELECT id, codec, data FROM compression_dictionaries"):
+            RawDataCodec.register_dictionary(row["id"], row["codec"], row["data"])
+
+    def save_dictionary(self, codec: str, data: bytes) -> int:
+        """Stores a trained dictionary, it becomes the one new rows of that codec are compressed with"""
+        sql = "INSERT INTO compression_dictionaries (codec, data, created_at) VALUES (?, ?, ?)"
+        dictionary_id = self.conn.execute(sql, (codec, data, datetime.now().isoformat())).lastrowid
+        self.conn.commit()
+        RawDataCodec.register_dictionary(dictionary_id, codec, data)
+        return dictionary_id
+
     def get_index(self) -> dict[int, str]:
         """Returns an index dict, since get_session is recursive (fetches all listings)"""
 
-        # language=sql
-        subquery = "(SELECT COUNT(*) FROM listings WHERE listings.session_id = sessions.id) as listings_count"
-        query = f"SELECT id, title, {subquery} FROM sessions ORDER BY id DESC"
+        # listings_count is kept up to date by triggers, see migrations
+        query = "SELECT id, title, listings_count FROM sessions ORDER BY id DESC"
 
         rows = (self.conn.cursor()).execute(query).fetchall()
         return {row['id']: {"title": row['title'], "listings": row["listings_count"]} for row in rows} if rows else {}
@@ -57,8 +78,28 @@ class Database:
 
         return session_id
 
-    def get_session(self, session_id) -> Session | None:
-        """Retrieves a session with its listings from the database"""
+    def create_session(self, session: Session) -> int:
+        """Saves a new session without listings, scrapes add them with save_checkpoint as they come"""
+        sql = "INSERT INTO sessions (title, description, datetime_start, datetime_finish, meta) VALUES (?, ?, ?, ?, ?)"
+        params = (session.title, session.description, self._isoformat(session.start_time),
+                  self._isoformat(session.finish_time), json.dumps(session.meta))
+        session_id: int = self.conn.execute(sql, params).lastrowid
+        self.conn.commit()
+        return session_id
+
+    def update_session(self, session: Session) -> None:
+        """Updates finish time and meta of a saved session"""
+        sql = "UPDATE sessions SET datetime_finish = ?, meta = ? WHERE id = ?"
+        self.conn.execute(sql, (self._isoformat(session.finish_time), json.dumps(session.meta), session.id))
+        self.conn.commit()
+
+    @staticmethod
+    def _isoformat(value: datetime | None) -> str | None:
+        return value.isoformat() if value else None
+
+    def get_session(self, session_id, include_listings: bool = True) -> Session | None:
+        """Retrieves a session with its listings from the database.
+        Use include_listings=False with iter_listings to stream large sessions"""
 
         sql = "SELECT * FROM sessions WHERE id = ? ORDER BY datetime_start DESC"
         params = (session_id,)
@@ -71,19 +112,35 @@ class Database:
             return None
 
         session = Session.from_row(dict(row))
-        session.listings = {i: l for i, l in self.get_listings(session_id).items()}
+        session.listings = self.get_listings(session_id) if include_listings else {}
 
         return session
 
-    def get_listings(self, session_id) -> dict[int, Listing]:
-        """retrieves listings for a given session"""
+    def get_listings(self, session_id, after: int | None = None) -> dict[int, Listing]:
+        """retrieves listings for a given session, only the ones with id > after if given"""
 
-        sql = "SELECT * FROM listings WHERE session_id = ?"
+        sql = "SELECT * FROM listings WHERE session_id = ? AND id > ? ORDER BY id"
         cursor = self.conn.cursor()
-        cursor.execute(sql, (session_id,))
+        cursor.execute(sql, (session_id, after if after is not None else -1))
         rows = cursor.fetchall()
         cursor.close()
-        return {int(row["id"]): Listing.from_row(row) for row in rows} if rows else {}
+        return {int(row["id"]): self._listing(row) for row in rows} if rows else {}
+
+    def iter_listings(self, session_id, chunk_size: int = 500) -> Iterator[dict[int, Listing]]:
+        """yields listings for a given session in chunks, so only one chunk is held in memory"""
+        sql = "SELECT * FROM listings WHERE session_id = ? ORDER BY id"
+        cursor = self.conn.cursor()
+        cursor.execute(sql, (session_id,))
+        try:
+            while rows := cursor.fetchmany(chunk_size):
+                yield {int(row["id"]): self._listing(row) for row in rows}
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _listing(row: sqlite3.Row) -> Listing:
+        # raw_data may be stored compressed (see RawDataCodec)
+        return Listing.from_row({**dict(row), "raw_data": RawDataCodec.decode(row["raw_data"])})
 
     def get_one_listing(self, listing_id) -> Listing | None:
         """retrieves a listing"""
@@ -94,18 +151,533 @@ class Database:
         if not row:
             return None
         cursor.close()
-        return Listing.from_row(row)
+        return self._listing(row)
 
     # only called within save_session, no commit required
     def save_listings(self, listings: list[dict[str, str]]) -> int:
         """Saves a listing to the database. Commit is done by save_session"""
-        sql = "INSERT INTO LISTINGS (session_id, raw_data) VALUES (?, ?)"
-        data: list[tuple[str, str]] = [(d.get('session_id'), d.get('raw_data')) for d in listings]
+        listing_ids = self._insert_listings([(d.get('session_id'), d.get('raw_data')) for d in listings])
+        return listing_ids[-1] if listing_ids else None
+
+    def append_listings(self, session_id: int, raw_data: list[str]) -> int:
+        """Appends listings (raw JSON) to an existing session, e.g. from a follow-up scrape"""
+        self._insert_listings([(session_id, raw) for raw in raw_data])
+        self.conn.commit()
+        return len(raw_data)
+
+    def _insert_listings(self, listings: list[tuple[int, str]]) -> list[int]:
+        """Inserts (session_id, raw JSON) listings with their projected fields, without committing"""
+        cursor = self.conn.cursor()
+        sql = "INSERT INTO listings (session_id, raw_data) VALUES (?, ?)"
+        listing_ids = [cursor.execute(sql, (session_id, RawDataCodec.encode(raw))).lastrowid for session_id, raw in listings]
+        cursor.close()
+        self._save_fields([(listing_id, raw) for listing_id, (_, raw) in zip(listing_ids, listings) if raw])
+        return listing_ids
+
+    def _save_fields(self, listings: list[tuple[int, str]]) -> dict[int, DynamicListing]:
+        """Projects (listing_id, raw JSON) listings into listing_fields, without committing"""
+        version = DynamicListingFactory.fingerprint()
+        projected = {listing_id: DynamicListingFactory.create(listing_id, raw) for listing_id, raw in listings}
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO listing_fields "
+            "(listing_id, version, external_id, title, description, job_level, extra) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [DynamicListingFactory.to_row(listing_id, listing, version) for listing_id, listing in projected.items()]
+        )
+        return projected
+
+    def get_listing_fields(self, session_id: int, after: int | None = None) -> dict[int, DynamicListing]:
+        """Canonical fields of a session listings (only id > after if given), without reading raw_data.
+        Listings projected with other mappings, or before projections existed, are projected again"""
+        listings: dict[int, DynamicListing] = {}
+        for chunk in self.iter_listing_fields(session_id, 5000, after):
+            listings.update(chunk)
+        return listings
+
+    def iter_listing_fields(
+            self,
+            session_id: int,
+            chunk_size: int = 500,
+            after: int | None = None
+    ) -> Iterator[dict[int, DynamicListing]]:
+        """get_listing_fields in chunks of listings, so only one chunk is held in memory"""
+        version = DynamicListingFactory.fingerprint()
+        sql = ("SELECT l.id AS listing_id, f.version, f.external_id, f.title, f.description, f.job_level, f.extra "
+               "FROM listings l LEFT JOIN listing_fields f ON f.listing_id = l.id "
+               "WHERE l.session_id = ? AND l.id > ? ORDER BY l.id LIMIT ?")
+        last_id = after if after is not None else -1
+        # a page per query (no cursor left open), stale projections are rewritten in between
+        while rows := self.conn.execute(sql, (session_id, last_id, chunk_size)).fetchall():
+            chunk = {row["listing_id"]: DynamicListing.from_row(row) for row in rows if row["version"] == version}
+            stale = [row["listing_id"] for row in rows if row["version"] != version]
+            if stale:
+                placeholders = ", ".join("?" * len(stale))
+                raws = self.conn.execute(f"SELECT id, raw_data FROM listings WHERE id IN ({placeholders})", stale)
+                chunk.update(self._save_fields([(row[0], RawDataCodec.decode(row[1])) for row in raws if row[1]]))
+                self.conn.commit()
+                chunk = dict(sorted(chunk.items()))
+            last_id = rows[-1]["listing_id"]
+            yield chunk
+
+    def save_checkpoint(
+            self,
+            session_id: int,
+            query: tuple[str, str, str],
+            raw_data: list[str],
+            error: str | None = None
+    ) -> int:
+        """Saves the listings of a finished (term, location, site) query and marks it done,
+        or failed when error is given, in a single transaction"""
+        term, location, site = query
+        try:
+            self._insert_listings([(session_id, raw) for raw in raw_data])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scrape_checkpoints "
+                "(session_id, term, location, site, status, listings, error, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, term, location, site, "failed" if error else "done", len(raw_data), error,
+                 datetime.now().isoformat())
+            )
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        return len(raw_data)
+
+    def get_checkpoints(self, session_id: int, status: str = "done") -> set[tuple[str, str, str]]:
+        """(term, location, site) of the queries of a session with the given status"""
+        sql = "SELECT term, location, site FROM scrape_checkpoints WHERE session_id = ? AND status = ?"
+        return {tuple(row) for row in self.conn.execute(sql, (session_id, status))}
+
+    def clear_checkpoints(self, session_id: int) -> None:
+        """Forgets the progress of previous runs, e.g. before appending a new scrape to a session"""
+        self.conn.execute("DELETE FROM scrape_checkpoints WHERE session_id = ?", (session_id,))
+        self.conn.commit()
+
+    def get_external_ids(self, session_id: int) -> set[str]:
+        """Provider ids of the listings of a session"""
+        ids = set()
+        for (raw_data,) in self.conn.execute("SELECT raw_data FROM listings WHERE session_id = ?", (session_id,)):
+            external_id = json.loads(RawDataCodec.decode(raw_data)).get("id") if raw_data else None
+            if external_id is not None:
+                ids.add(external_id)
+        return ids
+
+    def get_last_listing_id(self, session_id: int) -> int | None:
+        row = self.conn.execute("SELECT MAX(id) FROM listings WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0]
+
+    def get_preprocessed(self, listing_ids: list[int], version: str) -> dict[int, dict[str, Any]]:
+        """retrieves cached preprocessing results for the given listings and TextProcessor version"""
+        rows = []
+        cursor = self.conn.cursor()
+        # stay under sqlite's bound parameters limit
+        for start in range(0, len(listing_ids), 900):
+            chunk = listing_ids[start:start + 900]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = f"SELECT * FROM preprocessed_listings WHERE version = ? AND listing_id IN ({placeholders})"
+            rows.extend(cursor.execute(sql, (version, *chunk)).fetchall())
+        cursor.close()
+
+        return {
+            int(row["listing_id"]): {
+                "content_hash": row["content_hash"],
+                "title": row["title"],
+                "description": row["description"],
+                "ngrams": json.loads(row["ngrams"]),
+            }
+            for row in rows
+        }
+
+    def save_preprocessed(self, entries: list[dict[str, Any]], version: str) -> int:
+        """Saves preprocessing results, replacing stale entries for the same listings"""
+        sql = ("INSERT OR REPLACE INTO preprocessed_listings "
+               "(listing_id, content_hash, version, title, description, ngrams) VALUES (?, ?, ?, ?, ?, ?)")
+        data = [
+            (e["listing_id"], e["content_hash"], version, e["title"], e["description"], json.dumps(e["ngrams"]))
+            for e in entries
+        ]
+        cursor = self.conn.cursor()
+        cursor.executemany(sql, data)
+        cursor.close()
+        self.conn.commit()
+        return len(data)
+
+    def get_materialization(
+            self,
+            session_id: int,
+            topics_hash: str,
+            resources_hash: str
+    ) -> tuple[dict[str, Any], int | None] | None:
+        """Retrieves materialized buckets and the last listing id they count,
+        None if the session wasn't processed with these topics and resources"""
+        sql = ("SELECT id, last_listing_id FROM materializations "
+               "WHERE session_id = ? AND topics_hash = ? AND resources_hash = ?")
+        cursor = self.conn.cursor()
+        row = cursor.execute(sql, (session_id, topics_hash, resources_hash)).fetchone()
+        if row is None:
+            cursor.close()
+            return None
+        materialization_id = row["id"]
+        last_listing_id = row["last_listing_id"]
+
+        # rows are read in insertion order, so parents come before their levels
+        # and counters keep the same order as the processed ones
+        buckets: dict[str, Any] = {}
+        sql = "SELECT * FROM materialized_buckets WHERE materialization_id = ? ORDER BY rowid"
+        for row in cursor.execute(sql, (materialization_id,)).fetchall():
+            bucket = {"listings_counter": row["listings_count"], "matches_counter": Counter()}
+            if not row["topic"]:
+                buckets["total"] = bucket
+            elif not row["job_level"]:
+                buckets[row["topic"]] = {**bucket, "per_level": {}}
+            else:
+                buckets[row["topic"]]["per_level"][row["job_level"]] = bucket
+
+        sql = "SELECT * FROM materialized_matches WHERE materialization_id = ? ORDER BY rowid"
+        for row in cursor.execute(sql, (materialization_id,)).fetchall():
+            bucket = buckets["total"] if not row["topic"] else buckets[row["topic"]]
+            if row["job_level"]:
+                bucket = bucket["per_level"][row["job_level"]]
+            bucket["matches_counter"][row["term"]] = row["count"]
+        cursor.close()
+
+        return buckets, last_listing_id
+
+    def save_materialization(
+            self,
+            session_id: int,
+            topics_hash: str,
+            resources_hash: str,
+            buckets: dict[str, Any],
+            last_listing_id: int | None = None
+    ) -> int:
+        """Saves processed buckets, replacing a previous materialization for the same keys"""
+        sql = ("INSERT OR REPLACE INTO materializations "
+               "(session_id, topics_hash, resources_hash, processed_at, last_listing_id) VALUES (?, ?, ?, ?, ?)")
+        params = (session_id, topics_hash, resources_hash, datetime.now().isoformat(), last_listing_id)
+
         cursor = self.conn.cursor()
-        listing_id = cursor.executemany(sql, data).lastrowid
+        materialization_id = cursor.execute(sql, params).lastrowid
+
+        # flatten buckets into (topic, job_level) rows, see schema.sql
+        scopes = [("", "", buckets["total"])]
+        for topic, topic_bucket in buckets.items():
+            if topic == "total":
+                continue
+            scopes.append((topic, "", topic_bucket))
+            scopes.extend((topic, level, bucket) for level, bucket in topic_bucket["per_level"].items())
+
+        cursor.executemany(
+            "INSERT INTO materialized_buckets (materialization_id, topic, job_level, listings_count) VALUES (?, ?, ?, ?)",
+            [(materialization_id, topic, level, bucket["listings_counter"]) for topic, level, bucket in scopes]
+        )
+        cursor.executemany(
+            "INSERT INTO materialized_matches (materialization_id, topic, job_level, term, count) VALUES (?, ?, ?, ?, ?)",
+            [
+                (materialization_id, topic, level, term, count)
+                for topic, level, bucket in scopes
+                for term, count in bucket["matches_counter"].items()
+            ]
+        )
+        cursor.close()
+        self.conn.commit()
+
+        return materialization_id
+
+    def save_term_frequencies(self, session_id: int, buckets: dict[str, Any]) -> int:
+        """Replaces the session's term counts for the topics in buckets, returns the rows written"""
+        topics = {topic: bucket for topic, bucket in buckets.items() if topic != "total"}
+        rows = [
+            (session_id, topic, term, level, count)
+            for topic, topic_bucket in topics.items()
+            for level, bucket in topic_bucket["per_level"].items()
+            for term, count in bucket["matches_counter"].items()
+        ]
+        # listings per level are the same in every topic bucket
+        totals = {}
+        for topic_bucket in topics.values():
+            totals = {level: bucket["listings_counter"] for level, bucket in topic_bucket["per_level"].items()}
+            break
+
+        cursor = self.conn.cursor()
+        cursor.executemany("DELETE FROM term_frequencies WHERE session_id = ? AND topic = ?",
+                           [(session_id, topic) for topic in topics])
+        cursor.executemany(
+            "INSERT INTO term_frequencies (session_id, topic, term, job_level, listings) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        cursor.executemany(
+            "INSERT OR REPLACE INTO session_level_totals (session_id, job_level, listings) VALUES (?, ?, ?)",
+            [(session_id, level, listings) for level, listings in totals.items()]
+        )
+        cursor.close()
+        self.conn.commit()
+        return len(rows)
+
+    def get_term_frequencies(
+            self,
+            first: int | None = None,
+            last: int | None = None,
+            topic: str | None = None,
+            job_level: str | None = None,
+            terms: list[str] | None = None
+    ) -> list[tuple[int, str, int]]:
+        """(session id, term, listings) of the sessions in [first, last], levels added up unless one is given.
+        Without a topic a term shared by topics counts as its largest topic count"""
+        conditions, params = ["session_id BETWEEN ? AND ?"], [first or 0, last if last is not None else 2 ** 62]
+        if topic is not None:
+            conditions.append("topic = ?")
+            params.append(topic)
+        if job_level is not None:
+            conditions.append("job_level = ?")
+            params.append(job_level)
+        if terms:
+            conditions.append(f"term IN ({', '.join('?' * len(terms))})")
+            params.extend(terms)
+
+        sql = (f"SELECT session_id, term, MAX(listings) AS listings FROM ("
+               f"SELECT session_id, topic, term, SUM(listings) AS listings FROM term_frequencies "
+               f"WHERE {' AND '.join(conditions)} GROUP BY session_id, topic, term"
+               f") GROUP BY session_id, term ORDER BY session_id, term")
+        return [(row[0], row[1], row[2]) for row in self.conn.execute(sql, params)]
+
+    def get_level_totals(
+            self,
+            first: int | None = None,
+            last: int | None = None,
+            job_level: str | None = None
+    ) -> dict[int, int]:
+        """Processed listings per session in [first, last], of one job level or every level"""
+        sql = "SELECT session_id, SUM(listings) FROM session_level_totals WHERE session_id BETWEEN ? AND ?"
+        params: list[Any] = [first or 0, last if last is not None else 2 ** 62]
+        if job_level is not None:
+            sql += " AND job_level = ?"
+            params.append(job_level)
+        sql += " GROUP BY session_id ORDER BY session_id"
+        return {row[0]: row[1] for row in self.conn.execute(sql, params)}
+
+    def get_trend_index(self) -> dict[str, Any]:
+        """Sessions, topics and job levels with term frequencies, for trend filters"""
+        sql = ("SELECT s.id, s.title, s.datetime_start FROM sessions s "
+               "WHERE EXISTS (SELECT 1 FROM session_level_totals t WHERE t.session_id = s.id) ORDER BY s.id")
+        sessions = {row[0]: {"title": row[1], "start": row[2]} for row in self.conn.execute(sql)}
+        topics = [row[0] for row in self.conn.execute("SELECT DISTINCT topic FROM term_frequencies ORDER BY topic")]
+        levels = [row[0] for row in self.conn.execute("SELECT DISTINCT job_level FROM session_level_totals")]
+        return {"sessions": sessions, "topics": topics, "levels": levels}
+
+    def save_fingerprints(self, session_id: int, version: str, entries: list[dict[str, Any]]) -> int:
+        """Saves deduplication fingerprints and their band keys, replacing previous ones"""
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO listing_fingerprints "
+            "(listing_id, session_id, version, external_id, description_digest, title, unigrams, signature) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (e["listing_id"], session_id, version, e["external_id"], e["digest"], e["title"],
+                 json.dumps(e["unigrams"]), e["signature"])
+                for e in entries
+            ]
+        )
+        # replaced fingerprints already took their band keys along (cascade)
+        cursor.executemany(
+            "INSERT INTO listing_bands (listing_id, session_id, band, band_key) VALUES (?, ?, ?, ?)",
+            [
+                (e["listing_id"], session_id, band, key)
+                for e in entries
+                for band, key in enumerate(e["bands"])
+            ]
+        )
+        cursor.close()
+        self.conn.commit()
+        return len(entries)
+
+    def find_fingerprints(
+            self,
+            session_id: int,
+            version: str,
+            until: int,
+            external_ids: list[str],
+            digests: list[bytes],
+            bands: list[list[bytes]]
+    ) -> set[int]:
+        """Ids of fingerprinted listings (up to id until) sharing an external id,
+        a description digest or a band key with the given ones"""
+        found: set[int] = set()
+        cursor = self.conn.cursor()
+
+        lookups = [("external_id", external_ids), ("description_digest", digests)]
+        for column, values in lookups:
+            values = list(set(values))
+            for start in range(0, len(values), 900):
+                chunk = values[start:start + 900]
+                placeholders = ", ".join("?" * len(chunk))
+                sql = (f"SELECT listing_id FROM listing_fingerprints WHERE session_id = ? AND version = ? "
+                       f"AND listing_id <= ? AND {column} IN ({placeholders})")
+                found.update(row[0] for row in cursor.execute(sql, (session_id, version, until, *chunk)))
+
+        # band keys are looked up per band, so the (session_id, band, band_key) index is used
+        for band, keys in enumerate(zip(*bands) if bands else []):
+            keys = list(set(keys))
+            for start in range(0, len(keys), 900):
+                chunk = keys[start:start + 900]
+                placeholders = ", ".join("?" * len(chunk))
+                sql = (f"SELECT b.listing_id FROM listing_bands b "
+                       f"JOIN listing_fingerprints f ON f.listing_id = b.listing_id "
+                       f"WHERE b.session_id = ? AND b.band = ? AND b.band_key IN ({placeholders}) "
+                       f"AND f.version = ? AND b.listing_id <= ?")
+                found.update(row[0] for row in cursor.execute(sql, (session_id, band, *chunk, version, until)))
+
+        cursor.close()
+        return found
+
+    def get_fingerprints(
+            self,
+            session_id: int,
+            version: str,
+            until: int,
+            listing_ids: set[int] | None = None
+    ) -> list[dict[str, Any]]:
+        """Fingerprints in listing order, all of the session (up to id until) if no ids are given"""
+        cursor = self.conn.cursor()
+        sql = ("SELECT * FROM listing_fingerprints WHERE session_id = ? AND version = ? AND listing_id <= ?")
+        if listing_ids is None:
+            rows = cursor.execute(sql + " ORDER BY listing_id", (session_id, version, until)).fetchall()
+        else:
+            rows = []
+            ids = sorted(listing_ids)
+            for start in range(0, len(ids), 900):
+                chunk = ids[start:start + 900]
+                placeholders = ", ".join("?" * len(chunk))
+                query = sql + f" AND listing_id IN ({placeholders}) ORDER BY listing_id"
+                rows.extend(cursor.execute(query, (session_id, version, until, *chunk)).fetchall())
+        cursor.close()
+
+        return [
+            {
+                "listing_id": row["listing_id"],
+                "external_id": row["external_id"],
+                "digest": row["description_digest"],
+                "title": row["title"],
+                "unigrams": json.loads(row["unigrams"]),
+                "signature": row["signature"],
+            }
+            for row in rows
+        ]
+
+    def find_cross_session_matches(
+            self,
+            session_id: int,
+            version: str,
+            external_ids: list[str],
+            digests: list[bytes],
+            bands: list[list[bytes]]
+    ) -> dict[str, dict[Any, set[int]]]:
+        """Fingerprinted listings of every other session sharing an external id,
+        a description digest or a band key with the given ones, grouped by what matched"""
+        matches: dict[str, dict[Any, set[int]]] = {"external_id": {}, "digest": {}, "band": {}}
+        cursor = self.conn.cursor()
+
+        lookups = [("external_id", "external_id", external_ids), ("digest", "description_digest", digests)]
+        for kind, column, values in lookups:
+            values = list(set(values))
+            for start in range(0, len(values), 900):
+                chunk = values[start:start + 900]
+                placeholders = ", ".join("?" * len(chunk))
+                sql = (f"SELECT listing_id, {column} AS value FROM listing_fingerprints "
+                       f"WHERE {column} IN ({placeholders}) AND session_id != ? AND version = ?")
+                for row in cursor.execute(sql, (*chunk, session_id, version)):
+                    matches[kind].setdefault(row["value"], set()).add(row["listing_id"])
+
+        for band, keys in enumerate(zip(*bands) if bands else []):
+            keys = list(set(keys))
+            for start in range(0, len(keys), 900):
+                chunk = keys[start:start + 900]
+                placeholders = ", ".join("?" * len(chunk))
+                sql = (f"SELECT b.listing_id, b.band_key FROM listing_bands b "
+                       f"JOIN listing_fingerprints f ON f.listing_id = b.listing_id "
+                       f"WHERE b.band = ? AND b.band_key IN ({placeholders}) AND b.session_id != ? AND f.version = ?")
+                for row in cursor.execute(sql, (band, *chunk, session_id, version)):
+                    matches["band"].setdefault((band, row["band_key"]), set()).add(row["listing_id"])
+
+        cursor.close()
+        return matches
+
+    def get_fingerprints_by_id(self, listing_ids: set[int]) -> dict[int, dict[str, Any]]:
+        """Titles and unigrams of fingerprinted listings, from any session"""
+        fingerprints = {}
+        ids = sorted(listing_ids)
+        cursor = self.conn.cursor()
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = f"SELECT listing_id, title, unigrams FROM listing_fingerprints WHERE listing_id IN ({placeholders})"
+            for row in cursor.execute(sql, chunk):
+                fingerprints[row["listing_id"]] = {"title": row["title"], "unigrams": json.loads(row["unigrams"])}
         cursor.close()
+        return fingerprints
+
+    def save_duplicate_flags(self, flags: dict[int, int]) -> set[int]:
+        """Flags listings as duplicates of an earlier listing, keeping the earliest one.
+        Returns the sessions that had listings flagged"""
+        changed = []
+        cursor = self.conn.cursor()
+        sql = ("UPDATE listing_fingerprints SET duplicate_of = ? "
+               "WHERE listing_id = ? AND (duplicate_of IS NULL OR duplicate_of > ?)")
+        for listing_id, duplicate_of in flags.items():
+            if cursor.execute(sql, (duplicate_of, listing_id, duplicate_of)).rowcount:
+                changed.append(listing_id)
+
+        sessions = set()
+        for start in range(0, len(changed), 900):
+            chunk = changed[start:start + 900]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = f"SELECT DISTINCT session_id FROM listing_fingerprints WHERE listing_id IN ({placeholders})"
+            sessions.update(row[0] for row in cursor.execute(sql, chunk))
+        cursor.close()
+        self.conn.commit()
+        return sessions
+
+    def get_duplicate_flags(self, listing_ids: list[int]) -> dict[int, int]:
+        """listing id -> earliest listing of another session it duplicates, for flagged listings only"""
+        flags = {}
+        cursor = self.conn.cursor()
+        for start in range(0, len(listing_ids), 900):
+            chunk = listing_ids[start:start + 900]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = (f"SELECT listing_id, duplicate_of FROM listing_fingerprints "
+                   f"WHERE listing_id IN ({placeholders}) AND duplicate_of IS NOT NULL")
+            flags.update((row[0], row[1]) for row in cursor.execute(sql, chunk))
+        cursor.close()
+        return flags
+
+    def delete_materializations(self, session_ids: set[int]) -> None:
+        """Drops materialized results, the sessions get processed again on their next load"""
+        self.conn.executemany("DELETE FROM materializations WHERE session_id = ?", [(i,) for i in session_ids])
+        self.conn.commit()
+
+    def save_metric_run(
+            self,
+            session_id: int | None,
+            context: str,
+            snapshot: dict[str, Any],
+            duration_ms: float | None = None
+    ) -> int:
+        """Stores a MetricsRegistry snapshot of a processing run"""
+        sql = ("INSERT INTO metric_runs (session_id, context, recorded_at, duration_ms, snapshot) "
+               "VALUES (?, ?, ?, ?, ?)")
+        params = (session_id, context, datetime.now().isoformat(), duration_ms, json.dumps(snapshot))
+        run_id = self.conn.execute(sql, params).lastrowid
+        self.conn.commit()
+        return run_id
 
-        return listing_id
+    def get_metric_runs(self, session_id: int | None = None, limit: int = 50) -> list[dict[str, Any]]:
+        """Latest runs first, of every session unless one is given"""
+        sql = "SELECT id, session_id, context, recorded_at, duration_ms, snapshot FROM metric_runs"
+        params: tuple = ()
+        if session_id is not None:
+            sql += " WHERE session_id = ?"
+            params = (session_id,)
+        sql += " ORDER BY id DESC LIMIT ?"
+        rows = self.conn.execute(sql, (*params, limit)).fetchall()
+        return [{**row, "snapshot": json.loads(row["snapshot"])} for row in rows]
 
     def _query(self, query: str) -> dict[Any, Any]:
         cursor = self.conn.cursor()
@@ -0,0 +1,2 @@
+-- listings are always fetched (and counted) by session
+CREATE INDEX IF NOT EXISTS idx_listings_session_id ON listings (session_id);
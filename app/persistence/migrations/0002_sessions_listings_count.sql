@@ -0,0 +1,23 @@
+-- denormalized listings count, so the sessions index doesn't count listings per session
+ALTER TABLE sessions ADD COLUMN listings_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE sessions SET listings_count = (
+    SELECT COUNT(*) FROM listings WHERE listings.session_id = sessions.id
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_listings_insert_count AFTER INSERT ON listings
+BEGIN
+    UPDATE sessions SET listings_count = listings_count + 1 WHERE id = NEW.session_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_listings_delete_count AFTER DELETE ON listings
+BEGIN
+    UPDATE sessions SET listings_count = listings_count - 1 WHERE id = OLD.session_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_listings_move_count AFTER UPDATE OF session_id ON listings
+WHEN OLD.session_id IS NOT NEW.session_id
+BEGIN
+    UPDATE sessions SET listings_count = listings_count - 1 WHERE id = OLD.session_id;
+    UPDATE sessions SET listings_count = listings_count + 1 WHERE id = NEW.session_id;
+END;
@@ -0,0 +1,31 @@
+-- watermark: listings of the session up to this id are counted in the materialization
+ALTER TABLE materializations ADD COLUMN last_listing_id INTEGER;
+
+-- what deduplication needs from an already processed listing, so new listings
+-- can be checked against it without processing the whole session again
+CREATE TABLE IF NOT EXISTS listing_fingerprints (
+    listing_id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    version TEXT NOT NULL, -- TextProcessor and deduplication settings fingerprint
+    external_id TEXT,
+    description_digest BLOB, -- sha1 of the sanitized description
+    title TEXT, -- sanitized title
+    unigrams TEXT, -- JSON description unigrams
+    signature BLOB, -- MinHash signature (uint32), NULL when empty or not using lsh
+    FOREIGN KEY (listing_id) REFERENCES listings (id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_listing_fingerprints_external_id ON listing_fingerprints (session_id, external_id);
+CREATE INDEX IF NOT EXISTS idx_listing_fingerprints_digest ON listing_fingerprints (session_id, description_digest);
+
+-- MinHash band keys per listing, finds lsh candidates with an index lookup
+CREATE TABLE IF NOT EXISTS listing_bands (
+    listing_id INTEGER NOT NULL,
+    session_id INTEGER NOT NULL,
+    band INTEGER NOT NULL,
+    band_key BLOB NOT NULL,
+    FOREIGN KEY (listing_id) REFERENCES listing_fingerprints (listing_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_listing_bands ON listing_bands (session_id, band, band_key);
+CREATE INDEX IF NOT EXISTS idx_listing_bands_listing_id ON listing_bands (listing_id);
@@ -0,0 +1,7 @@
+-- earliest listing of another session this one duplicates, NULL when unique across sessions
+ALTER TABLE listing_fingerprints ADD COLUMN duplicate_of INTEGER;
+
+-- lookups across every session
+CREATE INDEX IF NOT EXISTS idx_listing_fingerprints_external_id_all ON listing_fingerprints (external_id);
+CREATE INDEX IF NOT EXISTS idx_listing_fingerprints_digest_all ON listing_fingerprints (description_digest);
+CREATE INDEX IF NOT EXISTS idx_listing_bands_all ON listing_bands (band, band_key);
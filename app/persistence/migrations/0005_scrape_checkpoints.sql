@@ -0,0 +1,14 @@
+-- progress of a scrape run, one row per finished query; listings of a query
+-- are committed together with its row, so a resumed run skips 'done' queries
+CREATE TABLE IF NOT EXISTS scrape_checkpoints (
+    session_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    location TEXT NOT NULL,
+    site TEXT NOT NULL,
+    status TEXT NOT NULL, -- 'done' or 'failed' (retried on resume)
+    listings INTEGER NOT NULL DEFAULT 0, -- new listings saved by this query
+    error TEXT,
+    finished_at TEXT, -- ISO 8601 format
+    PRIMARY KEY (session_id, term, location, site),
+    FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
+);
@@ -0,0 +1,8 @@
+-- dictionaries raw_data is compressed with (see RawDataCodec), never deleted
+-- while rows reference them in their header
+CREATE TABLE IF NOT EXISTS compression_dictionaries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    codec TEXT NOT NULL, -- "zlib" or "zstd"
+    data BLOB NOT NULL,
+    created_at TEXT -- ISO 8601 format
+);
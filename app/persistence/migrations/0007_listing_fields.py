@@ -0,0 +1,42 @@
+"""Canonical fields projected out of raw_data at ingest, so processing doesn't parse
+every raw JSON again. Existing listings are backfilled with the current mappings"""
+import sqlite3
+
+from app.components import DynamicListingFactory, RawDataCodec
+
+TABLE = """
+CREATE TABLE IF NOT EXISTS listing_fields (
+    listing_id INTEGER PRIMARY KEY,
+    version TEXT NOT NULL, -- DynamicListingFactory fingerprint; other versions get projected again
+    external_id TEXT,
+    title TEXT,
+    description TEXT,
+    job_level TEXT, -- platform value mapped to its canonical level
+    extra TEXT, -- JSON, fields promoted in mappings.json without their own column
+    FOREIGN KEY (listing_id) REFERENCES listings (id) ON DELETE CASCADE
+)
+"""
+
+INDEX = "CREATE INDEX IF NOT EXISTS idx_listing_fields_external_id ON listing_fields (external_id)"
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    conn.execute(TABLE)
+    conn.execute(INDEX)
+
+    # compressed rows need their dictionaries to be read
+    for dictionary_id, codec, data in conn.execute("SELECT id, codec, data FROM compression_dictionaries"):
+        RawDataCodec.register_dictionary(dictionary_id, codec, data)
+
+    version = DynamicListingFactory.fingerprint()
+    sql = ("INSERT OR REPLACE INTO listing_fields "
+           "(listing_id, version, external_id, title, description, job_level, extra) VALUES (?, ?, ?, ?, ?, ?, ?)")
+    last_id = -1
+    while rows := conn.execute(
+            "SELECT id, raw_data FROM listings WHERE id > ? ORDER BY id LIMIT 1000", (last_id,)
+    ).fetchall():
+        conn.executemany(sql, [
+            DynamicListingFactory.to_row(row[0], DynamicListingFactory.create(row[0], RawDataCodec.decode(row[1])), version)
+            for row in rows if row[1]
+        ])
+        last_id = rows[-1][0]
@@ -0,0 +1,12 @@
+-- MetricsRegistry snapshots, one per processing run, to follow performance over time
+CREATE TABLE IF NOT EXISTS metric_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER,
+    context TEXT NOT NULL, -- e.g. "process", "process_or_restore"
+    recorded_at TEXT NOT NULL, -- ISO 8601 format
+    duration_ms REAL,
+    snapshot TEXT NOT NULL, -- JSON, see MetricsRegistry.snapshot
+    FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_metric_runs_session ON metric_runs (session_id, recorded_at);
@@ -0,0 +1,57 @@
+"""Listings per matched term of every processed session, compact enough to compare
+sessions over time without loading or processing them again (see TermTrends).
+Backfilled from the materializations that are still valid, sessions only restored
+from a stale one get their counts when they are processed again"""
+import sqlite3
+
+TERM_FREQUENCIES = """
+CREATE TABLE IF NOT EXISTS term_frequencies (
+    session_id INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    term TEXT NOT NULL, -- canonical term
+    job_level TEXT NOT NULL,
+    listings INTEGER NOT NULL,
+    PRIMARY KEY (session_id, topic, term, job_level),
+    FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
+) WITHOUT ROWID
+"""
+
+TERM_INDEX = "CREATE INDEX IF NOT EXISTS idx_term_frequencies_term ON term_frequencies (topic, term, session_id)"
+
+# processed listings per job level, the denominator of term shares
+LEVEL_TOTALS = """
+CREATE TABLE IF NOT EXISTS session_level_totals (
+    session_id INTEGER NOT NULL,
+    job_level TEXT NOT NULL,
+    listings INTEGER NOT NULL,
+    PRIMARY KEY (session_id, job_level),
+    FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
+) WITHOUT ROWID
+"""
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    # app.core imports the persistence package, only needed once it's loaded
+    from app.core import Processor
+
+    conn.execute(TERM_FREQUENCIES)
+    conn.execute(TERM_INDEX)
+    conn.execute(LEVEL_TOTALS)
+
+    # materializations made with other mappings, topic files or text processing
+    # are never restored, their counts would be stale; the latest one of a session wins
+    _topics_hash, resources_hash = Processor(None, []).materialization_keys()
+    conn.execute(
+        "INSERT OR REPLACE INTO term_frequencies (session_id, topic, term, job_level, listings) "
+        "SELECT m.session_id, mm.topic, mm.term, mm.job_level, mm.count "
+        "FROM materialized_matches mm JOIN materializations m ON m.id = mm.materialization_id "
+        "WHERE m.resources_hash = ? AND mm.topic != '' AND mm.job_level != '' "
+        "ORDER BY m.id", (resources_hash,)
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO session_level_totals (session_id, job_level, listings) "
+        "SELECT m.session_id, mb.job_level, mb.listings_count "
+        "FROM materialized_buckets mb JOIN materializations m ON m.id = mb.materialization_id "
+        "WHERE m.resources_hash = ? AND mb.topic != '' AND mb.job_level != '' "
+        "ORDER BY m.id", (resources_hash,)
+    )
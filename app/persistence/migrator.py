@@ -0,0 +1,87 @@
+from pathlib import Path
+import importlib.util
+import sqlite3
+import re
+
+from app import config
+
+
+class Migrator:
+    """Applies versioned migrations on top of schema.sql.
+
+    Migrations are files named <version>_<name>.sql in the migrations dir, or
+    <version>_<name>.py with a migrate(conn) function for data migrations
+    (backfills) that need app code.
+    The applied version is tracked with PRAGMA user_version, and each migration
+    runs in its own transaction together with the version bump, so a failing
+    migration leaves the database at the previous version.
+    """
+
+    _FILENAME = re.compile(r"^(\d+)_\w+\.(sql|py)$")
+
+    conn: sqlite3.Connection
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    @classmethod
+    def get_migrations(cls) -> dict[int, Path]:
+        migrations: dict[int, Path] = {}
+        files = [*config.database.migrations.glob("*.sql"), *config.database.migrations.glob("*.py")]
+        for file in sorted(files):
+            match = cls._FILENAME.match(file.name)
+            if not match:
+                raise Exception(f"Invalid migration filename '{file.name}'")
+            version = int(match.group(1))
+            if version in migrations:
+                raise Exception(f"Duplicate migration version {version} at '{file.name}'")
+            migrations[version] = file
+        return migrations
+
+    def get_version(self) -> int:
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self) -> list[int]:
+        """Applies pending migrations in order, returns the applied versions"""
+        migrations = self.get_migrations()
+        current = self.get_version()
+        latest = max(migrations, default=0)
+        if current > latest:
+            raise Exception(f"Database version {current} is newer than the latest migration ({latest})")
+
+        applied = []
+        for version in sorted(v for v in migrations if v > current):
+            if migrations[version].suffix == ".py":
+                self._run_python(version, migrations[version])
+            else:
+                self._run_sql(version, migrations[version])
+            applied.append(version)
+
+        return applied
+
+    def _run_sql(self, version: int, file: Path) -> None:
+        with open(file, "r", encoding="utf-8") as f:
+            migration_sql = f.read()
+
+        # executescript commits anything pending first, then runs as is,
+        # so the transaction has to be part of the script itself
+        try:
+            self.conn.executescript(f"BEGIN;\n{migration_sql}\nPRAGMA user_version = {version};\nCOMMIT;")
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    def _run_python(self, version: int, file: Path) -> None:
+        spec = importlib.util.spec_from_file_location(f"migration_{version}", file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        self.conn.commit()
+        try:
+            self.conn.execute("BEGIN")
+            module.migrate(self.conn)
+            self.conn.execute(f"PRAGMA user_version = {version}")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
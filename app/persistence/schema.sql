@@ -1,4 +1,5 @@
 -- SQLite3 Schema
+-- Baseline only: changes to existing tables go to migrations/ (see Migrator)
 
 PRAGMA foreign_keys = ON; -- Enable foreign key constraints for sqlite3
 
@@ -14,6 +15,49 @@ CREATE TABLE IF NOT EXISTS sessions (
 CREATE TABLE IF NOT EXISTS listings (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     session_id INTEGER,
-    raw_data TEXT, -- Raw JSON data
+    raw_data TEXT, -- Raw JSON data, or a compressed BLOB (see RawDataCodec)
     FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
 );
+
+CREATE TABLE IF NOT EXISTS preprocessed_listings (
+    listing_id INTEGER PRIMARY KEY,
+    content_hash TEXT, -- hash of the raw title and description
+    version TEXT, -- TextProcessor fingerprint; rows from other versions are stale
+    title TEXT, -- sanitized title
+    description TEXT, -- sanitized description
+    ngrams TEXT, -- JSON unigrams/bigrams per field
+    FOREIGN KEY (listing_id) REFERENCES listings (id) ON DELETE CASCADE
+);
+
+
+CREATE TABLE IF NOT EXISTS materializations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL,
+    topics_hash TEXT NOT NULL, -- hash of the selected topic titles
+    resources_hash TEXT NOT NULL, -- hash of mappings.json, topic files and TextProcessor version
+    processed_at TEXT, -- ISO 8601 format
+    UNIQUE (session_id, topics_hash, resources_hash),
+    FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
+);
+
+-- topic and job_level are '' for aggregates: ('', '') is the session total,
+-- (topic, '') the topic total and (topic, level) a job level bucket
+CREATE TABLE IF NOT EXISTS materialized_buckets (
+    materialization_id INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    job_level TEXT NOT NULL,
+    listings_count INTEGER,
+    FOREIGN KEY (materialization_id) REFERENCES materializations (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS materialized_matches (
+    materialization_id INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    job_level TEXT NOT NULL,
+    term TEXT NOT NULL,
+    count INTEGER,
+    FOREIGN KEY (materialization_id) REFERENCES materializations (id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_materialized_buckets ON materialized_buckets (materialization_id);
+CREATE INDEX IF NOT EXISTS idx_materialized_matches ON materialized_matches (materialization_id);
@@ -0,0 +1,12 @@
+from app.scraping.rate_limiter import TokenBucket
+from app.scraping.providers import Provider, ScrapeQuery, JobspyProvider, FakeProvider
+from app.scraping.engine import ScrapeEngine
+
+__all__ = [
+    "TokenBucket",
+    "Provider",
+    "ScrapeQuery",
+    "JobspyProvider",
+    "FakeProvider",
+    "ScrapeEngine"
+]
@@ -0,0 +1,135 @@
+from itertools import product
+from random import Random
+from time import perf_counter
+from typing import Any, Callable, Iterable
+import asyncio
+
+import pandas as pd
+
+from app.entities import Metric
+from app.enums import InfoType
+from app.scraping.providers import Provider, ScrapeQuery
+from app.scraping.rate_limiter import TokenBucket
+from app import config
+
+# called with each finished query and its listings, or the exception it failed with
+ResultCallback = Callable[[ScrapeQuery, pd.DataFrame | Exception], None]
+
+
+class ScrapeEngine:
+    """Runs many scrape queries concurrently against a Provider.
+
+    At most `concurrency` queries are in flight, each site has its own token
+    bucket (requests per second), and failed queries are retried with
+    exponential backoff. Results are merged and deduplicated by listing id.
+    """
+
+    provider: Provider
+    concurrency: int
+    retries: int
+    backoff: float
+
+    def __init__(
+            self,
+            provider: Provider,
+            concurrency: int | None = None,
+            rate_limits: dict[str, dict[str, float]] | None = None,
+            retries: int | None = None,
+            backoff: float | None = None,
+            seed: int | None = None
+    ) -> None:
+        settings = config.scraper
+        self.provider = provider
+        self.concurrency = max(1, concurrency or settings.concurrency)
+        self.retries = settings.retries if retries is None else retries
+        self.backoff = settings.backoff if backoff is None else backoff
+        self._rate_limits = rate_limits or {site: vars(limit) for site, limit in vars(settings.rate_limits).items()}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._random = Random(seed)
+
+    @staticmethod
+    def queries(terms: Iterable[str], locations: Iterable[str], sites: Iterable[str], count: int) -> list[ScrapeQuery]:
+        """Every term x location x site, sites interleaved so a slow site doesn't hold every slot"""
+        sites = list(sites)
+        pairs = list(product(terms, locations))
+        return [ScrapeQuery(term, location, site, count) for term, location in pairs for site in sites]
+
+    def scrape(self, queries: list[ScrapeQuery], on_result: ResultCallback | None = None) -> tuple[pd.DataFrame, Metric]:
+        """Blocking entry point for scripts"""
+        return asyncio.run(self.run(queries, on_result))
+
+    async def run(self, queries: list[ScrapeQuery], on_result: ResultCallback | None = None) -> tuple[pd.DataFrame, Metric]:
+        """Runs every query, returns the unique listings and a metric.
+        With on_result, each query's DataFrame (or final exception) is handed over as soon
+        as it finishes and not kept, the returned DataFrame is then empty"""
+        metric = Metric("scrape")
+        start = perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # buckets and their locks belong to this event loop
+        self._buckets = {}
+        self._stats = {"attempts": 0, "retries": 0, "throttled_seconds": 0.0, "listings": 0}
+        ids: set[Any] = set()
+        frames: list[pd.DataFrame] = []
+        failed: list[tuple[ScrapeQuery, Exception]] = []
+
+        async def collect(query: ScrapeQuery) -> None:
+            result = await self._run_query(query, semaphore)
+            if isinstance(result, Exception):
+                failed.append((query, result))
+            elif not result.empty:
+                self._stats["listings"] += len(result)
+                ids.update(result["id"])
+                if on_result is None:
+                    frames.append(result)
+            if on_result is not None:
+                on_result(query, result)
+
+        await asyncio.gather(*(collect(query) for query in queries))
+
+        for query, exception in failed:
+            metric.append_info(f"{query.term} / {query.location} / {query.site}", str(exception), InfoType.WARNING)
+
+        combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["id"])
+        unique = combined.drop_duplicates(subset=["id"], keep="first")
+
+        elapsed = perf_counter() - start
+        if len(failed) == len(queries) and queries:
+            metric.failure()
+        else:
+            metric.success()
+        metric.append_info("provider", self.provider.name)
+        metric.append_info("queries", len(queries))
+        metric.append_info("failed", len(failed))
+        metric.append_info("attempts", self._stats["attempts"])
+        metric.append_info("retries", self._stats["retries"])
+        metric.append_info("throttled_seconds", round(self._stats["throttled_seconds"], 3))
+        metric.append_info("listings", self._stats["listings"])
+        metric.append_info("unique_listings", len(ids))
+        metric.append_info("elapsed_seconds", round(elapsed, 3))
+        metric.append_info("queries_per_second", round(len(queries) / elapsed, 2) if elapsed else None)
+        return unique, metric
+
+    async def _run_query(self, query: ScrapeQuery, semaphore: asyncio.Semaphore) -> pd.DataFrame | Exception:
+        bucket = self._bucket(query.site)
+        attempt = 0
+        while True:
+            # the site's token is waited for outside the semaphore, queries throttled
+            # on a slow site don't hold slots the other sites could use
+            self._stats["throttled_seconds"] += await bucket.acquire()
+            async with semaphore:
+                self._stats["attempts"] += 1
+                try:
+                    return await self.provider.scrape(query)
+                except Exception as exception:
+                    if attempt >= self.retries:
+                        return exception
+            # backoff outside the semaphore, other queries use the slot meanwhile
+            self._stats["retries"] += 1
+            await asyncio.sleep(self.backoff * 2 ** attempt * (1 + self._random.random() / 2))
+            attempt += 1
+
+    def _bucket(self, site: str) -> TokenBucket:
+        if site not in self._buckets:
+            limit: dict[str, Any] = self._rate_limits.get(site) or self._rate_limits["default"]
+            self._buckets[site] = TokenBucket(limit["rate"], limit.get("burst", 1))
+        return self._buckets[site]
@@ -0,0 +1,103 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from random import Random
+from typing import Any
+import asyncio
+import zlib
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class ScrapeQuery:
+    """One provider call: a search term in a location on a single site"""
+    term: str
+    location: str
+    site: str
+    count: int = 100
+
+
+class Provider(ABC):
+    """Source of job listings, queried one ScrapeQuery at a time by the ScrapeEngine.
+    Rate limiting, concurrency and retries are handled by the engine"""
+
+    name: str
+
+    @abstractmethod
+    async def scrape(self, query: ScrapeQuery) -> pd.DataFrame:
+        """Listings for the query, one row per listing with an 'id' column.
+        Exceptions are retried by the engine"""
+
+
+class JobspyProvider(Provider):
+    """python-jobspy adapter, its blocking calls run in a worker thread"""
+
+    name = "jobspy"
+
+    def __init__(self, **options: Any) -> None:
+        # extra scrape_jobs arguments, e.g. hours_old or proxies
+        self._options = {"linkedin_fetch_description": True, **options}
+
+    async def scrape(self, query: ScrapeQuery) -> pd.DataFrame:
+        # imported here so the engine (and tests) don't need jobspy installed
+        from jobspy import scrape_jobs
+
+        return await asyncio.to_thread(
+            scrape_jobs,
+            site_name=[query.site],
+            search_term=query.term,
+            location=query.location,
+            results_wanted=query.count,
+            **self._options,
+        )
+
+
+class FakeProvider(Provider):
+    """Offline provider returning canned DataFrames after a simulated latency.
+
+    Listings are drawn from a fixed pool so overlapping queries return some of
+    the same ids, like the real sites. failure_rate of the calls raise, which
+    exercises the engine retries.
+    """
+
+    name = "fake"
+
+    calls: int
+    failures: int
+
+    def __init__(
+            self,
+            latency: float = 0.05,
+            failure_rate: float = 0.0,
+            pool_size: int = 1000,
+            seed: int = 42
+    ) -> None:
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+        self._random = Random(seed)
+        self._pool = [
+            {
+                "id": f"fake-{number}",
+                "site": "fake",
+                "title": f"Software Engineer {number % 7}",
+                "company": f"Company {number % 50}",
+                "location": "Remote",
+                "job_level": None,
+                "description": f"Listing {number} for python, docker and aws.",
+            }
+            for number in range(pool_size)
+        ]
+
+    async def scrape(self, query: ScrapeQuery) -> pd.DataFrame:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise ConnectionError(f"Simulated failure for '{query.term}' on {query.site}")
+
+        # same query, same listings
+        start = zlib.crc32(f"{query.term}|{query.location}|{query.site}".encode("utf-8")) % len(self._pool)
+        rows = [self._pool[(start + offset) % len(self._pool)] for offset in range(min(query.count, len(self._pool)))]
+        return pd.DataFrame([{**row, "site": query.site} for row in rows])
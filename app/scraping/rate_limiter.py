@@ -0,0 +1,39 @@
+from time import monotonic
+import asyncio
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second on average, bursts up to `capacity`.
+
+    Waiters are served in arrival order, so one busy site can't starve
+    requests queued before it.
+    """
+
+    rate: float
+    capacity: float
+
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Waits for a token, returns how long it waited"""
+        async with self._lock:
+            self._refill()
+            waited = 0.0
+            if self._tokens < 1:
+                waited = (1 - self._tokens) / self.rate
+                await asyncio.sleep(waited)
+                self._refill()
+            self._tokens -= 1
+            return waited
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
@@ -0,0 +1,185 @@
+from datetime import date, timedelta
+from itertools import accumulate
+from random import Random
+from typing import Any
+import json
+
+from app.entities import Session, Listing
+from app.loaders import TopicLoader
+
+
+# Sentence templates, {skill} / {skills} / {level} / {company} / {domain} are filled in
+EN_SENTENCES = [
+    "We are looking for a {level} engineer to join our {domain} team.",
+    "You will design, build and maintain services using {skills}.",
+    "Strong experience with {skill} is required.",
+    "Nice to have: {skills}.",
+    "At {company} you will work closely with product, design and data teams.",
+    "Experience with code reviews, automated tests and continuous delivery.",
+    "Good communication skills and fluent English are a plus.",
+    "We offer flexible hours, remote work and a learning budget.",
+    "You will own features end to end, from discovery to production.",
+    "Knowledge of {skill} and {skill} in production environments.",
+    "Our stack includes {skills}.",
+    "Help us scale our {domain} platform to millions of users.",
+]
+
+PT_SENTENCES = [
+    "Estamos buscando uma pessoa desenvolvedora {level} para o time de {domain}.",
+    "Você irá desenvolver e manter aplicações utilizando {skills}.",
+    "Experiência sólida com {skill} é obrigatória.",
+    "Será um diferencial conhecimento em {skills}.",
+    "Na {company} você vai trabalhar junto com produto, design e dados.",
+    "Vivência com testes automatizados, revisão de código e integração contínua.",
+    "Inglês avançado e boa comunicação são diferenciais.",
+    "Oferecemos vale-refeição, plano de saúde, horário flexível e trabalho remoto.",
+    "Você será responsável por funcionalidades de ponta a ponta, da concepção à produção.",
+    "Conhecimento em {skill} e {skill} em ambientes de produção.",
+    "Nossa stack inclui {skills}.",
+    "Ajude a escalar nossa plataforma de {domain} para milhões de usuários.",
+]
+
+EN_HEADINGS = ["**About the job**", "**Responsibilities:**", "**Requirements:**", "**Benefits:**"]
+PT_HEADINGS = ["**Sobre a vaga**", "**Responsabilidades:**", "**Requisitos:**", "**Benefícios:**"]
+
+EN_TITLES = ["Software Engineer", "Backend Developer", "Frontend Developer", "Full Stack Developer",
+             "Data Engineer", "DevOps Engineer", "Mobile Developer", "Tech Lead", "Engineering Manager"]
+PT_TITLES = ["Desenvolvedor(a) Back-end", "Desenvolvedor Front-end", "Engenheiro(a) de Software",
+             "Pessoa Desenvolvedora Full Stack", "Engenheiro de Dados", "Analista DevOps",
+             "Desenvolvedora Mobile", "Líder Técnico", "Coordenador(a) de Desenvolvimento"]
+
+EN_LEVELS = ["Junior", "Jr", "Mid-level", "Senior", "Sr", "Staff", "Intern", ""]
+PT_LEVELS = ["Júnior", "Pleno", "Sênior", "Estagiário", "Estágio", "Sr.", ""]
+
+DOMAINS = ["payments", "logistics", "healthcare", "e-commerce", "banking", "education", "marketing", "insurance"]
+LOCATIONS = ["São Paulo, SP, Brasil", "Rio de Janeiro, RJ, Brasil", "Belo Horizonte, MG, Brasil",
+             "Curitiba, PR, Brasil", "Remote", "Florianópolis, SC, Brasil", "Lisboa, Portugal"]
+LINKEDIN_LEVELS = ["internship", "entry level", "associate", "mid-senior level", "director", "executive",
+                   "not applicable", None]
+JOB_TYPES = ["fulltime", "contract", "parttime", "internship", None]
+
+
+class SyntheticCorpus:
+    """Deterministic generator of jobspy-shaped (linkedin) listings in Portuguese and English.
+
+    duplicate_rate of the listings are copies of earlier ones, split between
+    reposts (same id), new ids with the same description, and near duplicates
+    with a few words changed (above and below the 0.90 similarity threshold).
+    """
+
+    seed: int
+    duplicate_rate: float
+    portuguese_rate: float
+
+    def __init__(self, seed: int = 42, duplicate_rate: float = 0.15, portuguese_rate: float = 0.6) -> None:
+        self.seed = seed
+        self.duplicate_rate = duplicate_rate
+        self.portuguese_rate = portuguese_rate
+
+        # skills are the topic terms and aliases, so listings actually match
+        topics = TopicLoader.select(all_topics=True)
+        self._skills = sorted({term for topic in topics for canonical, aliases in topic.terms.items()
+                               for term in (canonical, *aliases)})
+
+    def listings(self, size: int) -> list[dict[str, Any]]:
+        random = Random(self.seed)
+        # company names and product words make the vocabulary grow with size, like real data
+        companies = [self._word(random, 5, 10).title() for _ in range(max(50, size // 20))]
+        jargon = [self._word(random, 4, 11) for _ in range(max(500, size // 2))]
+        # zipf-like frequencies: few common words, a long tail of rare ones
+        jargon_weights = list(accumulate(1 / rank for rank in range(1, len(jargon) + 1)))
+
+        raws: list[dict[str, Any]] = []
+        for number in range(size):
+            if raws and random.random() < self.duplicate_rate:
+                raws.append(self._duplicate(random, raws, number))
+            else:
+                raws.append(self._listing(random, number, companies, jargon, jargon_weights))
+        return raws
+
+    def session(self, size: int) -> Session:
+        session = Session(title=f"Synthetic corpus ({size})", description=f"seed={self.seed}")
+        session.id = 1
+        session.meta = {"seed": self.seed, "duplicate_rate": self.duplicate_rate, "size": size}
+        session.listings = {
+            index + 1: Listing(index + 1, session.id, json.dumps(raw))
+            for index, raw in enumerate(self.listings(size))
+        }
+        return session
+
+    def _listing(
+            self,
+            random: Random,
+            number: int,
+            companies: list[str],
+            jargon: list[str],
+            jargon_weights: list[float]
+    ) -> dict[str, Any]:
+        portuguese = random.random() < self.portuguese_rate
+        sentences, headings = (PT_SENTENCES, PT_HEADINGS) if portuguese else (EN_SENTENCES, EN_HEADINGS)
+        titles, levels = (PT_TITLES, PT_LEVELS) if portuguese else (EN_TITLES, EN_LEVELS)
+
+        company = random.choice(companies)
+        level = random.choice(levels)
+        title = " ".join(part for part in (random.choice(titles), level) if part)
+        if random.random() < 0.3:
+            title = f"{title} - {', '.join(random.sample(self._skills, 2))}"
+
+        paragraphs = []
+        for heading in headings:
+            lines = []
+            for _ in range(random.randint(2, 6)):
+                sentence = random.choice(sentences).format(
+                    skill=random.choice(self._skills),
+                    skills=", ".join(random.sample(self._skills, random.randint(2, 5))),
+                    level=level.lower() or "experienced",
+                    company=company,
+                    domain=random.choice(DOMAINS),
+                )
+                # sprinkle company specific words in
+                extra = random.choices(jargon, cum_weights=jargon_weights, k=random.randint(0, 4))
+                lines.append(f"- {sentence} {' '.join(extra)}".rstrip())
+            paragraphs.append(heading + "\n" + "\n".join(lines))
+
+        posted = date(2025, 1, 1) + timedelta(days=random.randint(0, 300))
+        return {
+            "id": f"li-{4000000000 + number}",
+            "site": "linkedin",
+            "job_url": f"https://www.linkedin.com/jobs/view/{4000000000 + number}",
+            "job_url_direct": None,
+            "title": title,
+            "company": company,
+            "location": random.choice(LOCATIONS),
+            "date_posted": posted.isoformat(),
+            "job_type": random.choice(JOB_TYPES),
+            "is_remote": random.random() < 0.4,
+            "job_level": random.choice(LINKEDIN_LEVELS),
+            "job_function": "Engineering and Information Technology",
+            "company_industry": "Software Development",
+            "description": "\n\n".join(paragraphs),
+        }
+
+    def _duplicate(self, random: Random, raws: list[dict[str, Any]], number: int) -> dict[str, Any]:
+        duplicate = dict(random.choice(raws))
+        kind = random.random()
+        if kind < 0.25:
+            # repost, same external id
+            return duplicate
+
+        duplicate["id"] = f"li-{4000000000 + number}"
+        duplicate["job_url"] = f"https://www.linkedin.com/jobs/view/{4000000000 + number}"
+        if kind < 0.5:
+            # same description under a new id
+            return duplicate
+
+        # near duplicate: replace a few words, roughly 2% or 8% of them
+        words = duplicate["description"].split(" ")
+        changes = max(1, len(words) // (50 if kind < 0.8 else 12))
+        for _ in range(changes):
+            words[random.randrange(len(words))] = random.choice(self._skills)
+        duplicate["description"] = " ".join(words)
+        return duplicate
+
+    @staticmethod
+    def _word(random: Random, shortest: int, longest: int) -> str:
+        return "".join(random.choice("abcdefghijklmnopqrstuvwxyzáéíóúãõç") for _ in range(random.randint(shortest, longest)))
@@ -0,0 +1,227 @@
+"""Processor benchmarks on the synthetic corpus, compared against a JSON baseline.
+
+    python -m benchmarks.run                      # 1k/10k/100k, compare with baseline.json
+    python -m benchmarks.run --sizes 1000 10000   # subset of sizes
+    python -m benchmarks.run --update             # record the current numbers as the baseline
+    python -m benchmarks.run --trace traces/      # also write a Chrome trace of the steps per size
+
+Deduplicate time per listing is also compared across the sizes of a run, it should
+stay about the same (lsh candidates are pre-filtered, the exact checks stay few).
+
+Every size runs in a fresh interpreter, so peak memory (max RSS) is per size.
+"""
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+import subprocess
+import argparse
+import platform
+import resource
+import json
+import sys
+import os
+
+BASELINE = Path(__file__).resolve().parent.joinpath("baseline.json")
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+# the order Processor.process runs them in (Processor.PIPELINE)
+STEPS = [
+    "build_listings",
+    "filter_exact_duplicates",
+    "sanitize_listings",
+    "extract_ngrams",
+    "deduplicate",
+    "extract_job_level",
+    "match_and_count",
+    "update_totals",
+]
+
+DEFAULT_THRESHOLDS = {
+    # current / baseline ratios above these are regressions
+    "time": 1.25,
+    "memory": 1.20,
+    # steps faster than this in both runs are noise, never flagged
+    "min_seconds": 0.05,
+    # deduplicate time per listing, largest size / smallest size; linear growth is ~1
+    "dedup_scaling": 2.5,
+}
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(size: int, seed: int, duplicate_rate: float, trace: Path | None = None) -> dict[str, Any]:
+    """Runs every step once on a fresh corpus, in this process"""
+    from benchmarks.corpus import SyntheticCorpus
+    from app.core import Processor
+    from app.loaders import TopicLoader
+    from app import config
+
+    # spans add a little overhead, traced runs shouldn't be recorded as the baseline
+    config.profiling.enabled = trace is not None
+
+    session = SyntheticCorpus(seed, duplicate_rate).session(size)
+    processor = Processor(session, TopicLoader.select(all_topics=True))
+    baseline_rss = peak_rss_mb()
+
+    steps: dict[str, dict[str, float]] = {}
+    for step in STEPS:
+        start = perf_counter()
+        getattr(processor, step)()
+        steps[step] = {"seconds": round(perf_counter() - start, 4), "peak_rss_mb": peak_rss_mb()}
+
+    if trace is not None:
+        processor.export_trace(trace.joinpath(f"{size}_trace.json"))
+
+    dedup = processor._metrics["deduplicate"].to_dict()["meta"]["info"]
+    return {
+        "listings": size,
+        "duplicates": dedup["duplicates"],
+        # lsh candidates, the ones the pre-filter dropped and the exact Jaccard checks left
+        "dedup": {
+            "candidate_pairs": dedup["candidate_pairs"],
+            "prefiltered": dedup.get("prefiltered", 0),
+            "comparisons": dedup["iterations"],
+        },
+        "total_seconds": round(sum(step["seconds"] for step in steps.values()), 4),
+        "corpus_rss_mb": baseline_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "steps": steps,
+    }
+
+
+def run_isolated(size: int, seed: int, duplicate_rate: float, trace: Path | None = None) -> dict[str, Any]:
+    command = [sys.executable, "-m", "benchmarks.run", "--measure", str(size),
+               "--seed", str(seed), "--duplicate-rate", str(duplicate_rate)]
+    if trace is not None:
+        command += ["--trace", str(trace.resolve())]
+    output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=BASELINE.parent.parent)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """Prints a comparison table, returns the regressions"""
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    regressions = []
+
+    for size, result in results.items():
+        expected = baseline.get("results", {}).get(size)
+        print(f"\n{size} listings")
+        if not expected:
+            print("  no baseline for this size")
+            continue
+
+        print(f"  {'step':<20}{'baseline':>12}{'current':>12}{'ratio':>8}")
+        for step in [*STEPS, "total"]:
+            # steps added after the baseline was recorded
+            if step != "total" and step not in expected["steps"]:
+                print(f"  {step:<20}{'-':>12}{result['steps'][step]['seconds']:>11.3f}s")
+                continue
+            before = expected["total_seconds"] if step == "total" else expected["steps"][step]["seconds"]
+            after = result["total_seconds"] if step == "total" else result["steps"][step]["seconds"]
+            ratio = after / before if before else float("inf")
+            status = ""
+            if max(before, after) >= thresholds["min_seconds"]:
+                if ratio > thresholds["time"]:
+                    status = "REGRESSION"
+                    regressions.append(f"{size} {step}: {before}s -> {after}s")
+                elif ratio < 1 / thresholds["time"]:
+                    status = "faster"
+            print(f"  {step:<20}{before:>11.3f}s{after:>11.3f}s{ratio:>8.2f} {status}")
+
+        ratio = result["peak_rss_mb"] / expected["peak_rss_mb"]
+        status = ""
+        if ratio > thresholds["memory"]:
+            status = "REGRESSION"
+            regressions.append(f"{size} peak memory: {expected['peak_rss_mb']}MB -> {result['peak_rss_mb']}MB")
+        elif ratio < 1 / thresholds["memory"]:
+            status = "smaller"
+        print(f"  {'peak memory':<20}{expected['peak_rss_mb']:>10.1f}MB{result['peak_rss_mb']:>10.1f}MB{ratio:>8.2f} {status}")
+
+    return regressions
+
+
+def scaling(results: dict[str, Any], thresholds: dict[str, float]) -> list[str]:
+    """Prints deduplicate time and work per listing for every size, returns a regression
+    when the time per listing grows more than dedup_scaling from the smallest size to the largest"""
+    sizes = sorted(results, key=int)
+    print(f"\n{'deduplicate':<12}{'seconds':>10}{'us/listing':>12}{'candidates':>12}{'prefiltered':>13}{'checked':>10}")
+    per_listing = {}
+    for size in sizes:
+        seconds = results[size]["steps"]["deduplicate"]["seconds"]
+        per_listing[size] = seconds / int(size) * 1e6
+        work = results[size].get("dedup", {})
+        print(f"{size:<12}{seconds:>9.3f}s{per_listing[size]:>12.1f}"
+              f"{work.get('candidate_pairs', 0) / int(size):>12.1f}{work.get('prefiltered', 0) / int(size):>13.1f}"
+              f"{work.get('comparisons', 0) / int(size):>10.2f}")
+
+    if len(sizes) < 2:
+        return []
+    first, last = sizes[0], sizes[-1]
+    growth = per_listing[last] / per_listing[first] if per_listing[first] else float("inf")
+    print(f"  {int(last) // int(first)}x listings, {growth:.2f}x time per listing (counts are per listing)")
+    if growth > thresholds["dedup_scaling"]:
+        return [f"deduplicate per listing: {per_listing[first]:.1f}us at {first} -> {per_listing[last]:.1f}us at {last}"]
+    return []
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Processor steps on a synthetic corpus")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="corpus sizes to run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--duplicate-rate", type=float, default=0.15)
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--trace", type=Path, help="directory to write Chrome trace-event files to")
+    parser.add_argument("--measure", type=int, help=argparse.SUPPRESS)  # worker mode, one size in this process
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.seed, args.duplicate_rate, args.trace)))
+        return 0
+
+    if args.update and args.trace:
+        print("Traced runs are not recorded as the baseline, run again without --trace")
+        return 1
+
+    results = {}
+    for size in args.sizes:
+        print(f"Running {size} listings...", flush=True)
+        results[str(size)] = run_isolated(size, args.seed, args.duplicate_rate, args.trace)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+
+    if args.update:
+        scaling(results, thresholds)
+        baseline = {
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "corpus": {"seed": args.seed, "duplicate_rate": args.duplicate_rate},
+            "thresholds": thresholds,
+            # sizes not run this time keep their previous numbers
+            "results": {**baseline.get("results", {}), **results},
+        }
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    # dedup has to stay roughly linear across sizes, not only as fast as the baseline
+    regressions = compare(results, baseline) + scaling(results, thresholds)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
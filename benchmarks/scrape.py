@@ -0,0 +1,44 @@
+"""Scrape engine throughput on the offline FakeProvider.
+
+    python -m benchmarks.scrape                                  # 40 queries, default settings
+    python -m benchmarks.scrape --concurrency 8 --rate 5 --burst 2 --latency 0.5 --failure-rate 0.1
+"""
+import argparse
+import json
+import sys
+
+from app.scraping import FakeProvider, ScrapeEngine
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the scrape engine offline")
+    parser.add_argument("--queries", type=int, default=40, help="number of (term, location) queries per site")
+    parser.add_argument("--sites", type=str, nargs="+", default=["linkedin", "indeed"])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second per site")
+    parser.add_argument("--burst", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated seconds per call")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=0.1)
+    args = parser.parse_args()
+
+    provider = FakeProvider(latency=args.latency, failure_rate=args.failure_rate)
+    engine = ScrapeEngine(
+        provider,
+        concurrency=args.concurrency,
+        rate_limits={"default": {"rate": args.rate, "burst": args.burst}},
+        retries=args.retries,
+        backoff=args.backoff,
+        seed=0,
+    )
+    queries = ScrapeEngine.queries([f"term {number}" for number in range(args.queries)], ["Brasil"], args.sites, 25)
+
+    _frame, metric = engine.scrape(queries)
+
+    print(json.dumps(metric.to_dict()["meta"]["info"], indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
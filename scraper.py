@@ -1,10 +1,8 @@
-from app.legacy.jobspy_normalizer import JobspyNormalizer
-from jobspy import scrape_jobs
 from app.persistence.database import Database
 from app.entities.session import Session
-from typing import List, Set
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.scraping import ScrapeEngine, JobspyProvider, FakeProvider
+from typing import Set
+import json
 
 TERMS: dict = {
     "FRONTEND": ['frontend', 'front-end', 'front end'],
@@ -27,74 +25,75 @@ def get_search_terms(args) -> Set[str]:
         return {term.strip() for term in args.term.split(',')}
 
 
-def scrape_single_term(term: str, location: str, count: int) -> pd.DataFrame:
-    """Scrape jobs for a single term - designed to run in parallel."""
-    print(f"Scraping '{term}' in '{location}' ({count} results)...")
-    df = scrape_jobs(
-        site_name=DEFAULT_SITES,
-        search_term=term,
-        location=location,
-        results_wanted=count,
-        linkedin_fetch_description=True
-    )
-    print(f"✓ Completed '{term}' - found {len(df)} listings")
-    return df
+PROVIDERS = {
+    "jobspy": JobspyProvider,
+    # offline, canned listings - for trying out engine settings
+    "fake": FakeProvider,
+}
+
+
+def run_meta(args) -> dict:
+    """Query parameters of a scrape run, kept in the session meta so it can be resumed"""
+    return {
+        "tool": args.provider,
+        "term": sorted(get_search_terms(args)),
+        "location": args.location,
+        "sites": [site.strip() for site in args.sites.split(',')],
+        "count": args.count,
+    }
 
 
-def scrape(args):
+def scrape(args, db: Database, session: Session) -> tuple[int, dict]:
     """
-    Scrape jobs based on the provided arguments - NOW WITH PARALLEL EXECUTION!
+    Scrape jobs into a saved session, using the query parameters in its meta.
 
+    Every term x location x site is a query, run concurrently by the
+    ScrapeEngine with per-site rate limits and retries. Each finished query
+    commits its new listings with a checkpoint, queries already done in this
+    session are skipped (that's how --resume works).
     Three modes:
     1. Basic (no args): uses default term 'developer' and location 'Brasil'
-    2. Comprehensive (--comp): scrapes all predefined terms IN PARALLEL
-    3. Custom: uses user-provided terms and settings IN PARALLEL
+    2. Comprehensive (--comp): scrapes all predefined terms
+    3. Custom: uses user-provided terms and settings
     """
-    print("Starting parallel scrape...")
-
-    terms = get_search_terms(args)
-    all_dfs: List[pd.DataFrame] = []
-
-    # Determine number of workers based on number of terms
-    # Using min to avoid overwhelming the system
-    max_workers = min(args.workers, len(terms))
-
-    print(f"Using {max_workers} parallel workers for {len(terms)} terms")
-
-    # Use ThreadPoolExecutor for parallel scraping
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all scraping tasks
-        future_to_term = {
-            executor.submit(scrape_single_term, term, args.location, args.count): term
-            for term in terms
-        }
-
-        # Collect results as they complete
-        for future in as_completed(future_to_term):
-            term = future_to_term[future]
-            try:
-                df = future.result()
-                all_dfs.append(df)
-            except Exception as exc:
-                print(f"'{term}' generated an exception: {exc}")
-
-    # merge dataframes and dedupe using df['id']
-    combined_df = pd.concat(all_dfs, ignore_index=True)
-    clean_df = combined_df.drop_duplicates(subset=['id'], keep='first')
-
-    print(f"\nTotal listings scraped: {len(combined_df)}")
-    print(f"Unique listings after deduplication: {len(clean_df)}")
-
-    session_meta = {
-        "tool": "jobspy",
-        "term": list(terms),
-        "location": args.location,
-        "sites": DEFAULT_SITES,
-        "count": args.count,
-        "parallel_workers": max_workers,
-    }
-
-    return clean_df, session_meta
+    meta = session.meta
+    locations = [location.strip() for location in meta["location"].split(';')]
+
+    engine = ScrapeEngine(PROVIDERS[meta["tool"]](), concurrency=args.workers)
+    queries = engine.queries(meta["term"], locations, meta["sites"], meta["count"])
+    done = db.get_checkpoints(session.id)
+    pending = [query for query in queries if (query.term, query.location, query.site) not in done]
+    print(f"Starting scrape: {len(pending)} of {len(queries)} queries pending, up to {engine.concurrency} at once")
+
+    # listings already in the session (previous runs or queries) are not saved again
+    seen = db.get_external_ids(session.id)
+    saved = 0
+
+    def persist(query, result) -> None:
+        nonlocal saved
+        checkpoint = (query.term, query.location, query.site)
+        if isinstance(result, Exception):
+            print(f"'{query.term}' in '{query.location}' on {query.site} failed: {result}")
+            db.save_checkpoint(session.id, checkpoint, [], error=str(result))
+            return
+        raw_data = []
+        for record in result.to_dict('records'):
+            if record.get("id") in seen:
+                continue
+            seen.add(record.get("id"))
+            raw_data.append(json.dumps(record, default=str))
+        saved += db.save_checkpoint(session.id, checkpoint, raw_data)
+        print(f"✓ Completed '{query.term}' in '{query.location}' on {query.site} - found {len(result)} listings")
+
+    _df, metric = engine.scrape(pending, on_result=persist)
+    info = metric.to_dict()["meta"]["info"]
+
+    print(f"\nTotal listings scraped: {info['listings']}")
+    print(f"New unique listings saved: {saved}")
+    if info["failed"]:
+        print(f"Failed queries: {info['failed']} of {info['queries']}, run again with --resume {session.id}")
+
+    return saved, info
 
 
 def create_session_title(args) -> str:
@@ -120,11 +119,15 @@ def create_session_description(args) -> str:
 if __name__ == "__main__":
     import argparse
 
-    parser = argparse.ArgumentParser(description="Job Scraper CLI - NOW WITH PARALLEL EXECUTION!")
+    parser = argparse.ArgumentParser(description="Job Scraper CLI")
     parser.add_argument("--term", type=str, default='developer',
                         help="Search term(s), comma-separated (e.g., 'Python Developer, Java Developer')")
     parser.add_argument("--location", type=str, default='Brasil',
-                        help="Location (e.g., 'Brasil or São Paulo')")
+                        help="Location(s), semicolon-separated (e.g., 'Brasil' or 'São Paulo, SP; Curitiba, PR')")
+    parser.add_argument("--sites", type=str, default=",".join(DEFAULT_SITES),
+                        help="Site(s), comma-separated (e.g., 'linkedin,indeed')")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="jobspy",
+                        help="Listings provider (default: jobspy)")
     parser.add_argument("--count", type=int, default=100,
                         help="Number of jobs to scrape per term")
     parser.add_argument("--title", type=str, default="",
@@ -133,8 +136,12 @@ if __name__ == "__main__":
                         help="Custom description for the session")
     parser.add_argument("--comp", action='store_true',
                         help="Comprehensive scrape using all predefined terms")
-    parser.add_argument("--workers", type=int, default=2,
-                        help="Number of parallel workers (default: 2)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Queries in flight at once (default: config.scraper.concurrency)")
+    parser.add_argument("--append", type=int, default=None, metavar="SESSION_ID",
+                        help="Append the scraped listings to an existing session instead of creating one")
+    parser.add_argument("--resume", type=int, default=None, metavar="SESSION_ID",
+                        help="Resume an interrupted scrape, skipping the queries it already finished")
 
     args = parser.parse_args()
 
@@ -142,20 +149,36 @@ if __name__ == "__main__":
     if args.comp and args.count == 100:
         args.count = 200
 
-    title = create_session_title(args)
-    description = create_session_description(args)
+    db = Database()
 
-    session = Session(title)
-    session.description = description
-    session.start()
+    if args.resume is not None:
+        # interrupted run: same queries, only the ones not done yet
+        session = db.get_session(args.resume, include_listings=False)
+        if session is None:
+            raise SystemExit(f"Session {args.resume} not found.")
+        if not session.meta or "term" not in session.meta:
+            raise SystemExit(f"Session {args.resume} has no scrape parameters to resume from.")
+
+    elif args.append is not None:
+        # follow-up scrape: new listings go into an existing session, only they get processed later
+        session = db.get_session(args.append, include_listings=False)
+        if session is None:
+            raise SystemExit(f"Session {args.append} not found.")
+        db.clear_checkpoints(session.id)
+        session.meta = {**(session.meta or {}), **run_meta(args)}
+        db.update_session(session)
 
-    listings_df, meta = scrape(args)
-    session.meta = meta
-    session.finish()
-    session.listings = JobspyNormalizer.from_df(listings_df)
+    else:
+        session = Session(create_session_title(args))
+        session.description = create_session_description(args)
+        session.meta = run_meta(args)
+        session.start()
+        session.id = db.create_session(session)
 
-    # Save to database
-    db = Database()
-    session_id: int = db.save_session(session)
+    saved, info = scrape(args, db, session)
+
+    session.finish()
+    session.meta["failed_queries"] = info["failed"]
+    db.update_session(session)
     db.conn.close()
-    print(f"Successfully scraped {len(listings_df)} unique listings for session {session_id}.")
\ No newline at end of file
+    print(f"Successfully saved {saved} listings to session {session.id}.")
@@ -0,0 +1,107 @@
+"""One-off conversion of listings.raw_data to another storage format.
+
+    python -m scripts.compress_raw_data --codec zlib   # train a dictionary, compress every row
+    python -m scripts.compress_raw_data --codec none   # back to plain JSON text
+
+Set config.database.raw_data.codec to the same codec so new rows are written
+the same way (rows in other formats still decode, conversion is optional).
+"""
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+import argparse
+import sys
+
+from app.components import RawDataCodec
+from app.persistence.database import Database
+from app import config
+
+
+def measure(database: Database) -> dict[str, Any]:
+    """Stored raw_data bytes, database file size and the time to load every session's listings"""
+    stored = database.conn.execute("SELECT COALESCE(SUM(LENGTH(raw_data)), 0), COUNT(*) FROM listings").fetchone()
+    start = perf_counter()
+    for session_id in database.get_index():
+        database.get_listings(session_id)
+    return {
+        "listings": stored[1],
+        "raw_data_bytes": stored[0],
+        "file_bytes": Path(config.database.file).stat().st_size,
+        "load_seconds": round(perf_counter() - start, 3),
+    }
+
+
+def convert(
+        database: Database,
+        codec: str,
+        dictionary: bool = True,
+        sample_size: int = 2000,
+        batch_size: int = 1000,
+        vacuum: bool = True
+) -> dict[str, Any]:
+    """Rewrites every raw_data row with the given codec, returns before/after measurements"""
+    if codec not in RawDataCodec.CODECS:
+        raise ValueError(f"Unknown raw_data codec '{codec}'")
+
+    before = measure(database)
+    conn = database.conn
+
+    dictionary_id = None
+    config.database.raw_data.dictionary = dictionary
+    if codec != "none" and dictionary:
+        rows = conn.execute("SELECT raw_data FROM listings ORDER BY RANDOM() LIMIT ?", (sample_size,))
+        samples = [RawDataCodec.decode(row[0]) for row in rows]
+        if len(samples) > 1:
+            dictionary_id = database.save_dictionary(codec, RawDataCodec.train_dictionary(codec, samples))
+
+    converted = 0
+    last_id = -1
+    while True:
+        rows = conn.execute(
+            "SELECT id, raw_data FROM listings WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        updates = [(RawDataCodec.encode(RawDataCodec.decode(row[1]), codec), row[0]) for row in rows]
+        conn.executemany("UPDATE listings SET raw_data = ? WHERE id = ?", updates)
+        conn.commit()
+        converted += len(rows)
+        last_id = rows[-1][0]
+
+    # freed pages only go back to the filesystem with a vacuum
+    if vacuum:
+        conn.execute("VACUUM")
+
+    after = measure(database)
+    return {"codec": codec, "dictionary_id": dictionary_id, "converted": converted, "before": before, "after": after}
+
+
+def report(result: dict[str, Any]) -> None:
+    before, after = result["before"], result["after"]
+    print(f"Converted {result['converted']} listings to '{result['codec']}'"
+          + (f" with dictionary {result['dictionary_id']}" if result["dictionary_id"] else ""))
+    print(f"  {'':<16}{'before':>14}{'after':>14}{'ratio':>8}")
+    for key, label in (("raw_data_bytes", "raw_data bytes"), ("file_bytes", "file bytes"), ("load_seconds", "load seconds")):
+        ratio = after[key] / before[key] if before[key] else float("nan")
+        print(f"  {label:<16}{before[key]:>14}{after[key]:>14}{ratio:>8.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert listings.raw_data to another storage format")
+    parser.add_argument("--codec", choices=RawDataCodec.CODECS, required=True)
+    parser.add_argument("--no-dictionary", action="store_true", help="compress without a trained dictionary")
+    parser.add_argument("--sample", type=int, default=2000, help="listings sampled to train the dictionary")
+    parser.add_argument("--batch", type=int, default=1000, help="rows converted per transaction")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip VACUUM (the file keeps its size)")
+    args = parser.parse_args()
+
+    result = convert(Database(), args.codec, not args.no_dictionary, args.sample, args.batch, not args.no_vacuum)
+    report(result)
+    if config.database.raw_data.codec != args.codec:
+        print(f"\nNew rows are still written as '{config.database.raw_data.codec}', "
+              f"set config.database.raw_data.codec to '{args.codec}' to keep them consistent.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import json
+from random import Random
+
+import pytest
+
+from app import config
+from app.entities import Session, Listing
+from app.persistence import Database
+
+
+WORDS = (
+    "python java react typescript node.js docker kubernetes aws sql postgres c# .net c++ "
+    "desenvolvedor experiência equipe backend frontend api rest git linux cloud remoto "
+    "senior junior pleno estágio django flask angular vue"
+).split()
+
+
+def _make_session(size: int, seed: int = 5) -> Session:
+    random = Random(seed)
+    raws = []
+    for number in range(size):
+        if raws and random.random() < 0.2:
+            # exact and external_id duplicates of earlier listings
+            raws.append(dict(random.choice(raws)))
+            continue
+        raws.append({
+            "id": f"li-{number}",
+            "title": random.choice(["Desenvolvedor Backend", "Frontend Developer", "Tech Lead"]),
+            "description": " ".join(random.choices(WORDS, k=random.randint(20, 80))),
+            "job_level": random.choice(["entry level", "mid-senior level", "not applicable", None]),
+        })
+    session = Session(title="synthetic")
+    session.id = 1
+    session.listings = {index + 1: Listing(index + 1, 1, json.dumps(raw)) for index, raw in enumerate(raws)}
+    return session
+
+
+@pytest.fixture
+def make_session():
+    """synthetic session factory, ~20% of listings are copies of earlier ones"""
+    return _make_session
+
+
+@pytest.fixture
+def execution():
+    """config.processor.execution, restored after the test"""
+    settings = config.processor.execution
+    previous = vars(settings).copy()
+    yield settings
+    vars(settings).update(previous)
+
+
+@pytest.fixture
+def database(tmp_path, make_session):
+    """temporary database holding a 300 listings synthetic session"""
+    previous = config.database.file
+    config.database.file = tmp_path.joinpath("database.db")
+    database = Database()
+    session = make_session(300)
+    database.conn.execute("INSERT INTO sessions (id, title) VALUES (?, ?)", (session.id, session.title))
+    database.conn.executemany(
+        "INSERT INTO listings (id, session_id, raw_data) VALUES (?, ?, ?)",
+        [(index, session.id, listing.raw_data) for index, listing in session.listings.items()]
+    )
+    database.conn.commit()
+    yield database
+    config.database.file = previous
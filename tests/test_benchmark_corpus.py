@@ -0,0 +1,24 @@
+from benchmarks.corpus import SyntheticCorpus
+from app.components import DynamicListingFactory
+
+
+def test_corpus_is_deterministic():
+    assert SyntheticCorpus(seed=1).listings(200) == SyntheticCorpus(seed=1).listings(200)
+    assert SyntheticCorpus(seed=1).listings(200) != SyntheticCorpus(seed=2).listings(200)
+
+
+def test_corpus_is_jobspy_shaped():
+    session = SyntheticCorpus(duplicate_rate=0.0).session(50)
+    for index, listing in session.listings.items():
+        dynamic = DynamicListingFactory.create(index, listing.raw_data)
+        assert dynamic.external_id.startswith("li-")
+        assert dynamic.title and dynamic.description
+
+
+def test_duplicate_rate_is_controlled():
+    ids = [raw["id"] for raw in SyntheticCorpus(duplicate_rate=0.3).listings(2000)]
+    descriptions = [raw["description"] for raw in SyntheticCorpus(duplicate_rate=0.0).listings(2000)]
+
+    # reposts keep their id, so some ids repeat; without duplicates nothing does
+    assert len(set(ids)) < len(ids)
+    assert len(set(descriptions)) == len(descriptions)
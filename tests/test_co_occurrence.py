@@ -0,0 +1,74 @@
+from collections import Counter
+from itertools import combinations
+import math
+
+from app.components import CoOccurrence, IncidenceMatrix
+from app.core import Processor
+from app.loaders import TopicLoader
+
+
+def small_matrix() -> IncidenceMatrix:
+    matrix = IncidenceMatrix(["junior", "senior"])
+    matrix.add_rows([
+        (1, "junior", {"Frontend": {"react", "typescript"}}),
+        (2, "junior", {"Frontend": {"react"}}),
+        (3, "senior", {"Frontend": {"react", "typescript"}, "Languages": {"typescript", "java"}}),
+        (4, "senior", {"Languages": {"java"}, "Backend": {"spring"}}),
+        (5, "senior", {}),
+    ])
+    return matrix
+
+
+def test_pair_scores():
+    co_occurrence = CoOccurrence.from_matrix(small_matrix())
+
+    # typescript shows up under two topics in listing 3, it still counts once
+    assert co_occurrence.count("react", "typescript") == 2
+    assert co_occurrence.count("typescript", "react", "senior") == 1
+    assert co_occurrence.count("react", "spring") == 0
+
+    pair = co_occurrence.partners("react", min_count=1)[0]
+    assert pair["partner"] == "typescript"
+    # 5 listings, react in 3, typescript in 2, both in 2
+    assert pair["lift"] == round(2 * 5 / (3 * 2), 4)
+    assert pair["pmi"] == round(math.log2(2 * 5 / (3 * 2)), 4)
+    assert pair["confidence"] == round(2 / 3, 4)
+
+    senior = co_occurrence.top_pairs("senior", by="count", min_count=1)
+    assert {frozenset((row["term"], row["partner"])) for row in senior} == {
+        frozenset(pair) for pair in (("react", "typescript"), ("typescript", "java"), ("react", "java"), ("java", "spring"))
+    }
+    assert co_occurrence.top_pairs(min_count=3) == []
+
+
+def test_counts_match_brute_force(make_session, monkeypatch):
+    processor = Processor(make_session(300), TopicLoader.select(all_topics=True))
+    processor.process()
+    matrix = processor.get_incidence_matrix()
+
+    expected: dict[str | None, Counter] = {None: Counter()}
+    for row in range(len(matrix)):
+        level = matrix.levels[matrix.job_levels[row]]
+        columns = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+        terms = sorted({matrix.columns[column][1] for column in columns})
+        for pair in combinations(terms, 2):
+            expected[None][pair] += 1
+            expected.setdefault(level, Counter())[pair] += 1
+
+    dense = CoOccurrence.from_matrix(matrix)
+    monkeypatch.setattr(CoOccurrence, "DENSE_LIMIT", 0)
+    sparse = CoOccurrence.from_matrix(matrix)
+    for co_occurrence in (dense, sparse):
+        for level, pairs in expected.items():
+            for (term, partner), count in pairs.most_common(20):
+                assert co_occurrence.count(term, partner, level) == count
+        assert len(co_occurrence) == len(expected[None])
+
+
+def test_processor_requires_a_matrix(make_session):
+    processor = Processor(make_session(50), TopicLoader.select(all_topics=True))
+    assert not processor.analyze_co_occurrence().to_dict()["status"]
+
+    processor.process()
+    assert processor.analyze_co_occurrence().to_dict()["status"]
+    assert processor.get_co_occurrence().terms
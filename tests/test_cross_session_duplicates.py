@@ -0,0 +1,71 @@
+import pytest
+
+from app import config
+from app.core import Processor
+from app.loaders import TopicLoader
+from app.persistence import Database
+
+
+@pytest.fixture
+def sessions(tmp_path, make_session):
+    """Two sessions sharing 50 listings, like overlapping scrapes"""
+    previous = config.database.file, config.processor.deduplication.cross_session
+    config.database.file = tmp_path.joinpath("database.db")
+    config.processor.deduplication.cross_session = True
+    database = Database()
+    database.conn.execute("INSERT INTO sessions (id, title) VALUES (1, 'first'), (2, 'second')")
+    database.conn.commit()
+
+    raws = [listing.raw_data for listing in make_session(250).listings.values()]
+    database.append_listings(1, raws[:150])
+    database.append_listings(2, raws[100:])
+    yield database
+    config.database.file, config.processor.deduplication.cross_session = previous
+
+
+def run(database: Database, session_id: int) -> dict:
+    session = database.get_session(session_id, include_listings=False)
+    processor = Processor(session, TopicLoader.select(all_topics=True), database)
+    assert processor.process_or_restore().to_dict()["status"]
+    return processor
+
+
+def flags(database: Database) -> dict[int, int]:
+    rows = database.conn.execute("SELECT listing_id, duplicate_of FROM listing_fingerprints WHERE duplicate_of IS NOT NULL")
+    return dict(rows.fetchall())
+
+
+def test_flags_do_not_depend_on_processing_order(sessions):
+    run(sessions, 1)
+    processor = run(sessions, 2)
+    first_order = flags(sessions)
+    # session 2 listings are the later ones, they are flagged against session 1
+    assert len(first_order) >= 50
+    assert all(listing_id > 150 >= duplicate_of for listing_id, duplicate_of in first_order.items())
+    info = processor._metrics["deduplicate"].to_dict()["meta"]["info"]
+    assert info["cross_session_duplicates"] > 0
+    expected = processor._buckets
+
+    sessions.conn.execute("DELETE FROM listing_fingerprints")
+    sessions.conn.execute("DELETE FROM materializations")
+    sessions.conn.commit()
+
+    run(sessions, 2)
+    assert not flags(sessions)
+    # session 1 flags session 2 listings, so the results of session 2 are dropped
+    run(sessions, 1)
+    assert flags(sessions) == first_order
+    assert sessions.conn.execute("SELECT COUNT(*) FROM materializations WHERE session_id = 2").fetchone()[0] == 0
+
+    processor = run(sessions, 2)
+    assert processor._buckets == expected
+
+
+def test_disabled_keeps_cross_session_duplicates(sessions):
+    run(sessions, 1)
+    excluded = run(sessions, 2)._buckets["total"]["listings_counter"]
+
+    config.processor.deduplication.cross_session = False
+    processor = run(sessions, 2)
+    assert "cross_session_duplicates" not in processor._metrics["deduplicate"].to_dict()["meta"]["info"]
+    assert processor._buckets["total"]["listings_counter"] > excluded
@@ -0,0 +1,75 @@
+from collections import Counter
+import json
+
+import numpy as np
+import pytest
+
+from app.components import IncidenceMatrix
+from app.core import Processor
+from app.loaders import TopicLoader
+
+
+def reference_buckets(processor: Processor, levels: list[str]) -> dict:
+    """Buckets counted listing by listing, as Processor did before the matrix"""
+    topics = [topic.title for topic in processor._topics]
+    buckets = {"total": {"listings_counter": 0, "matches_counter": Counter()}}
+    for topic in topics:
+        buckets[topic] = {"listings_counter": 0, "matches_counter": Counter(), "per_level": {
+            level: {"listings_counter": 0, "matches_counter": Counter()} for level in levels
+        }}
+
+    for index, listing in processor._listings.items():
+        matched_terms = processor._matches.get(index)
+        if matched_terms is None:
+            continue
+        level = processor._job_levels.get(listing.id)
+        for topic in topics:
+            bucket = buckets[topic]["per_level"][level]
+            bucket["listings_counter"] += 1
+            bucket["matches_counter"].update(sorted(matched_terms.get(topic, set())))
+        if matched_terms:
+            buckets["total"]["listings_counter"] += 1
+
+    for topic in topics:
+        for level_bucket in buckets[topic]["per_level"].values():
+            buckets[topic]["listings_counter"] += level_bucket["listings_counter"]
+            buckets[topic]["matches_counter"].update(level_bucket["matches_counter"])
+        buckets["total"]["matches_counter"].update(buckets[topic]["matches_counter"])
+    return buckets
+
+
+def test_buckets_match_listing_by_listing_counts(make_session):
+    processor = Processor(make_session(400), TopicLoader.select(all_topics=True))
+    processor.process()
+
+    matrix = processor.get_incidence_matrix()
+    expected = reference_buckets(processor, matrix.levels)
+    # same counts and the same order (most_common ties keep insertion order)
+    assert json.dumps(processor._buckets) == json.dumps(expected)
+
+
+def test_slices_without_matching_again():
+    matrix = IncidenceMatrix(["junior", "senior"])
+    matrix.add_rows([
+        (10, "junior", {"Languages": {"python", "java"}}),
+        (11, "senior", {"Languages": {"python"}, "Cloud": {"aws"}}),
+    ])
+    # streaming runs append chunks
+    matrix.add_rows([(12, "senior", {}), (13, "senior", {"Cloud": {"aws", "gcp"}})])
+
+    assert matrix.shape == (4, 4)
+    assert matrix.indptr.tolist() == [0, 2, 4, 4, 6]
+    assert matrix.matched() == 3
+    assert matrix.counts() == Counter({"python": 2, "aws": 2, "java": 1, "gcp": 1})
+    assert matrix.counts("Cloud", matrix.rows(job_level="senior")) == Counter({"aws": 2, "gcp": 1})
+    assert matrix.counts(rows=matrix.rows(listing_ids=[10, 12])) == Counter({"java": 1, "python": 1})
+    assert list(matrix.counts("Languages")) == ["java", "python"]
+
+    counts = matrix.column_counts(matrix.rows(job_level="junior"))
+    assert counts.dtype == np.int64 and counts.sum() == 2
+
+
+def test_unknown_levels_fail():
+    matrix = IncidenceMatrix(["junior"])
+    with pytest.raises(KeyError):
+        matrix.add_rows([(1, "principal", {})])
@@ -0,0 +1,70 @@
+from collections import Counter
+
+import pytest
+
+from app import config
+from app.core import Processor
+from app.loaders import TopicLoader
+from app.persistence import Database
+
+
+@pytest.fixture
+def empty_database(tmp_path):
+    previous = config.database.file
+    config.database.file = tmp_path.joinpath("database.db")
+    database = Database()
+    database.conn.execute("INSERT INTO sessions (id, title) VALUES (1, 'incremental')")
+    database.conn.commit()
+    yield database
+    config.database.file = previous
+
+
+@pytest.fixture
+def deduplication():
+    settings = config.processor.deduplication
+    previous = vars(settings).copy()
+    yield settings
+    vars(settings).update(previous)
+
+
+def counts(buckets: dict) -> dict:
+    """buckets without counter ordering, which depends on the order listings came in"""
+    def flatten(bucket):
+        flat = {"listings": bucket["listings_counter"], "matches": Counter(bucket["matches_counter"])}
+        if "per_level" in bucket:
+            flat["per_level"] = {level: flatten(level_bucket) for level, level_bucket in bucket["per_level"].items()}
+        return flat
+    return {scope: flatten(bucket) for scope, bucket in buckets.items()}
+
+
+def run(database: Database, refresh: bool = False) -> tuple[dict, dict]:
+    processor = Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database)
+    metric = processor.process_or_restore(refresh=refresh).to_dict()
+    assert metric["status"]
+    return processor, metric["meta"]["info"]
+
+
+@pytest.mark.parametrize("strategy", ["lsh", "exhaustive"])
+def test_increment_matches_full_recompute(empty_database, make_session, deduplication, strategy):
+    deduplication.strategy = strategy
+    raws = [listing.raw_data for listing in make_session(300).listings.values()]
+
+    empty_database.append_listings(1, raws[:200])
+    _, info = run(empty_database)
+    assert not info["restored"]
+
+    # appended listings include copies of the first 200, they must still be caught
+    empty_database.append_listings(1, raws[200:])
+    processor, info = run(empty_database)
+    assert info == {"restored": True, "appended": 100}
+    assert processor._metrics["build_listings"].to_dict()["meta"]["info"]["processed"] == 100
+    incremental = counts(processor._buckets)
+
+    processor, info = run(empty_database, refresh=True)
+    assert not info["restored"]
+    assert incremental == counts(processor._buckets)
+
+    # nothing new, plain restore
+    processor, info = run(empty_database)
+    assert info == {"restored": True, "appended": 0}
+    assert counts(processor._buckets) == incremental
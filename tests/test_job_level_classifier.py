@@ -0,0 +1,66 @@
+import json
+import shutil
+
+from app import config
+from app.components import JobLevelClassifier, TextProcessor
+from app.loaders import MappingsLoader
+
+from benchmarks.corpus import SyntheticCorpus
+
+
+def reference(job_levels: dict[str, list[str]], title: str) -> str | None:
+    """previous per-variation scan of Processor.extract_job_level"""
+    title_tokens = title.split()
+    for canonical in reversed(list(job_levels.keys())):
+        for variation in set(job_levels[canonical]):
+            if variation in title_tokens:
+                return canonical
+    return None
+
+
+def test_matches_reference_on_single_word_variations():
+    job_levels = MappingsLoader.get_mappings()["canonical"]["job_level"]
+    single_words = {level: [v for v in variations if " " not in v] for level, variations in job_levels.items()}
+    classifier = JobLevelClassifier(single_words)
+
+    titles = [TextProcessor.sanitize(raw["title"]) for raw in SyntheticCorpus(seed=3).listings(500)]
+    titles += ["junior head of data", "gerente sr", "consultor senior", "", "engenheiro de dados"]
+    assert classifier.classify_batch(titles) == [reference(single_words, title) for title in titles]
+
+
+def test_phrases_and_priority():
+    classifier = JobLevelClassifier({
+        "early career": ["junior", "entry level"],
+        "experienced": ["senior"],
+        "executive": ["vice president", "head"],
+    })
+    assert classifier.classify("data analyst entry level") == "early career"
+    assert classifier.classify("entry data level") is None
+    assert classifier.classify("senior vice president") == "executive"
+    assert classifier.classify("junior vice") == "early career"
+    assert classifier.fallback == "executive"
+
+
+def test_recompiled_when_mappings_change(tmp_path):
+    previous = config.resources.mappings
+    config.resources.mappings = tmp_path.joinpath("mappings.json")
+    shutil.copy(previous, config.resources.mappings)
+    try:
+        MappingsLoader.load_mappings()
+        classifier = JobLevelClassifier.compile()
+        assert JobLevelClassifier.compile() is classifier
+        assert classifier.classify("desenvolvedor cientista") is None
+
+        mappings = json.loads(config.resources.mappings.read_text())
+        mappings["canonical"]["job_level"]["executive"].append("cientista chefe")
+        mappings["canonical"]["job_level"]["experienced"].append("cientista")
+        config.resources.mappings.write_text(json.dumps(mappings))
+
+        recompiled = JobLevelClassifier.compile()
+        assert recompiled is not classifier
+        assert recompiled.classify("desenvolvedor cientista") == "experienced"
+        assert recompiled.classify("cientista chefe") == "executive"
+    finally:
+        config.resources.mappings = previous
+        MappingsLoader.load_mappings()
+        JobLevelClassifier.compile()
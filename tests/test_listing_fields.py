@@ -0,0 +1,83 @@
+import sqlite3
+
+from app.components import DynamicListingFactory
+from app.core import Processor
+from app.loaders import TopicLoader
+from app.persistence import Database, Migrator
+
+from tests.test_incremental_processing import counts
+
+
+def projected(database: Database, session_id: int = 1) -> dict:
+    return {index: vars(listing) for index, listing in database.get_listing_fields(session_id).items()}
+
+
+def expected(database: Database, session_id: int = 1) -> dict:
+    return {
+        index: vars(DynamicListingFactory.create(index, listing.raw_data))
+        for index, listing in database.get_listings(session_id).items()
+    }
+
+
+def test_listings_are_projected_at_ingest(database):
+    database.conn.execute("INSERT INTO sessions (id, title) VALUES (2, 'appended')")
+    database.append_listings(2, [listing.raw_data for listing in database.get_listings(1).values()])
+    rows = database.conn.execute("SELECT COUNT(*) FROM listing_fields").fetchone()[0]
+    assert rows == 300
+    assert projected(database, 2) == expected(database, 2)
+
+    # rows inserted without projections (e.g. by hand) are projected when read
+    assert [len(chunk) for chunk in database.iter_listing_fields(1, 128)] == [128, 128, 44]
+    assert projected(database) == expected(database)
+
+
+def test_stale_projections_are_rewritten(database):
+    database.conn.execute("UPDATE listing_fields SET version = 'old', title = 'stale' WHERE listing_id % 7 = 0")
+    database.conn.execute("DELETE FROM listing_fields WHERE listing_id % 11 = 0")
+    database.conn.commit()
+
+    assert projected(database) == expected(database)
+    stale = database.conn.execute(
+        "SELECT COUNT(*) FROM listing_fields WHERE version != ?", (DynamicListingFactory.fingerprint(),)
+    ).fetchone()[0]
+    assert stale == 0
+
+
+def test_existing_listings_are_backfilled(database):
+    path = database.conn.execute("PRAGMA database_list").fetchone()["file"]
+    database.conn.execute("DROP TABLE listing_fields")
+    database.conn.execute("PRAGMA user_version = 6")
+    database.conn.commit()
+
+    conn = sqlite3.connect(path)
+    assert Migrator(conn).migrate()[0] == 7
+    assert conn.execute("SELECT COUNT(*) FROM listing_fields").fetchone()[0] == 300
+    conn.close()
+    assert projected(database) == expected(database)
+
+
+def test_processing_reads_projected_fields(database):
+    from_fields = Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database)
+    from_fields.process_or_restore()
+    assert from_fields._metrics["build_listings"].to_dict()["meta"]["info"]["projected"] == 300
+
+    from_raw = Processor(database.get_session(1), TopicLoader.select(all_topics=True))
+    from_raw.process()
+    assert from_raw._metrics["build_listings"].to_dict()["meta"]["info"]["projected"] == 0
+    assert counts(from_fields._buckets) == counts(from_raw._buckets)
+
+
+def test_processing_twice_leaves_the_session_untouched(database):
+    session = database.get_session(1, include_listings=False)
+    session.listings = database.get_listing_fields(1)
+    raw = {index: (listing.title, listing.description) for index, listing in session.listings.items()}
+
+    processor = Processor(session, TopicLoader.select(all_topics=True), database)
+    processor.process()
+    first = processor._metrics["filter_exact_duplicates"].get_info("duplicates")
+    assert {index: (listing.title, listing.description) for index, listing in session.listings.items()} == raw
+
+    # cached rows still match the raw text, the second run is served from them
+    processor.process()
+    assert processor._metrics["sanitize_listings"].get_info("cache_misses") == 0
+    assert processor._metrics["filter_exact_duplicates"].get_info("duplicates") == first
@@ -0,0 +1,50 @@
+import json
+
+from app.core import Processor
+from app.loaders import TopicLoader
+
+
+def run(database, topics, refresh: bool = False) -> tuple[bool, str]:
+    session = database.get_session(1, include_listings=False)
+    processor = Processor(session, topics, database)
+    metric = processor.process_or_restore(refresh=refresh).to_dict()
+    assert metric["status"]
+    restored = metric["meta"]["info"]["restored"]
+    return restored, json.dumps(processor._buckets)
+
+
+def test_materialization_is_restored(database):
+    topics = TopicLoader.select(all_topics=True)
+
+    restored, processed = run(database, topics)
+    assert not restored
+
+    restored, materialized = run(database, topics)
+    assert restored
+    assert materialized == processed
+
+
+def test_refresh_and_other_topics_process_again(database):
+    topics = TopicLoader.select(all_topics=True)
+    run(database, topics)
+
+    restored, _ = run(database, topics, refresh=True)
+    assert not restored
+
+    restored, _ = run(database, topics[:2])
+    assert not restored
+    restored, _ = run(database, list(reversed(topics[:2])))
+    assert restored
+
+
+def test_build_results(database):
+    topics = TopicLoader.select(all_topics=True)
+    processor = Processor(database.get_session(1), topics, database)
+    processor.process_or_restore()
+    results = processor.build_results()
+
+    assert [result["topic"] for result in results] == [topic.title for topic in topics]
+    for result in results:
+        levels = result["filtered_by_job_level"]
+        assert result["total"]["listings"] == sum(level["listings"] for level in levels.values())
+        assert result["total"]["per_level"] == {name: level["listings"] for name, level in levels.items()}
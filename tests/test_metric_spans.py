@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from app import config
+from app.core import Processor
+from app.entities import Metric
+from app.loaders import TopicLoader
+
+
+@pytest.fixture
+def profiling():
+    """config.profiling, restored after the test"""
+    settings = config.profiling
+    previous = vars(settings).copy()
+    settings.enabled = True
+    yield settings
+    vars(settings).update(previous)
+
+
+def test_spans_nest_process_step_phase(profiling, make_session):
+    processor = Processor(make_session(200), TopicLoader.select(all_topics=True))
+    root = processor.process()
+
+    steps = [child.get_context() for child in root.get_children()]
+    assert steps[:5] == ["build_listings", "filter_exact_duplicates", "sanitize_listings", "extract_ngrams", "deduplicate"]
+    match_and_count = processor._metrics["match_and_count"]
+    assert [child.get_context() for child in match_and_count.get_children()] == ["generate_buckets", "match_listings", "count"]
+
+    profile = processor._metrics["extract_ngrams"].to_dict()["profile"]
+    assert profile["duration_ms"] > 0 and profile["items_per_second"] > 0
+    assert "spans" in root.to_dict()
+
+
+def test_spans_are_noops_without_profiling(make_session):
+    assert not config.profiling.enabled
+    processor = Processor(make_session(50), TopicLoader.select(all_topics=True))
+    root = processor.process()
+    assert root.get_children() == []
+    assert root.span("phase").__class__.__name__ == "_NullSpan"
+    assert "spans" not in root.to_dict()
+
+
+def test_trace_export(profiling, make_session, tmp_path):
+    processor = Processor(make_session(100), TopicLoader.select(all_topics=True))
+    processor.process()
+    path = processor.export_trace(tmp_path.joinpath("trace.json"))
+
+    events = json.loads(path.read_text())["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert {event["name"] for event in spans} >= {"process", "deduplicate", "check", "count"}
+
+    # children stay inside their parent's interval
+    process = next(event for event in spans if event["name"] == "process")
+    for event in spans:
+        assert process["ts"] <= event["ts"]
+        assert event["ts"] + event["dur"] <= process["ts"] + process["dur"] + 1
+
+
+def test_memory_peaks(profiling):
+    profiling.memory = True
+    with Metric("outer") as outer:
+        with outer.span("inner") as inner:
+            block = [bytearray(1024) for _ in range(256)]
+        del block
+    assert inner.profile()["peak_memory_kb"] >= 256
+    assert outer.profile()["peak_memory_kb"] >= inner.profile()["peak_memory_kb"]
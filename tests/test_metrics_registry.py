@@ -0,0 +1,92 @@
+from app import config
+from app.components import MetricsRegistry
+from app.core import Processor
+from app.loaders import TopicLoader
+
+
+def test_histogram_buckets_are_upper_bounds():
+    registry = MetricsRegistry()
+    registry.observe_many("sizes", [0, 1, 3, 5, 2000])
+    registry.observe("sizes", 5)
+
+    histogram = registry.snapshot()["histograms"][0]
+    assert histogram["buckets"]["0"] == 1
+    assert histogram["buckets"]["1"] == 1
+    assert histogram["buckets"]["5"] == 3
+    assert histogram["buckets"]["+Inf"] == 1
+    assert histogram["count"] == 6 and histogram["sum"] == 2014
+
+
+def test_warnings_keep_samples_and_totals():
+    registry = MetricsRegistry()
+    for number in range(100):
+        registry.warn("no_matches", number)
+
+    warnings = registry.snapshot()["warnings"]["no_matches"]
+    assert warnings["total"] == 100
+    assert warnings["samples"] == list(range(config.metrics.warning_samples))
+
+
+def test_merge_adds_up():
+    first, second = MetricsRegistry(), MetricsRegistry()
+    for registry in (first, second):
+        registry.increment("step_runs", step="extract_ngrams")
+        registry.observe_many("sizes", [1, 10])
+        registry.warn("no_ngrams", "listing")
+
+    snapshot = first.merge(second).snapshot()
+    assert snapshot["counters"] == [{"name": "step_runs", "labels": {"step": "extract_ngrams"}, "value": 2}]
+    assert snapshot["histograms"][0]["count"] == 4
+    assert snapshot["warnings"]["no_ngrams"]["total"] == 2
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.increment("step_seconds", 0.5, step="deduplicate")
+    registry.observe_many("matches_per_listing", [0, 3])
+    registry.warn("no_matches", "listing 1")
+
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE market_analysis_step_seconds_total counter" in lines
+    assert 'market_analysis_step_seconds_total{step="deduplicate"} 0.5' in lines
+    assert "# TYPE market_analysis_matches_per_listing histogram" in lines
+    # buckets are cumulative
+    assert 'market_analysis_matches_per_listing_bucket{le="0"} 1' in lines
+    assert 'market_analysis_matches_per_listing_bucket{le="5"} 2' in lines
+    assert 'market_analysis_matches_per_listing_bucket{le="+Inf"} 2' in lines
+    assert "market_analysis_matches_per_listing_count 2" in lines
+    assert 'market_analysis_warnings_total{kind="no_matches"} 1' in lines
+
+
+def test_processing_warnings_are_aggregated(make_session):
+    session = make_session(300)
+    processor = Processor(session, TopicLoader.select(all_topics=True))
+    processor.process()
+
+    meta = processor._metrics["match_and_count"].to_dict()["meta"]
+    warnings = [entry for entry in meta.get("warning", {}).values()]
+    # one entry per kind, not per listing
+    assert len(warnings) <= 2
+    for entry in warnings:
+        (kind, buffer), = entry.items()
+        assert kind in ("no_ngrams", "no_matches")
+        assert len(buffer["samples"]) == min(buffer["total"], config.metrics.warning_samples)
+
+    snapshot = processor._registry.snapshot()
+    histograms = {histogram["name"]: histogram for histogram in snapshot["histograms"]}
+    # exact copies are dropped before ngrams are extracted
+    copies = processor._metrics["filter_exact_duplicates"].get_info("duplicates")
+    assert copies > 0
+    assert histograms["ngrams_per_listing"]["count"] == 300 - copies
+
+
+def test_runs_are_saved_to_history(database):
+    processor = Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database)
+    processor.process_or_restore()
+    Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database).process_or_restore()
+
+    runs = database.get_metric_runs(session_id=1)
+    assert [run["context"] for run in runs] == ["process_or_restore", "process_or_restore"]
+    counters = {(counter["name"], counter["labels"].get("step")): counter["value"] for counter in runs[1]["snapshot"]["counters"]}
+    assert counters[("step_runs", "deduplicate")] == 1
+    assert runs[0]["duration_ms"] < runs[1]["duration_ms"]
@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from app import config
+from app.persistence import Database, Migrator
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE sessions (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, description TEXT,
+    datetime_start TEXT, datetime_finish TEXT, meta TEXT);
+CREATE TABLE listings (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, raw_data TEXT,
+    FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE);
+INSERT INTO sessions (id, title) VALUES (1, 'first'), (2, 'second'), (3, 'empty');
+INSERT INTO listings (session_id, raw_data) VALUES (1, '{}'), (1, '{}'), (2, '{}');
+"""
+
+
+@pytest.fixture
+def database_file(tmp_path):
+    previous = config.database.file
+    config.database.file = tmp_path.joinpath("database.db")
+    yield config.database.file
+    config.database.file = previous
+
+
+def test_fresh_database_is_fully_migrated(database_file):
+    database = Database()
+    assert Migrator(database.conn).get_version() == max(Migrator.get_migrations())
+
+    plan = database.conn.execute("EXPLAIN QUERY PLAN SELECT * FROM listings WHERE session_id = 1").fetchall()
+    assert "idx_listings_session_id" in " ".join(row["detail"] for row in plan)
+
+
+def test_existing_database_is_migrated_and_backfilled(database_file):
+    conn = sqlite3.connect(database_file)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+
+    database = Database()
+    assert database.get_index() == {
+        3: {"title": "empty", "listings": 0},
+        2: {"title": "second", "listings": 1},
+        1: {"title": "first", "listings": 2},
+    }
+
+    # provisioning again is a no-op
+    assert Migrator(database.conn).migrate() == []
+
+
+def test_listings_count_follows_listings(database_file):
+    database = Database()
+    database.conn.execute("INSERT INTO sessions (id, title) VALUES (1, 'first'), (2, 'second')")
+    database.conn.executemany("INSERT INTO listings (session_id, raw_data) VALUES (?, '{}')", [(1,), (1,), (2,)])
+    database.conn.execute("UPDATE listings SET session_id = 2 WHERE id = 1")
+    database.conn.execute("DELETE FROM listings WHERE id = 3")
+    database.conn.commit()
+
+    assert {index: entry["listings"] for index, entry in database.get_index().items()} == {2: 1, 1: 1}
+
+
+def test_failed_migration_is_rolled_back(database_file, tmp_path):
+    migrations = tmp_path.joinpath("migrations")
+    migrations.mkdir()
+    migrations.joinpath("0001_valid.sql").write_text("CREATE TABLE first (id INTEGER);")
+    migrations.joinpath("0002_broken.sql").write_text("CREATE TABLE second (id INTEGER); SELECT * FROM missing;")
+
+    previous = config.database.migrations
+    config.database.migrations = migrations
+    try:
+        conn = sqlite3.connect(database_file)
+        with pytest.raises(sqlite3.OperationalError):
+            Migrator(conn).migrate()
+
+        assert Migrator(conn).get_version() == 1
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "first" in tables and "second" not in tables
+    finally:
+        config.database.migrations = previous
+
+
+def test_failing_python_migration_rolls_back(database_file, tmp_path):
+    migrations = tmp_path.joinpath("migrations")
+    migrations.mkdir()
+    migrations.joinpath("0001_table.sql").write_text("CREATE TABLE things (id INTEGER PRIMARY KEY);")
+    migrations.joinpath("0002_backfill.py").write_text(
+        "def migrate(conn):\n"
+        "    conn.execute(\"INSERT INTO things (id) VALUES (1)\")\n"
+        "    raise ValueError('backfill failed')\n"
+    )
+
+    previous = config.database.migrations
+    config.database.migrations = migrations
+    try:
+        conn = sqlite3.connect(database_file)
+        with pytest.raises(ValueError):
+            Migrator(conn).migrate()
+        assert Migrator(conn).get_version() == 1
+        assert conn.execute("SELECT COUNT(*) FROM things").fetchone()[0] == 0
+    finally:
+        config.database.migrations = previous
@@ -0,0 +1,74 @@
+import json
+
+from app.components import PhraseTrie, TextProcessor
+from app.core import Processor
+from app.entities import Listing, Session, Topic
+from app.loaders import TopicLoader
+
+
+TOPIC = Topic(title="Phrases", description="", terms={
+    "rails": ["ruby on rails", "rails framework"],
+    "gcp": ["google cloud", "google cloud platform"],
+    "aspnet": ["asp.net", "asp.net core"],
+    "kiss": ["keep it simple stupid"],
+    "python": [],
+})
+
+
+def ngrams(text: str, trie: PhraseTrie) -> dict[str, set[str]]:
+    return TextProcessor.extract_ngrams(TextProcessor.sanitize(text), trie)
+
+
+def test_only_terms_are_emitted():
+    trie = PhraseTrie([TOPIC])
+    # single word terms are unigrams already
+    assert len(trie) == 6
+
+    found = ngrams("Ruby on Rails and Google Cloud Platform, ASP.NET Core. Keep it simple, stupid!", trie)
+    # overlapping terms are all emitted, stopwords have to be there too
+    assert found["phrases"] == {
+        "ruby on rails", "google cloud", "google cloud platform", "asp.net core", "keep it simple stupid"
+    }
+    assert found["ngrams"] == found["unigrams"] | found["phrases"]
+
+    # prefixes alone and spans that aren't terms don't make it
+    assert ngrams("google platform cloud rails", trie)["phrases"] == set()
+    assert ngrams("ruby rails, keep simple stupid", trie)["phrases"] == set()
+    assert ngrams("python developer", PhraseTrie([]))["ngrams"] == {"python", "developer"}
+
+
+def test_fingerprint_follows_phrases():
+    other = Topic(title="Phrases", description="", terms={**TOPIC.terms, "kiss": []})
+    assert PhraseTrie([TOPIC]).fingerprint() == PhraseTrie([TOPIC]).fingerprint()
+    assert PhraseTrie([TOPIC]).fingerprint() != PhraseTrie([other]).fingerprint()
+
+
+def test_processor_matches_long_aliases():
+    raw = {"id": "li-1", "title": "Backend Developer",
+           "description": "Experience with ruby on rails, google cloud platform and site reliability engineering"}
+    session = Session(title="phrases", listings={1: Listing(1, 1, json.dumps(raw))})
+    processor = Processor(session, TopicLoader.select(all_topics=True) + [TOPIC])
+    processor.process()
+
+    matches = processor._matches[1]
+    assert {"rails", "gcp"} <= matches["Phrases"]
+    assert "rails" in matches["Backend Frameworks"]
+    assert "sre" in matches["Methodologies & Concepts"]
+
+
+def test_stopwords_do_not_shorten_phrases():
+    topics = TopicLoader.select(all_topics=True)
+    text = "Fluent English language and project management skills, mobile app experience"
+    processor = Processor(Session(title="generic", listings={
+        1: Listing(1, 1, json.dumps({"id": "li-1", "title": "Analyst", "description": text}))
+    }), topics)
+    processor.process()
+
+    matched = {canonical for terms in processor._matches[1].values() for canonical in terms}
+    assert "go" not in matched
+    assert "time management" not in matched
+    # "go language", "time management" or "mobile first" aren't single generic words
+    trie = PhraseTrie.compile(topics)
+    assert ngrams("english language", trie)["phrases"] == set()
+    assert ngrams("project management", trie)["phrases"] == set()
+    assert ngrams("go language and time management", trie)["phrases"] >= {"go language", "time management"}
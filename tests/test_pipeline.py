@@ -0,0 +1,182 @@
+import json
+from random import Random
+
+import pytest
+
+from app import config
+from app.core import Pipeline, Processor, Stage
+from app.entities import Listing, Metric, Session
+from app.loaders import TopicLoader
+from app.persistence import Database
+
+from benchmarks.corpus import SyntheticCorpus
+from tests.conftest import WORDS
+
+
+@pytest.fixture
+def deduplication():
+    """config.processor.deduplication, restored after the test"""
+    settings = config.processor.deduplication
+    previous = vars(settings).copy()
+    yield settings
+    vars(settings).update(previous)
+
+
+def reposts(size: int, seed: int = 7) -> Session:
+    """Listings where ~30% are copies of earlier ones, mostly reposted under a new
+    external_id, some reusing the external_id of an unrelated listing"""
+    random = Random(seed)
+    raws = []
+    for number in range(size):
+        if raws and random.random() < 0.3:
+            raw = dict(random.choice(raws))
+            roll = random.random()
+            if roll < 0.6:
+                raw["id"] = f"li-repost-{number}"
+            elif roll < 0.8:
+                raw["id"] = random.choice(raws)["id"]
+            raws.append(raw)
+            continue
+        raws.append({
+            "id": f"li-{number}",
+            "title": random.choice(["Desenvolvedor Backend", "Frontend Developer", "Tech Lead"]),
+            "description": " ".join(random.choices(WORDS, k=random.randint(20, 80))),
+            "job_level": random.choice(["entry level", "mid-senior level", None]),
+        })
+    session = Session(title="reposts")
+    session.id = 1
+    session.listings = {index + 1: Listing(index + 1, 1, json.dumps(raw)) for index, raw in enumerate(raws)}
+    return session
+
+
+def run(session: Session, database: Database | None = None) -> Processor:
+    processor = Processor(session, TopicLoader.select(all_topics=True), database)
+    assert processor.process().to_dict()["status"]
+    return processor
+
+
+def test_pipeline_is_checked_when_built():
+    with pytest.raises(ValueError, match="requires"):
+        Pipeline([Stage("extract_ngrams", requires=("listings",))])
+    with pytest.raises(ValueError, match="twice"):
+        Pipeline([Stage("build_listings"), Stage("build_listings")])
+
+    pipeline = Processor.PIPELINE.without("filter_exact_duplicates")
+    assert "filter_exact_duplicates" in Processor.PIPELINE.names()
+    assert pipeline.names()[:2] == ["build_listings", "sanitize_listings"]
+    with pytest.raises(ValueError):
+        pipeline.register(Stage("count_words", requires=("words",)), after="update_totals")
+
+
+def test_registered_stages_run_and_guards_skip(make_session):
+    class WordCounter(Processor):
+        PIPELINE = Processor.PIPELINE.register(
+            Stage("count_words", requires=("listings",), provides=("words",)), after="sanitize_listings"
+        ).register(Stage("never", guard=lambda processor: False))
+
+        def count_words(self):
+            self._words = sum(len(listing.description.split()) for listing in self._listings.values())
+
+        def never(self):
+            raise AssertionError("guarded stages don't run")
+
+    processor = WordCounter(make_session(50), TopicLoader.select(all_topics=True))
+    info = processor.process().to_dict()["meta"]["info"]
+    assert processor._words > 0
+    assert list(info["stages"]) == WordCounter.PIPELINE.names()[:-1]
+    assert info["skipped"] == {"never": "guard"}
+
+    # empty sessions skip every stage that needs listings
+    empty = Processor(Session(listings={}), [])
+    skipped = empty.process().to_dict()["meta"]["info"]["skipped"]
+    assert skipped["sanitize_listings"] == "no listings"
+
+
+@pytest.mark.parametrize("strategy", ["lsh", "exhaustive"])
+def test_exact_filter_keeps_results(deduplication, strategy):
+    deduplication.strategy = strategy
+    deduplication.exact_filter = False
+    expected = run(reposts(300))
+    deduplication.exact_filter = True
+    processor = run(reposts(300))
+
+    dropped = processor._metrics["filter_exact_duplicates"].get_info("duplicates")
+    assert dropped > 50
+    assert processor._metrics["sanitize_listings"].get_info("processed") == 300 - dropped
+    assert list(processor._listings) == list(expected._listings)
+    assert json.dumps(processor._buckets, default=sorted) == json.dumps(expected._buckets, default=sorted)
+    info = processor._metrics["deduplicate"].to_dict()["meta"]["info"]
+    assert info["duplicates"] == expected._metrics["deduplicate"].get_info("duplicates")
+    assert info["exact_duplicates"] == dropped
+
+
+def test_lsh_candidates_are_prefiltered(deduplication):
+    deduplication.strategy = "exhaustive"
+    expected = run(SyntheticCorpus(seed=42).session(600))
+    deduplication.strategy = "lsh"
+    processor = run(SyntheticCorpus(seed=42).session(600))
+
+    assert list(processor._listings) == list(expected._listings)
+    info = processor._metrics["deduplicate"].to_dict()["meta"]["info"]
+    # shared template text makes most candidates, few of them get the exact check
+    assert info["candidate_pairs"] > 600
+    assert info["iterations"] < info["candidate_pairs"] / 10
+
+
+def test_copies_keep_their_external_id():
+    raws = [
+        {"id": "a", "title": "Dev", "description": "python django docker aws"},
+        {"id": "b", "title": "Dev", "description": "java spring kubernetes"},
+        # copy of the first one under the second one's id
+        {"id": "b", "title": "Dev", "description": "python django docker aws"},
+        # reposted under a new id, then that id comes back with another text
+        {"id": "c", "title": "Dev", "description": "python django docker aws"},
+        {"id": "c", "title": "Lead", "description": "rust go linux sql postgres"},
+        {"id": "d", "title": "Lead", "description": "react typescript vue angular"},
+    ]
+    session = Session(title="ids", listings={
+        index: Listing(index, 1, json.dumps(raw)) for index, raw in enumerate(raws, start=1)
+    })
+    processor = run(session)
+    assert list(processor._listings) == [1, 2, 6]
+    assert processor._copies == {2: [(3, 1, "b"), (4, 1, "c")]}
+
+
+def test_fingerprints_cover_dropped_copies(database, deduplication):
+    def fingerprints() -> list[tuple]:
+        rows = database.conn.execute(
+            "SELECT listing_id, external_id, description_digest, title, unigrams, signature "
+            "FROM listing_fingerprints ORDER BY listing_id"
+        )
+        bands = database.conn.execute("SELECT listing_id, band, band_key FROM listing_bands ORDER BY listing_id, band")
+        return rows.fetchall() + bands.fetchall()
+
+    deduplication.exact_filter = False
+    Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database) \
+        .process_or_restore(refresh=True)
+    expected = fingerprints()
+    database.conn.execute("DELETE FROM listing_fingerprints")
+    database.conn.commit()
+
+    deduplication.exact_filter = True
+    Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database) \
+        .process_or_restore(refresh=True)
+    assert fingerprints() == expected
+    assert len(expected) > 300
+
+
+def test_stage_timings_add_up_across_runs():
+    metric = Metric("process")
+    pipeline = Pipeline([Stage("step")])
+
+    class Steps:
+        calls = 0
+
+        def step(self):
+            self.calls += 1
+
+    steps = Steps()
+    pipeline.run(steps, metric)
+    pipeline.run(steps, metric)
+    assert steps.calls == 2
+    assert list(metric.get_info("stages")) == ["step"]
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from app import config
+from app.components import RawDataCodec
+from app.persistence import Database
+from scripts.compress_raw_data import convert
+
+from benchmarks.corpus import SyntheticCorpus
+
+
+@pytest.fixture
+def raw_data_config():
+    settings = config.database.raw_data
+    previous = vars(settings).copy()
+    yield settings
+    vars(settings).update(previous)
+
+
+@pytest.fixture
+def corpus_database(tmp_path, raw_data_config):
+    previous = config.database.file
+    config.database.file = tmp_path.joinpath("database.db")
+    database = Database()
+    database.conn.execute("INSERT INTO sessions (id, title) VALUES (1, 'compressed')")
+    database.conn.commit()
+    yield database, [json.dumps(raw) for raw in SyntheticCorpus(seed=9).listings(400)]
+    config.database.file = previous
+
+
+def test_plain_text_is_stored_as_is(raw_data_config):
+    raw_data_config.codec = "none"
+    assert RawDataCodec.encode('{"id": 1}') == '{"id": 1}'
+    assert RawDataCodec.decode('{"id": 1}') == '{"id": 1}'
+    assert RawDataCodec.decode(None) is None
+
+
+def test_mixed_formats_decode_transparently(corpus_database, raw_data_config):
+    database, raws = corpus_database
+    database.append_listings(1, raws[:100])
+    raw_data_config.codec = "zlib"
+    database.append_listings(1, raws[100:200])
+
+    stored = [row[0] for row in database.conn.execute("SELECT raw_data FROM listings ORDER BY id")]
+    assert isinstance(stored[0], str) and isinstance(stored[150], bytes)
+    assert [listing.raw_data for listing in database.get_listings(1).values()] == raws[:200]
+
+
+def test_convert_with_dictionary(corpus_database):
+    database, raws = corpus_database
+    database.append_listings(1, raws)
+
+    plain = convert(database, "zlib", dictionary=False, vacuum=False)
+    result = convert(database, "zlib", sample_size=200, vacuum=False)
+    assert result["dictionary_id"] is not None
+    assert result["after"]["raw_data_bytes"] < plain["after"]["raw_data_bytes"] < plain["before"]["raw_data_bytes"]
+    assert [listing.raw_data for listing in database.get_listings(1).values()] == raws
+
+    # dictionaries are loaded back by new connections
+    RawDataCodec.clear_dictionaries()
+    assert [listing.raw_data for listing in Database().get_listings(1).values()] == raws
+
+    back = convert(database, "none")
+    assert back["after"]["raw_data_bytes"] == plain["before"]["raw_data_bytes"]
+
+
+def test_zstd_roundtrip(raw_data_config):
+    pytest.importorskip("zstandard")
+    raws = [json.dumps(raw) for raw in SyntheticCorpus(seed=9).listings(200)]
+    raw_data_config.codec = "zstd"
+    assert [RawDataCodec.decode(RawDataCodec.encode(raw)) for raw in raws] == raws
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from app.components import ResultCache
+from app.components import result_cache
+from app.core import Processor
+from app.loaders import TopicLoader
+
+
+def test_lru_eviction_and_stats():
+    cache = ResultCache(max_entries=2, ttl=0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)
+    # "b" is the least recently used now
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, 3)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 1, 1, 2)
+    assert stats["hit_rate"] == round(2 / 3, 3)
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(result_cache, "monotonic", lambda: now[0])
+    cache = ResultCache(max_entries=4, ttl=10)
+    cache.put("a", 1)
+    now[0] += 5
+    assert cache.get("a") == (True, 1)
+    now[0] += 6
+    assert cache.get("a") == (False, None)
+
+
+def test_concurrent_requests_compute_once():
+    cache = ResultCache(max_entries=4, ttl=0)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "results"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(cache.get_or_compute, "key", compute) for _ in range(4)]
+        values = [future.result() for future in futures]
+
+    assert values == ["results"] * 4
+    assert len(calls) == 1
+    # refresh computes again even when cached
+    assert cache.get_or_compute("key", compute, refresh=True) == "results"
+    assert len(calls) == 2
+
+
+def test_result_key(database):
+    topics = TopicLoader.select(all_topics=True)
+    session = database.get_session(1, include_listings=False)
+    key = Processor(session, topics, database).result_key()
+
+    assert Processor(session, topics, database).result_key() == key
+    assert Processor(session, topics[:1], database).result_key() != key
+    database.append_listings(1, ['{"id": "appended", "title": "Dev", "description": "python"}'])
+    assert Processor(session, topics, database).result_key() != key
@@ -0,0 +1,71 @@
+from random import Random
+
+import pytest
+
+from app.components import TextProcessor
+
+
+CORPUS = [
+    "Desenvolvedor(a) Back-end Sênior - Python/Django",
+    "Engenheiro de Software Pleno – Node.js, C#, .NET e C++",
+    "Estágio em Desenvolvimento Front-end (React/TypeScript)",
+    "Vice-President of Engineering, São Paulo",
+    "Senior Software Engineer (Remote) — Go / Kubernetes",
+    "**About the job** We're looking for a Sr. developer; e.g. Python 3.12, CI/CD & Docker!",
+    "Requisitos:\n• Experiência com AWS\n• Conhecimento em SQL/NoSQL\r\n• Inglês avançado",
+    "Benefícios: vale-refeição, plano de saúde 🚀 e home office! Salário: R$ 10.000,00 / €5k",
+    "Tech Lead &amp; Architect &lt;remote&gt; &#39;hybrid&#39; &nbsp;",
+    "<p>Vaga para <b>desenvolvedor</b> &amp; analista</p>",
+    "“Smart quotes” and ‘single quotes’ and the apostrophe’s curl",
+    "Ã©quipe Ã  distÃ¢ncia â€” mojibake â€™s",
+    "ﬁnance ﬂow ｆｕｌｌｗｉｄｔｈ　ｔｅｘｔ ½ ² ①",
+    "\x1b[31mterminal\x1b[0m escapes \x00 and \x07 control chars\x85",
+    "ΟΔΟΣ ΣΑΣ İstanbul naïve façade",
+    "--leading dashes, ..dots, #hash +plus and trailing dots... .NET .net c#. c++.",
+    "- Título com hífen inicial",
+    "word-word word - word --x x--",
+    "línea\u2028separator\u2029paragraph\u00a0nbsp\u200bzero-width",
+    "back\\slash *stars* (parens) | pipes! questions? colons: slashes/ semi;",
+    "",
+    "   ",
+]
+
+ALPHABET = (
+    list("abcxyzABC 019.#+-,$'\"\\*()|!?:/;&<>\n\t\r")
+    + list("áéçãõüÀ–—‘’“”€£•😀™ﬁ½²\u00a0\u2028\u200b\u0301İΣςŒ")
+    + ["&amp;", "&lt;", "&#39;", "\x1b[31m", "Ã©", "â€™", "Â ", "ｆｕｌｌ", "\u3000", "\ufeff", "\x92",
+       "c#", ".net", "c++", "node.js", " - ", "...", "e.g.", "--x"]
+)
+
+
+def random_corpus(size: int, seed: int = 3) -> list[str]:
+    random = Random(seed)
+    return [
+        "".join(random.choice(ALPHABET) for _ in range(random.randint(1, 60)))
+        for _ in range(size)
+    ]
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_sanitize_matches_reference(text):
+    assert TextProcessor.sanitize(text) == TextProcessor.sanitize_reference(text)
+
+
+def test_sanitize_matches_reference_on_random_corpus():
+    mismatches = []
+    for text in random_corpus(3000):
+        try:
+            expected = TextProcessor.sanitize_reference(text)
+        except IndexError:
+            # the reference crashes on a lone dash, see test below
+            continue
+        if TextProcessor.sanitize(text) != expected:
+            mismatches.append(text)
+
+    assert not mismatches
+
+
+def test_sanitize_lone_dash():
+    # the reference raises IndexError for these, sanitize drops them
+    for text in ("-", "–", "—"):
+        assert TextProcessor.sanitize(text) == ""
@@ -0,0 +1,80 @@
+from argparse import Namespace
+
+import pytest
+
+import scraper
+from app import config
+from app.entities import Session
+from app.persistence import Database
+from app.scraping import FakeProvider
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    previous = config.database.file
+    config.database.file = tmp_path.joinpath("database.db")
+    monkeypatch.setattr(config.scraper, "retries", 0)
+    monkeypatch.setattr(config.scraper, "rate_limits", Namespace(default=Namespace(rate=1000, burst=1000)))
+    monkeypatch.setitem(scraper.PROVIDERS, "fake", lambda: FakeProvider(latency=0, pool_size=200))
+    yield Database()
+    config.database.file = previous
+
+
+def new_session(database: Database) -> Session:
+    args = Namespace(provider="fake", term="python, java, go, rust", comp=False, location="Brasil; Remote",
+                     sites="linkedin,indeed", count=20)
+    session = Session("checkpoints", meta=scraper.run_meta(args))
+    session.start()
+    session.id = database.create_session(session)
+    return session
+
+
+def listing_ids(database: Database, session_id: int) -> list[str]:
+    return sorted(database.get_external_ids(session_id))
+
+
+def test_resume_skips_finished_queries(database, monkeypatch):
+    expected_session = new_session(database)
+    saved, info = scraper.scrape(Namespace(workers=2), database, expected_session)
+    assert info["queries"] == 16 and len(database.get_checkpoints(expected_session.id)) == 16
+    expected = listing_ids(database, expected_session.id)
+    assert saved == len(expected)
+
+    session = new_session(database)
+    save_checkpoint = database.save_checkpoint
+    calls = []
+
+    def crash_after_five(*args, **kwargs):
+        if len(calls) == 5:
+            raise RuntimeError("banned")
+        calls.append(args)
+        return save_checkpoint(*args, **kwargs)
+
+    monkeypatch.setattr(database, "save_checkpoint", crash_after_five)
+    with pytest.raises(RuntimeError):
+        scraper.scrape(Namespace(workers=2), database, session)
+    monkeypatch.setattr(database, "save_checkpoint", save_checkpoint)
+
+    # finished queries were committed with their listings
+    assert len(database.get_checkpoints(session.id)) == 5
+    assert database.get_last_listing_id(session.id) is not None
+
+    _saved, info = scraper.scrape(Namespace(workers=2), database, database.get_session(session.id, include_listings=False))
+    assert info["queries"] == 11
+    assert listing_ids(database, session.id) == expected
+    # no listing was saved twice
+    count = database.conn.execute("SELECT COUNT(*) FROM listings WHERE session_id = ?", (session.id,)).fetchone()[0]
+    assert count == len(expected)
+
+
+def test_failed_queries_are_retried_on_resume(database, monkeypatch):
+    session = new_session(database)
+    monkeypatch.setitem(scraper.PROVIDERS, "fake", lambda: FakeProvider(latency=0, failure_rate=1.0))
+    _saved, info = scraper.scrape(Namespace(workers=2), database, session)
+    assert info["failed"] == 16
+    assert len(database.get_checkpoints(session.id, status="failed")) == 16
+
+    monkeypatch.setitem(scraper.PROVIDERS, "fake", lambda: FakeProvider(latency=0, pool_size=200))
+    saved, info = scraper.scrape(Namespace(workers=2), database, session)
+    assert info["queries"] == 16 and info["failed"] == 0
+    assert saved > 0 and not database.get_checkpoints(session.id, status="failed")
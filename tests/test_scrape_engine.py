@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pandas as pd
+
+from app.scraping import FakeProvider, Provider, ScrapeEngine, ScrapeQuery, TokenBucket
+
+
+class TrackingProvider(FakeProvider):
+    """FakeProvider that records call times and how many calls overlap"""
+
+    def __init__(self, **options) -> None:
+        super().__init__(**options)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started: dict[str, list[float]] = {}
+
+    async def scrape(self, query: ScrapeQuery) -> pd.DataFrame:
+        self.started.setdefault(query.site, []).append(time.monotonic())
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super().scrape(query)
+        finally:
+            self.in_flight -= 1
+
+
+def fast_limits(rate: float = 1000, burst: int = 1000) -> dict:
+    return {"default": {"rate": rate, "burst": burst}}
+
+
+def test_queries_cover_terms_locations_and_sites():
+    queries = ScrapeEngine.queries(["python", "java"], ["Brasil", "Remote"], ["linkedin", "indeed"], 10)
+    assert len(queries) == 8
+    assert [query.site for query in queries[:2]] == ["linkedin", "indeed"]
+
+
+def test_concurrency_budget_and_dedup():
+    provider = TrackingProvider(latency=0.02, pool_size=50)
+    engine = ScrapeEngine(provider, concurrency=3, rate_limits=fast_limits(), retries=0)
+    frame, metric = engine.scrape(ScrapeEngine.queries([f"term {n}" for n in range(12)], ["Brasil"], ["linkedin"], 20))
+
+    info = metric.to_dict()["meta"]["info"]
+    assert provider.max_in_flight == 3
+    assert info["queries"] == 12 and info["failed"] == 0
+    # overlapping queries return the same ids, only unique ones are kept
+    assert info["listings"] == 240
+    assert len(frame) == info["unique_listings"] == frame["id"].nunique() <= 50
+
+
+def test_rate_limit_per_site():
+    provider = TrackingProvider(latency=0)
+    limits = {"slow": {"rate": 20, "burst": 1}, "default": {"rate": 1000, "burst": 1000}}
+    engine = ScrapeEngine(provider, concurrency=10, rate_limits=limits, retries=0)
+    engine.scrape(ScrapeEngine.queries([f"term {n}" for n in range(6)], ["Brasil"], ["slow", "fast"], 5))
+
+    slow = provider.started["slow"]
+    # 6 calls at 20/s with no burst need at least 5 intervals of 50ms
+    assert slow[-1] - slow[0] >= 0.24
+    fast = provider.started["fast"]
+    assert fast[-1] - fast[0] < 0.1
+
+
+def test_throttled_site_does_not_hold_the_slots():
+    provider = TrackingProvider(latency=0.01)
+    limits = {"slow": {"rate": 5, "burst": 1}, "default": {"rate": 1000, "burst": 1000}}
+    engine = ScrapeEngine(provider, concurrency=2, rate_limits=limits, retries=0)
+    # slow queries come first, waiting for their tokens they'd take both slots
+    queries = ScrapeEngine.queries([f"term {n}" for n in range(4)], ["Brasil"], ["slow"], 5)
+    queries += ScrapeEngine.queries([f"term {n}" for n in range(4)], ["Brasil"], ["fast"], 5)
+    engine.scrape(queries)
+
+    # 4 slow calls at 5/s take 0.6s, the fast ones run in between
+    assert provider.started["fast"][-1] < provider.started["slow"][1]
+
+
+def test_retries_with_backoff(capsys):
+    class Flaky(Provider):
+        name = "flaky"
+
+        def __init__(self):
+            self.calls = 0
+
+        async def scrape(self, query):
+            self.calls += 1
+            if self.calls < 3:
+                raise ConnectionError("try again")
+            return pd.DataFrame([{"id": "a"}])
+
+    provider = Flaky()
+    frame, metric = ScrapeEngine(provider, rate_limits=fast_limits(), retries=3, backoff=0.001).scrape(
+        [ScrapeQuery("python", "Brasil", "linkedin")]
+    )
+    info = metric.to_dict()["meta"]["info"]
+    assert (info["attempts"], info["retries"], info["failed"]) == (3, 2, 0)
+    assert list(frame["id"]) == ["a"]
+
+    provider = FakeProvider(latency=0, failure_rate=1.0)
+    frame, metric = ScrapeEngine(provider, rate_limits=fast_limits(), retries=1, backoff=0.001).scrape(
+        [ScrapeQuery("python", "Brasil", "linkedin")]
+    )
+    assert provider.calls == 2
+    assert frame.empty
+    assert not metric.to_dict()["status"]
+    assert "warning" in metric.to_dict()["meta"]
+    # progress is up to the caller (on_result), the engine doesn't print
+    assert capsys.readouterr().out == ""
+
+
+def test_token_bucket_burst():
+    async def acquire_all(bucket: TokenBucket, times: int) -> float:
+        start = time.monotonic()
+        for _ in range(times):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire_all(TokenBucket(10, capacity=3), 3)) < 0.05
+    assert asyncio.run(acquire_all(TokenBucket(10, capacity=3), 5)) >= 0.19
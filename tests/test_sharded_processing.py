@@ -0,0 +1,16 @@
+import json
+
+from app.core import Processor
+from app.loaders import TopicLoader
+
+
+def run(session, mode: str, settings) -> str:
+    settings.mode = mode
+    settings.workers = 2
+    processor = Processor(session, TopicLoader.select(all_topics=True))
+    assert processor.process().to_dict()["status"]
+    return json.dumps(processor._buckets, default=sorted)
+
+
+def test_sharded_buckets_match_serial(make_session, execution):
+    assert run(make_session(300), "sharded", execution) == run(make_session(300), "serial", execution)
@@ -0,0 +1,41 @@
+import json
+
+from app.core import Processor
+from app.loaders import TopicLoader
+from app.persistence import Database
+
+
+def run(database: Database, mode: str, settings) -> str:
+    settings.mode = mode
+    settings.chunk_size = 64
+    session = database.get_session(1, include_listings=mode != "streaming")
+    processor = Processor(session, TopicLoader.select(all_topics=True), database)
+    assert processor.process().to_dict()["status"]
+    return json.dumps(processor._buckets, default=sorted)
+
+
+def test_iter_listings_chunks(database):
+    chunks = list(database.iter_listings(1, chunk_size=64))
+    assert [len(chunk) for chunk in chunks] == [64, 64, 64, 64, 44]
+    assert [index for chunk in chunks for index in chunk] == list(range(1, 301))
+
+
+def test_streaming_buckets_match_serial(database, execution):
+    expected = run(database, "serial", execution)
+    # second streaming run is served from the preprocessing cache
+    assert run(database, "streaming", execution) == expected
+    assert run(database, "streaming", execution) == expected
+
+
+def test_streaming_twice_on_the_same_processor(database, execution):
+    expected = run(database, "serial", execution)
+    execution.mode = "streaming"
+    execution.chunk_size = 64
+    processor = Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database)
+    rows = []
+    for _ in range(2):
+        assert processor.process_or_restore(refresh=True).to_dict()["status"]
+        assert json.dumps(processor._buckets, default=sorted) == expected
+        rows.append(len(processor.get_incidence_matrix()))
+    # the second run starts a matrix of its own
+    assert rows[0] == rows[1]
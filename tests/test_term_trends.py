@@ -0,0 +1,111 @@
+from collections import Counter
+
+import pytest
+
+from app.core import Processor, TermTrends
+from app.loaders import TopicLoader
+from app.persistence import Migrator
+
+
+def buckets(levels: dict[str, tuple[int, dict[str, int]]], topic: str = "Languages") -> dict:
+    """Processor-shaped buckets for one topic, level -> (listings, term counts)"""
+    per_level = {
+        level: {"listings_counter": listings, "matches_counter": Counter(counts)}
+        for level, (listings, counts) in levels.items()
+    }
+    return {"total": {"listings_counter": 0, "matches_counter": Counter()},
+            topic: {"listings_counter": 0, "matches_counter": Counter(), "per_level": per_level}}
+
+
+@pytest.fixture
+def trends(database):
+    for session_id in (2, 3):
+        database.conn.execute("INSERT INTO sessions (id, title) VALUES (?, ?)", (session_id, f"session {session_id}"))
+    database.save_term_frequencies(1, buckets({"junior": (50, {"python": 10, "java": 20}), "senior": (50, {"python": 10})}))
+    database.save_term_frequencies(2, buckets({"junior": (50, {"python": 30, "java": 20}), "senior": (50, {"go": 5})}))
+    database.save_term_frequencies(3, buckets({"junior": (100, {"python": 60, "java": 10}), "senior": (100, {"go": 40})}))
+    return TermTrends(database)
+
+
+def test_shares_and_ranks(trends):
+    shares = trends.shares()
+    assert list(shares.index) == [1, 2, 3]
+    assert shares.loc[1, "python"] == pytest.approx(0.2)
+    assert shares.loc[2, "go"] == pytest.approx(0.05)
+    # not matched in a session is a share of 0
+    assert shares.loc[1, "go"] == 0
+
+    junior = trends.shares(job_level="junior", first=2)
+    assert list(junior.index) == [2, 3]
+    assert junior.loc[3, "python"] == pytest.approx(0.6)
+
+    ranks = TermTrends.ranks(shares)
+    assert ranks.loc[3].to_dict() == {"go": 2, "java": 3, "python": 1}
+
+
+def test_growth_and_moving_average(trends):
+    shares = trends.shares(terms=["python"])
+    growth = TermTrends.growth(shares)
+    assert growth.loc[2, "python"] == pytest.approx(0.5)
+    assert TermTrends.moving_average(shares, 2).loc[3, "python"] == pytest.approx((0.3 + 0.3) / 2)
+
+
+def test_summary(trends):
+    summary = trends.summary(window=2).set_index("term")
+    assert list(summary.index) == ["python", "go", "java"]
+    assert summary.loc["python", "change"] == pytest.approx(0.1)
+    assert summary.loc["go", "rank_change"] == 1
+    # go wasn't matched in the first session, its growth is undefined
+    assert summary["growth"].isna()["go"]
+    assert trends.summary(topic="Unknown").empty
+
+
+def test_saving_replaces_the_session_topics(database, trends):
+    database.save_term_frequencies(3, buckets({"junior": (10, {"rust": 1}), "senior": (10, {})}))
+    assert trends.shares(first=3).columns.tolist() == ["rust"]
+    assert database.get_level_totals(3) == {3: 20}
+
+
+def test_processing_writes_term_frequencies(database):
+    processor = Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database)
+    processor.process_or_restore()
+
+    index = database.get_trend_index()
+    assert list(index["sessions"]) == [1]
+    total = sum(bucket["listings_counter"] for bucket in next(
+        bucket for topic, bucket in processor._buckets.items() if topic != "total")["per_level"].values())
+    assert database.get_level_totals() == {1: total}
+
+    assert {session_id for session_id, _, _ in database.get_term_frequencies()} == {1}
+
+
+def test_migration_backfills_from_materializations(database):
+    processor = Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database)
+    processor.process_or_restore()
+    expected = database.get_term_frequencies()
+
+    database.conn.execute("DROP TABLE term_frequencies")
+    database.conn.execute("DROP TABLE session_level_totals")
+    database.conn.execute("PRAGMA user_version = 8")
+    database.conn.commit()
+    assert Migrator(database.conn).migrate()[0] == 9
+    assert database.get_term_frequencies() == expected
+
+
+def test_migration_skips_stale_materializations(database):
+    processor = Processor(database.get_session(1, include_listings=False), TopicLoader.select(all_topics=True), database)
+    processor.process_or_restore()
+    # as if mappings or topic files changed after it was materialized
+    database.conn.execute("UPDATE materializations SET resources_hash = 'stale'")
+
+    database.conn.execute("DROP TABLE term_frequencies")
+    database.conn.execute("DROP TABLE session_level_totals")
+    database.conn.execute("PRAGMA user_version = 8")
+    database.conn.commit()
+    assert Migrator(database.conn).migrate()[0] == 9
+    assert database.get_term_frequencies() == []
+    assert database.get_level_totals() == {}
+
+    # the session is processed again on its next load, counts come back then
+    processor.process_or_restore()
+    assert {session_id for session_id, _, _ in database.get_term_frequencies()} == {1}
@@ -0,0 +1,35 @@
+import pickle
+
+import numpy as np
+
+from app.components import MinHasher, Vocabulary
+
+
+def test_encode_is_sorted_and_stable():
+    vocabulary = Vocabulary()
+    first = vocabulary.encode({"python", "django", "python django"})
+    second = vocabulary.encode({"django", "docker"})
+
+    assert first.dtype == np.uint32
+    assert list(first) == sorted(first)
+    assert vocabulary.decode(second) == ["django", "docker"]
+    assert vocabulary.lookup("rust") is None
+    assert len(vocabulary) == 4
+
+
+def test_remap_translates_ids_between_vocabularies():
+    shard = Vocabulary(["c#", ".net", "sql"])
+    merged = Vocabulary(["sql", "aws"])
+    ids = shard.encode({"c#", "sql"})
+
+    remap = merged.remap(pickle.loads(pickle.dumps(shard)))
+    assert merged.decode(np.sort(remap[ids])) == sorted(["c#", "sql"], key=merged.lookup)
+
+
+def test_hashes_match_min_hasher():
+    vocabulary = Vocabulary()
+    tokens = {"python", "java", "kotlin", "go"}
+    ids = vocabulary.encode(tokens)
+    hasher = MinHasher()
+
+    assert np.array_equal(hasher.hash_signature(vocabulary.hashes(ids)), hasher.signature(tokens))
@@ -1,4 +1,6 @@
-from app.core.processor import JobspyProcessor
+from app.components import ResultCache
+from app.core import Processor, TermTrends
+from app import config
 from app.loaders.topic_loader import TopicLoader
 from app.persistence.database import Database
 import streamlit as st
@@ -16,6 +18,38 @@ def get_topic_loader() -> TopicLoader:
     return TopicLoader()
 topic_loader = get_topic_loader()
 
+# shared by every browser session, so a session + topics selection is only
+# processed (or restored) once, reruns from display widgets only render
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    return ResultCache()
+result_cache = get_result_cache()
+
+
+def load_results(session, topics, refresh: bool = False) -> list:
+    processor = Processor(session, topics, db)
+
+    def compute() -> list:
+        processor.process_or_restore(refresh=refresh)
+        return processor.build_results()
+
+    return result_cache.get_or_compute(processor.result_key(), compute, refresh=refresh)
+
+
+def load_co_occurrence(session, topics):
+    # restored results have no incidence matrix, so the listings are processed
+    # once more (preprocessing is cached) and the pairs are cached like results
+    def compute():
+        full_session = db.get_session(session.id, include_listings=False)
+        full_session.listings = db.get_listing_fields(session.id)
+        processor = Processor(full_session, topics, db)
+        processor.process()
+        processor.analyze_co_occurrence()
+        return processor.get_co_occurrence()
+
+    key = (*Processor(session, topics, db).result_key(), "co_occurrence")
+    return result_cache.get_or_compute(key, compute)
+
 
 def make_chart(counts: dict, total_listings: int, limit: int = 30):
     data = pd.DataFrame(list(counts.items()), columns=["keyword", "count"])
@@ -58,6 +92,111 @@ def make_chart(counts: dict, total_listings: int, limit: int = 30):
 
     return chart.interactive()
 
+def render_cache_stats(container):
+    stats = result_cache.stats()
+    with container.expander(label="Results cache", expanded=False):
+        cols = st.columns(2)
+        hit_rate = stats["hit_rate"]
+        cols[0].metric("Hit rate", f"{hit_rate * 100:.0f}%" if hit_rate is not None else "-")
+        cols[1].metric("Entries", f"{stats['entries']}/{stats['max_entries']}")
+        st.caption(f"{stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+        if st.button("Clear cache"):
+            result_cache.invalidate()
+            st.rerun()
+
+def render_co_occurrence(co_occurrence, limit: int = 30):
+    if co_occurrence is None or not len(co_occurrence):
+        st.info("No co-occurring terms found for this session.")
+        return
+
+    controls = st.columns(3)
+    level = controls[0].selectbox("Job level", ["All levels"] + co_occurrence.levels)
+    score = controls[1].radio("Rank by", ["lift", "pmi", "count"], horizontal=True,
+                              help="lift: how much more often the pair shows up than if the terms were independent")
+    min_count = controls[2].number_input("Minimum listings per pair", min_value=1,
+                                         value=config.processor.co_occurrence.min_count, step=1)
+    job_level = None if level == "All levels" else level
+
+    st.markdown("**Top pairs**")
+    pairs = co_occurrence.top_pairs(job_level, k=limit, by=score, min_count=min_count)
+    if pairs:
+        st.dataframe(pd.DataFrame(pairs), use_container_width=True, hide_index=True)
+    else:
+        st.caption("No pairs with that many listings at this level.")
+
+    st.markdown("**Partner terms**")
+    term = st.selectbox("Term", sorted(co_occurrence.terms))
+    partners = co_occurrence.partners(term, job_level, k=limit, by=score, min_count=min_count)
+    if not partners:
+        st.caption(f"No partners for {term} with that many listings at this level.")
+        return
+    data = pd.DataFrame(partners)
+    chart = alt.Chart(data).mark_bar().encode(
+        x=alt.X("partner", sort=None, axis=alt.Axis(labelAngle=-45, title=None)),
+        y=alt.Y(score, title=score),
+        tooltip=[
+            alt.Tooltip("partner", title="Partner"),
+            alt.Tooltip("count", title="Listings with both"),
+            alt.Tooltip("confidence", title=f"Share of {term} listings", format=".1%"),
+            alt.Tooltip("lift", title="Lift", format=".2f"),
+        ]
+    )
+    st.altair_chart(chart.interactive(), use_container_width=True)
+
+def render_trends(limit: int = 30):
+    trend_index = db.get_trend_index()
+    sessions = trend_index["sessions"]
+    if len(sessions) < 2:
+        st.info("Trends need at least two processed sessions, load them from the Keywords view first.")
+        return
+
+    controls = st.columns([3, 2, 2, 1])
+    first, last = controls[0].select_slider(
+        "Sessions",
+        options=list(sessions),
+        value=(min(sessions), max(sessions)),
+        format_func=lambda session_id: f"{session_id}. {sessions[session_id]['title']}",
+    )
+    topic = controls[1].selectbox("Topic", ["All topics"] + trend_index["topics"])
+    level = controls[2].selectbox("Job level", ["All levels"] + trend_index["levels"], key="trends_level")
+    window = controls[3].number_input("Window", min_value=1, max_value=12, value=3, step=1,
+                                      help="Sessions in the moving average")
+    topic = None if topic == "All topics" else topic
+    job_level = None if level == "All levels" else level
+
+    trends = TermTrends(db)
+    summary = trends.summary(first, last, topic, job_level, window=window, limit=limit)
+    if summary.empty:
+        st.info("No terms matched in these sessions.")
+        return
+
+    shares = trends.shares(first, last, topic, job_level, terms=list(summary["term"]))
+    if st.toggle("Moving average", value=False):
+        shares = TermTrends.moving_average(shares, window)
+    data = shares.mul(100).reset_index().melt(id_vars="session_id", var_name="term", value_name="share")
+    data["session"] = data["session_id"].map(lambda session_id: f"{session_id}. {sessions[session_id]['title']}")
+    chart = alt.Chart(data).mark_line(point=True).encode(
+        x=alt.X("session", sort=None, axis=alt.Axis(labelAngle=-45, title=None)),
+        y=alt.Y("share", title="Share of listings (%)"),
+        color=alt.Color("term", sort=list(summary["term"])),
+        tooltip=[
+            alt.Tooltip("term", title="Term"),
+            alt.Tooltip("session", title="Session"),
+            alt.Tooltip("share", title="Share (%)", format=".1f"),
+        ]
+    )
+    st.altair_chart(chart.interactive(), use_container_width=True)
+
+    table = summary.copy()
+    for column in ("first_share", "last_share", "change", "moving_average"):
+        table[column] = (table[column] * 100).round(1)
+    table["growth"] = (table["growth"] * 100).round(1)
+    st.dataframe(table.rename(columns={
+        "first_share": "First (%)", "last_share": "Last (%)", "change": "Change (pp)", "growth": "Growth (%)",
+        "first_rank": "First rank", "last_rank": "Last rank", "rank_change": "Rank change",
+        "moving_average": "Moving avg. (%)",
+    }), use_container_width=True, hide_index=True)
+
 def render_dashboard(results, limit: int = 30):
     for item in results:
         topic = item.get("topic", "Unknown Topic")
@@ -150,27 +289,38 @@ with st.sidebar:
     selected_session: int = st.selectbox(
         label="Sessions available",
         options=index.keys(),
-        format_func=lambda option_id: f"{option_id}. {index[option_id]}",
+        format_func=lambda option_id: f"{option_id}. {index[option_id]['title']}",
         index=default_index
     )
 
-    available_topics = sorted(list(topic_loader.get_available()))
-    selected_topic_titles = []
+    available_topics = topic_loader.get_available()
+    selected_topics = []
     
     st.text("\n\n")
     with st.expander(label="Topics available", expanded=False):
-        for topic in available_topics:
-            if st.checkbox(topic, value=True, key=f"topic_{topic}"):
-                selected_topic_titles.append(topic)
+        for topic_index, topic in available_topics.items():
+            if st.checkbox(topic["title"], value=True, key=f"topic_{topic_index}"):
+                selected_topics.append(topic_index)
 
     st.text("\n")
     top_n = st.number_input(label="Top Keywords to Display", min_value=5, max_value=100, value=20, step=1)
+    view = st.radio("View", ["Keywords", "Co-occurrence", "Trends"], horizontal=True,
+                    help="Co-occurrence: which terms show up together in the same listings. "
+                         "Trends: term shares across processed sessions")
+
+    # results are materialized per session and topic selection, so loading
+    # only runs the processor the first time (or when refresh is checked)
+    refresh = st.checkbox("Reprocess session", value=False, help="Ignore stored results and process again")
 
     if st.button("Load Session", type="primary"):
-        session = db.get_session(selected_session)
+        session = db.get_session(selected_session, include_listings=False)
         st.session_state['current_session'] = session
-        st.session_state['topics'] = topic_loader.load(set(selected_topic_titles))
+        st.session_state['topics'] = topic_loader.select(selected_topics)
+        st.session_state['refresh'] = refresh
         st.rerun()
+
+    # filled once this run's results are loaded, so the stats include them
+    cache_panel = st.container()
     
     st.divider()
     st.markdown("""
@@ -185,20 +335,27 @@ with st.sidebar:
     **Sections:**
     - **Overview:** General metrics and keyword popularity.
     - **Job Levels:** Breakdown of data by seniority (Junior, Senior, etc.).
+    - **Co-occurrence:** Terms that show up together, overall or per level.
+    - **Trends:** How term shares change across processed sessions.
     """)
 
-if 'current_session' in st.session_state:
+if view == "Trends":
+    render_cache_stats(cache_panel)
+    st.subheader("📈 Trends")
+    render_trends(limit=top_n)
+
+elif 'current_session' in st.session_state:
     session = st.session_state['current_session']
     topics = st.session_state.get('topics', [])
-    processor = JobspyProcessor(session, topics)
-    results = processor.process()
+    results = load_results(session, topics, refresh=st.session_state.pop('refresh', False))
+    render_cache_stats(cache_panel)
 
     with st.container():
         st.subheader(f"📄 Session: {session.title}")
         cols = st.columns(3)
         cols[0].metric("Session ID", session.id)
         cols[1].metric("Date", session.start_time.strftime("%Y-%m-%d %H:%M"))
-        cols[2].metric("Total Listings", len(session.listings) if session.listings else 0)
+        cols[2].metric("Total Listings", index.get(session.id, {}).get("listings", 0))
         
         st.info(session.description)
         
@@ -207,11 +364,14 @@ if 'current_session' in st.session_state:
     
     st.divider()
     
-    if results:
+    if view == "Co-occurrence":
+        render_co_occurrence(load_co_occurrence(session, topics), limit=top_n)
+    elif results:
         render_dashboard(results, limit=top_n)
     else:
         st.info("No analysis results generated.")
 
 else:
+    render_cache_stats(cache_panel)
     st.info("👈 Please select a session and the desired topics from the sidebar to view results.")
     st.stop()
\ No newline at end of file